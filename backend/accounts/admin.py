@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User
+from .models import User, SigningKey
 
 
 @admin.register(User)
@@ -27,3 +27,18 @@ class UserAdmin(BaseUserAdmin):
     )
     
     readonly_fields = ['created_at', 'updated_at', 'last_login']
+
+
+@admin.register(SigningKey)
+class SigningKeyAdmin(admin.ModelAdmin):
+    """Read-only view of JWT signing keys; rotate with manage.py rotate_signing_keys."""
+    
+    list_display = ['kid', 'algorithm', 'activates_at', 'retires_at', 'expires_at']
+    exclude = ['private_key']
+    readonly_fields = ['kid', 'algorithm', 'public_jwk', 'created_at', 'activates_at', 'retires_at', 'expires_at']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,175 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from config.cache import TTLCache
+from .revocation import is_revoked
+from .tokens import (
+    CLAIM_CITIZEN_ID,
+    CLAIM_EMAIL,
+    CLAIM_ORG_APPROVAL,
+    CLAIM_ORG_ID,
+    CLAIM_ROLE,
+    CLAIM_VERSION,
+    build_claims,
+)
+
+
+# user_id -> (token_version, is_active)
+_user_states = TTLCache(settings.AUTH_CLAIMS_CACHE_TTL)
+# user_id -> field values of the full user row
+_user_rows = TTLCache(settings.AUTH_CLAIMS_CACHE_TTL)
+
+
+def forget_users(user_ids):
+    """Drop cached state so this worker sees a change immediately."""
+    for user_id in user_ids:
+        _user_states.delete(user_id)
+        _user_rows.delete(user_id)
+
+
+def get_user_state(user_id):
+    """(token_version, is_active) for a user, or None if the user is gone."""
+    state = _user_states.get(user_id)
+    if state is None:
+        state = (
+            get_user_model().objects
+            .filter(pk=user_id)
+            .values_list('token_version', 'is_active')
+            .first()
+        )
+        if state is None:
+            return None
+        _user_states.set(user_id, state)
+    return state
+
+
+def get_cached_user(user_id):
+    """Full User instance, built from a briefly cached row."""
+    User = get_user_model()
+    field_names = [field.attname for field in User._meta.concrete_fields]
+    values = _user_rows.get(user_id)
+    if values is None:
+        values = User.objects.filter(pk=user_id).values_list(*field_names).first()
+        if values is None:
+            raise User.DoesNotExist
+        _user_rows.set(user_id, values)
+    # A fresh instance per call, so requests never share a mutable object
+    return User.from_db('default', field_names, values)
+
+
+class ClaimsPrincipal:
+    """
+    Lightweight request.user built from token claims.
+
+    Role, email, citizen ID and organization ID/approval are answered
+    from the token. Anything else (e.g. UserSerializer fields) is read
+    from the full User, which is loaded once through a short-TTL cache.
+    Assign request.user.id to foreign keys rather than the principal.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user_id, claims):
+        self.id = self.pk = user_id
+        self.email = claims[CLAIM_EMAIL]
+        self.role = claims[CLAIM_ROLE]
+        self.citizen_id = claims.get(CLAIM_CITIZEN_ID)
+        self.org_id = claims.get(CLAIM_ORG_ID)
+        self.org_approval_status = claims.get(CLAIM_ORG_APPROVAL)
+        self.token_version = claims[CLAIM_VERSION]
+        self._user = None
+        self._org_user = None
+
+    def __str__(self):
+        return self.email
+
+    def __repr__(self):
+        return f'<ClaimsPrincipal {self.pk} {self.role}>'
+
+    def __eq__(self, other):
+        return self.pk is not None and getattr(other, 'pk', None) == self.pk
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    @property
+    def user(self):
+        if self._user is None:
+            self._user = get_cached_user(self.pk)
+        return self._user
+
+    def __getattr__(self, name):
+        # Only called for attributes not answered by the claims
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+    @property
+    def is_citizen(self):
+        return self.role == 'CITIZEN'
+
+    @property
+    def is_org_user(self):
+        return self.role == 'ORG_USER'
+
+    @property
+    def is_admin(self):
+        return self.role == 'ADMIN'
+
+    @property
+    def citizen_profile(self):
+        from identity.models import CitizenProfile
+        if self.citizen_id is not None:
+            return CitizenProfile.objects.get(pk=self.citizen_id)
+        # Profile may have been created after the token was issued
+        return CitizenProfile.objects.get(user_id=self.pk)
+
+    @property
+    def org_user(self):
+        # Prefer request.user.org_id; this loads the membership row once
+        from organizations.models import OrgUser
+        if self._org_user is None:
+            self._org_user = OrgUser.objects.select_related('organization').get(user_id=self.pk)
+        return self._org_user
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that trusts the identity claims in the token.
+
+    Only the user's token version and active flag are checked, through a
+    short-TTL cache, so most requests authenticate without a query. When
+    the version has moved on, the claims are rebuilt from the database
+    until the client refreshes its token. Tokens without claims (issued
+    before this scheme) fall back to loading the user. Revoked sessions
+    are rejected from the in-memory denylist (accounts.revocation).
+    """
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if is_revoked(validated_token.payload):
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        return validated_token
+
+    def get_user(self, validated_token):
+        if CLAIM_VERSION not in validated_token:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise AuthenticationFailed('Token contained no recognizable user identification', code='token_not_valid')
+
+        state = get_user_state(user_id)
+        if state is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        token_version, is_active = state
+        if not is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+
+        if validated_token[CLAIM_VERSION] != token_version:
+            return ClaimsPrincipal(user_id, build_claims(get_cached_user(user_id)))
+        return ClaimsPrincipal(user_id, validated_token)
@@ -0,0 +1,48 @@
+import base64
+import hashlib
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, ScryptPasswordHasher
+
+
+def scrypt_memory(n, r, p):
+    """Bytes of memory one scrypt hash needs."""
+    return 128 * r * (n + 2) + 128 * r * p
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with the iteration count from PASSWORD_PBKDF2_ITERATIONS
+    (see manage.py benchmark_hashers). Existing pbkdf2_sha256 hashes keep
+    verifying with the count stored in them and are upgraded on login.
+    """
+
+    iterations = settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    """
+    scrypt with the work factor, block size and parallelism from
+    PASSWORD_SCRYPT_N / _R / _P (see manage.py benchmark_hashers).
+    """
+
+    work_factor = settings.PASSWORD_SCRYPT_N
+    block_size = settings.PASSWORD_SCRYPT_R
+    parallelism = settings.PASSWORD_SCRYPT_P
+
+    def encode(self, password, salt, n=None, r=None, p=None):
+        self._check_encode_args(password, salt)
+        n = n or self.work_factor
+        r = r or self.block_size
+        p = p or self.parallelism
+        hash_ = hashlib.scrypt(
+            password.encode(),
+            salt=salt.encode(),
+            n=n,
+            r=r,
+            p=p,
+            # OpenSSL's default limit (32 MB) rejects work factors above 2**14
+            maxmem=scrypt_memory(n, r, p) + 1024 * 1024,
+            dklen=64,
+        )
+        hash_ = base64.b64encode(hash_).decode('ascii').strip()
+        return '%s$%d$%s$%d$%d$%s' % (self.algorithm, n, salt, r, p, hash_)
@@ -0,0 +1,287 @@
+import json
+import base64
+import hashlib
+import logging
+import secrets
+import threading
+from time import monotonic
+from datetime import timedelta
+import jwt
+from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework_simplejwt.backends import TokenBackend
+from rest_framework_simplejwt.exceptions import TokenBackendError
+from rest_framework_simplejwt.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+
+def _fernet():
+    secret = settings.JWT_KEY_ENCRYPTION_SECRET.encode()
+    return Fernet(base64.urlsafe_b64encode(hashlib.sha256(secret).digest()))
+
+
+def generate_key_pair(algorithm):
+    """Return (encrypted private PEM, public JWK dict) for a new key."""
+    if algorithm == 'EdDSA':
+        private_key = ed25519.Ed25519PrivateKey.generate()
+        public_jwk = json.loads(OKPAlgorithm.to_jwk(private_key.public_key()))
+    elif algorithm == 'RS256':
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        public_jwk = json.loads(RSAAlgorithm.to_jwk(private_key.public_key()))
+    else:
+        raise ValueError(f'Unsupported signing algorithm: {algorithm}')
+
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    )
+    return _fernet().encrypt(pem).decode(), public_jwk
+
+
+def create_signing_key(activates_at=None, algorithm=None, model=None):
+    """
+    Generate and store a key that starts signing at activates_at (default:
+    now). model is the SigningKey model to use (the historical one in
+    migrations).
+    """
+    if model is None:
+        from .models import SigningKey as model
+
+    algorithm = algorithm or settings.JWT_KEY_ALGORITHM
+    private_key, public_jwk = generate_key_pair(algorithm)
+    kid = f"{timezone.now():%Y%m%d}-{secrets.token_hex(4)}"
+    public_jwk.update({'kid': kid, 'alg': algorithm, 'use': 'sig'})
+    return model.objects.create(
+        kid=kid,
+        algorithm=algorithm,
+        private_key=private_key,
+        public_jwk=public_jwk,
+        activates_at=activates_at or timezone.now()
+    )
+
+
+class LoadedKey:
+    """A signing key with its key objects decoded, ready for PyJWT."""
+
+    __slots__ = ('kid', 'algorithm', 'activates_at', 'retires_at', 'private_key', 'public_key', 'jwk')
+
+    def __init__(self, record):
+        self.kid = record.kid
+        self.algorithm = record.algorithm
+        self.activates_at = record.activates_at
+        self.retires_at = record.retires_at
+        pem = _fernet().decrypt(record.private_key.encode())
+        self.private_key = serialization.load_pem_private_key(pem, password=None)
+        self.public_key = self.private_key.public_key()
+        self.jwk = record.public_jwk
+
+    def can_sign(self, now):
+        return self.activates_at <= now and (self.retires_at is None or self.retires_at > now)
+
+
+class KeyRing:
+    """
+    In-memory copy of the unexpired signing keys.
+
+    Reloaded every JWT_KEYS_RELOAD_INTERVAL seconds, or early when a token
+    names a key this worker hasn't seen, so verification never touches the
+    database in the steady state.
+    """
+
+    def __init__(self, reload_interval):
+        self.reload_interval = reload_interval
+        self._keys = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        from .models import SigningKey
+
+        now = timezone.now()
+        records = SigningKey.objects.filter(Q(expires_at__isnull=True) | Q(expires_at__gt=now))
+        keys = {}
+        for record in records:
+            loaded = self._keys.get(record.kid)
+            if loaded is None:
+                loaded = LoadedKey(record)
+            else:
+                # Rotation may have rescheduled the key since we loaded it
+                loaded.activates_at = record.activates_at
+                loaded.retires_at = record.retires_at
+            keys[record.kid] = loaded
+        self._keys = keys
+        self._loaded_at = monotonic()
+
+    def keys(self, force=False):
+        stale = self._loaded_at is None or monotonic() - self._loaded_at > self.reload_interval
+        if stale or force:
+            with self._lock:
+                if force or self._loaded_at is None or monotonic() - self._loaded_at > self.reload_interval:
+                    self._load()
+        return self._keys
+
+    def get(self, kid):
+        key = self.keys().get(kid)
+        if key is None and monotonic() - (self._loaded_at or 0) > 1:
+            # Possibly a key rotated in by another worker
+            key = self.keys(force=True).get(kid)
+        return key
+
+    def signing_key(self):
+        """
+        The newest key currently allowed to sign. The first key is created
+        by a migration (or rotate_signing_keys), never here, so concurrent
+        first logins can't each insert one.
+        """
+        candidates = self._signing_candidates(self.keys())
+        if not candidates:
+            candidates = self._signing_candidates(self.keys(force=True))
+        if not candidates:
+            raise ImproperlyConfigured(
+                'No JWT signing key is active; run "manage.py rotate_signing_keys"'
+            )
+        return max(candidates, key=lambda key: key.activates_at)
+
+    @staticmethod
+    def _signing_candidates(keys):
+        now = timezone.now()
+        return [key for key in keys.values() if key.can_sign(now)]
+
+
+_keyring = None
+_keyring_lock = threading.Lock()
+
+
+def get_keyring():
+    """Return the process-wide key ring."""
+    global _keyring
+    if _keyring is None:
+        with _keyring_lock:
+            if _keyring is None:
+                _keyring = KeyRing(settings.JWT_KEYS_RELOAD_INTERVAL)
+    return _keyring
+
+
+def build_jwks():
+    """Public keys of every unexpired signing key, as a JWK Set."""
+    keys = sorted(get_keyring().keys().values(), key=lambda key: key.activates_at)
+    return {'keys': [key.jwk for key in keys]}
+
+
+class KeySetTokenBackend(TokenBackend):
+    """
+    Signs tokens with the current asymmetric key and names it in the kid
+    header; verifies with whichever published key the token names.
+    Tokens without a kid were signed with the shared HS secret and are
+    accepted while JWT_ACCEPT_LEGACY_HS256 is on.
+    """
+
+    def __init__(self):
+        super().__init__(
+            api_settings.ALGORITHM,
+            api_settings.SIGNING_KEY,
+            api_settings.VERIFYING_KEY,
+            api_settings.AUDIENCE,
+            api_settings.ISSUER,
+            api_settings.JWK_URL,
+            api_settings.LEEWAY,
+            api_settings.JSON_ENCODER,
+        )
+
+    def encode(self, payload):
+        if not settings.JWT_ASYMMETRIC_SIGNING:
+            return super().encode(payload)
+
+        key = get_keyring().signing_key()
+        jwt_payload = payload.copy()
+        if self.audience is not None:
+            jwt_payload['aud'] = self.audience
+        if self.issuer is not None:
+            jwt_payload['iss'] = self.issuer
+        return jwt.encode(
+            jwt_payload,
+            key.private_key,
+            algorithm=key.algorithm,
+            headers={'kid': key.kid},
+            json_encoder=self.json_encoder,
+        )
+
+    def decode(self, token, verify=True):
+        try:
+            kid = jwt.get_unverified_header(token).get('kid')
+        except jwt.InvalidTokenError as ex:
+            raise TokenBackendError('Token is invalid or expired') from ex
+
+        if kid is None:
+            if not settings.JWT_ACCEPT_LEGACY_HS256:
+                raise TokenBackendError('Token is invalid or expired')
+            return super().decode(token, verify=verify)
+
+        key = get_keyring().get(kid)
+        if key is None:
+            raise TokenBackendError('Token is invalid or expired')
+        try:
+            return jwt.decode(
+                token,
+                key.public_key,
+                algorithms=[key.algorithm],
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=self.get_leeway(),
+                options={
+                    'verify_aud': self.audience is not None,
+                    'verify_signature': verify,
+                },
+            )
+        except jwt.InvalidTokenError as ex:
+            raise TokenBackendError('Token is invalid or expired') from ex
+
+
+token_backend = KeySetTokenBackend()
+
+
+def rotate_signing_keys(force=False, now=None):
+    """
+    Scheduled rotation (run daily from cron).
+
+    When the signing key is older than JWT_KEY_ROTATION_DAYS, a new key is
+    created that starts signing after JWT_KEY_PUBLISH_AHEAD, so verifiers
+    have fetched it from the JWKS by then. Older keys retire when it
+    activates and expire once their last refresh token could have.
+    Expired keys are deleted. Returns (created_key or None, deleted_count).
+    """
+    from .models import SigningKey
+
+    now = now or timezone.now()
+    publish_ahead = timedelta(seconds=settings.JWT_KEY_PUBLISH_AHEAD)
+    token_lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+
+    deleted, _ = SigningKey.objects.filter(expires_at__lte=now).delete()
+
+    live = SigningKey.objects.filter(retires_at__isnull=True).order_by('-activates_at')
+    newest = live.first()
+    created = None
+    if newest is None:
+        created = create_signing_key(activates_at=now)
+    elif force or newest.activates_at <= now - timedelta(days=settings.JWT_KEY_ROTATION_DAYS):
+        if newest.activates_at > now:
+            # A rotation is already pending
+            return None, deleted
+        created = create_signing_key(activates_at=now + publish_ahead)
+        live.exclude(pk=created.pk).update(
+            retires_at=created.activates_at,
+            expires_at=created.activates_at + token_lifetime
+        )
+
+    if created:
+        get_keyring().keys(force=True)
+        logger.info(f"Created signing key {created.kid}, signing from {created.activates_at}")
+    return created, deleted
@@ -0,0 +1,140 @@
+import hashlib
+import statistics
+from time import perf_counter
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from accounts.hashers import scrypt_memory
+
+PASSWORD = b'benchmark-password-1234'
+SALT = b'benchmark-salt-16'
+
+# Below these, the profile is weaker than Django's own defaults
+PBKDF2_MIN_ITERATIONS = 720000
+SCRYPT_MIN_N = 2 ** 14
+
+MB = 1024 * 1024
+
+
+def median_ms(fn, samples):
+    timings = []
+    for _ in range(samples):
+        started = perf_counter()
+        fn()
+        timings.append((perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def time_pbkdf2(iterations, samples):
+    return median_ms(lambda: hashlib.pbkdf2_hmac('sha256', PASSWORD, SALT, iterations), samples)
+
+
+def time_scrypt(n, r, p, samples):
+    maxmem = scrypt_memory(n, r, p) + MB
+    return median_ms(lambda: hashlib.scrypt(PASSWORD, salt=SALT, n=n, r=r, p=p, maxmem=maxmem, dklen=64), samples)
+
+
+class Command(BaseCommand):
+    """
+    Measure what password hashing costs on this machine and recommend the
+    PASSWORD_HASH_PROFILE settings that hit a target login latency.
+    Run it on the production hardware, ideally while the host is idle.
+    """
+
+    help = 'Benchmark PBKDF2 and scrypt and recommend password hashing parameters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target-ms',
+            type=float,
+            default=250,
+            help='Time one password check may take'
+        )
+        parser.add_argument(
+            '--samples',
+            type=int,
+            default=3,
+            help='Timings per candidate (the median is used)'
+        )
+        parser.add_argument(
+            '--max-memory-mb',
+            type=int,
+            default=64,
+            help='Memory one scrypt hash may use; LOGIN_HASH_WORKERS hashes run at once'
+        )
+
+    def handle(self, *args, **options):
+        target = options['target_ms']
+        samples = options['samples']
+
+        self.stdout.write(f"Target: {target:g} ms per password check, median of {samples} runs\n")
+
+        self.stdout.write("Current profile:")
+        current_pbkdf2 = time_pbkdf2(settings.PASSWORD_PBKDF2_ITERATIONS, samples)
+        self.stdout.write(f"  pbkdf2  iterations={settings.PASSWORD_PBKDF2_ITERATIONS}: {current_pbkdf2:.1f} ms")
+        current_scrypt = time_scrypt(
+            settings.PASSWORD_SCRYPT_N, settings.PASSWORD_SCRYPT_R, settings.PASSWORD_SCRYPT_P, samples
+        )
+        self.stdout.write(
+            f"  scrypt  n={settings.PASSWORD_SCRYPT_N} r={settings.PASSWORD_SCRYPT_R} "
+            f"p={settings.PASSWORD_SCRYPT_P}: {current_scrypt:.1f} ms"
+        )
+        self.stdout.write(f"  (in use: {settings.PASSWORD_HASH_PROFILE})\n")
+
+        self.raised_to_default = False
+        iterations, pbkdf2_ms = self.tune_pbkdf2(target, samples)
+        scrypt_n, scrypt_ms = self.tune_scrypt(target, samples, options['max_memory_mb'] * MB)
+
+        self.stdout.write("\nRecommended settings:")
+        self.stdout.write(f"  # pbkdf2: {pbkdf2_ms:.1f} ms")
+        self.stdout.write("  PASSWORD_HASH_PROFILE=pbkdf2")
+        self.stdout.write(f"  PASSWORD_PBKDF2_ITERATIONS={iterations}")
+        if scrypt_n:
+            memory = scrypt_memory(scrypt_n, settings.PASSWORD_SCRYPT_R, settings.PASSWORD_SCRYPT_P) / MB
+            self.stdout.write(f"  # or scrypt (memory-hard, {memory:.0f} MB per hash): {scrypt_ms:.1f} ms")
+            self.stdout.write("  PASSWORD_HASH_PROFILE=scrypt")
+            self.stdout.write(f"  PASSWORD_SCRYPT_N={scrypt_n}")
+
+        if self.raised_to_default:
+            self.stdout.write(self.style.WARNING(
+                "\nThe target is too low to reach Django's default strength on this machine; "
+                "the recommendation was raised to the defaults. Consider a higher --target-ms "
+                "or more LOGIN_HASH_WORKERS."
+            ))
+        self.stdout.write(
+            "\nUsers are rehashed with the new profile on their next successful login."
+        )
+
+    def tune_pbkdf2(self, target, samples):
+        """Iteration count whose check takes about target ms (PBKDF2 cost is linear)."""
+        probe = 100000
+        per_iteration = time_pbkdf2(probe, samples) / probe
+        iterations = int(target / per_iteration) // 10000 * 10000
+        self.stdout.write(f"pbkdf2  {per_iteration * 1000000:.2f} ms per million iterations")
+        if iterations < PBKDF2_MIN_ITERATIONS:
+            self.raised_to_default = True
+            iterations = PBKDF2_MIN_ITERATIONS
+        return iterations, time_pbkdf2(iterations, samples)
+
+    def tune_scrypt(self, target, samples, max_memory):
+        """Largest power-of-two work factor within the target and memory budget."""
+        r, p = settings.PASSWORD_SCRYPT_R, settings.PASSWORD_SCRYPT_P
+        best_n, best_ms = SCRYPT_MIN_N, None
+        n = SCRYPT_MIN_N
+        while scrypt_memory(n, r, p) <= max_memory:
+            try:
+                elapsed = time_scrypt(n, r, p, samples)
+            except (MemoryError, ValueError) as e:
+                self.stdout.write(f"scrypt  n={n}: {str(e)}")
+                break
+            self.stdout.write(f"scrypt  n={n} ({scrypt_memory(n, r, p) / MB:.0f} MB): {elapsed:.1f} ms")
+            if elapsed > target and best_ms is not None:
+                break
+            best_n, best_ms = n, elapsed
+            if elapsed > target:
+                # Even the minimum is over the target
+                self.raised_to_default = True
+                break
+            n *= 2
+        if best_ms is None:
+            return None, None
+        return best_n, best_ms
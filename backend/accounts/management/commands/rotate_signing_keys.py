@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from accounts.keys import rotate_signing_keys
+from accounts.models import SigningKey
+
+
+class Command(BaseCommand):
+    """
+    Rotate the JWT signing keys. Meant to run daily from cron: it only
+    creates a key when the current one is older than JWT_KEY_ROTATION_DAYS,
+    and deletes keys whose last token has expired.
+    """
+
+    help = 'Publish a new JWT signing key when due and prune expired ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rotate now regardless of the current key\'s age'
+        )
+
+    def handle(self, *args, **options):
+        created, deleted = rotate_signing_keys(force=options['force'])
+
+        if deleted:
+            self.stdout.write(f"Deleted {deleted} expired signing keys")
+        if created:
+            self.stdout.write(self.style.SUCCESS(
+                f"Published key {created.kid}, signing from "
+                f"{timezone.localtime(created.activates_at):%Y-%m-%d %H:%M}"
+            ))
+        else:
+            self.stdout.write("No rotation due")
+
+        now = timezone.now()
+        for key in SigningKey.objects.all():
+            if key.activates_at > now:
+                state = 'pending'
+            elif key.retires_at and key.retires_at <= now:
+                state = 'verify-only'
+            else:
+                state = 'signing'
+            self.stdout.write(f"  {key.kid} {key.algorithm} {state}")
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.1 on 2026-10-19 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="token_version",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Bumped when the identity claims in issued tokens go stale",
+            ),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.0.1 on 2026-10-19 03:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_token_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SigningKey",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("kid", models.CharField(max_length=64, unique=True)),
+                (
+                    "algorithm",
+                    models.CharField(
+                        choices=[
+                            ("EdDSA", "EdDSA (Ed25519)"),
+                            ("RS256", "RS256 (RSA 2048)"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("private_key", models.TextField(help_text="PEM, encrypted at rest")),
+                ("public_jwk", models.JSONField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "activates_at",
+                    models.DateTimeField(help_text="Starts signing new tokens"),
+                ),
+                (
+                    "retires_at",
+                    models.DateTimeField(
+                        blank=True, help_text="Stops signing new tokens", null=True
+                    ),
+                ),
+                (
+                    "expires_at",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="Removed from the JWKS; its tokens stop verifying",
+                        null=True,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Signing Key",
+                "verbose_name_plural": "Signing Keys",
+                "db_table": "signing_keys",
+                "ordering": ["-activates_at"],
+            },
+        ),
+    ]
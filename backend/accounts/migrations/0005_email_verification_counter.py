@@ -0,0 +1,21 @@
+# Generated by Django 5.0.1 on 2026-10-19 03:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0004_revoked_tokens"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="email_verification_counter",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Bumped on resend; verification links carry it, so older links stop working",
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def create_first_signing_key(apps, schema_editor):
+    """Create the first key here, once, rather than on a racing first login."""
+    from accounts.keys import create_signing_key
+
+    SigningKey = apps.get_model("accounts", "SigningKey")
+    if settings.JWT_ASYMMETRIC_SIGNING and not SigningKey.objects.exists():
+        create_signing_key(model=SigningKey)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0005_email_verification_counter"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_first_signing_key, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,7 @@ import uuid
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.db import models
 from django.utils import timezone
+from django.utils.functional import cached_property
 
 
 class UserManager(BaseUserManager):
@@ -51,6 +52,14 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_email_verified = models.BooleanField(default=False)
     is_staff = models.BooleanField(default=False)
     is_superuser = models.BooleanField(default=False)
+    token_version = models.PositiveIntegerField(
+        default=0,
+        help_text="Bumped when the identity claims in issued tokens go stale"
+    )
+    email_verification_counter = models.PositiveIntegerField(
+        default=0,
+        help_text="Bumped on resend; verification links carry it, so older links stop working"
+    )
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -84,10 +93,37 @@ class User(AbstractBaseUser, PermissionsMixin):
     def is_admin(self):
         """Check if user is an admin."""
         return self.role == 'ADMIN'
+    
+    @cached_property
+    def identity_claims(self):
+        """The identity claims a token issued now would carry."""
+        from .tokens import build_claims
+        return build_claims(self)
+    
+    # Views read these the same way whether request.user is this model or
+    # the token-backed ClaimsPrincipal (accounts.authentication)
+    @property
+    def citizen_id(self):
+        from .tokens import CLAIM_CITIZEN_ID
+        return self.identity_claims[CLAIM_CITIZEN_ID]
+    
+    @property
+    def org_id(self):
+        from .tokens import CLAIM_ORG_ID
+        return self.identity_claims[CLAIM_ORG_ID]
+    
+    @property
+    def org_approval_status(self):
+        from .tokens import CLAIM_ORG_APPROVAL
+        return self.identity_claims[CLAIM_ORG_APPROVAL]
 
 
 class EmailVerificationToken(models.Model):
-    """Token for email verification."""
+    """
+    Token for email verification.
+    Legacy: links are now signed tokens (accounts.utils); rows are no
+    longer created and only outstanding ones are still honoured.
+    """
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='email_token')
     token = models.UUIDField(default=uuid.uuid4, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -101,3 +137,56 @@ class EmailVerificationToken(models.Model):
 
     class Meta:
         db_table = 'email_verification_tokens'
+
+
+class SigningKey(models.Model):
+    """
+    Asymmetric key pair used to sign JWTs.
+    Public halves are published at the JWKS endpoint so other services can
+    verify tokens locally. Keys are published before they start signing
+    and stay published until every token they signed has expired.
+    """
+    
+    ALGORITHM_CHOICES = [
+        ('EdDSA', 'EdDSA (Ed25519)'),
+        ('RS256', 'RS256 (RSA 2048)'),
+    ]
+    
+    kid = models.CharField(max_length=64, unique=True)
+    algorithm = models.CharField(max_length=10, choices=ALGORITHM_CHOICES)
+    private_key = models.TextField(help_text="PEM, encrypted at rest")
+    public_jwk = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    activates_at = models.DateTimeField(help_text="Starts signing new tokens")
+    retires_at = models.DateTimeField(null=True, blank=True, help_text="Stops signing new tokens")
+    expires_at = models.DateTimeField(null=True, blank=True, help_text="Removed from the JWKS; its tokens stop verifying")
+    
+    class Meta:
+        db_table = 'signing_keys'
+        verbose_name = 'Signing Key'
+        verbose_name_plural = 'Signing Keys'
+        ordering = ['-activates_at']
+    
+    def __str__(self):
+        return f"{self.kid} ({self.algorithm})"
+
+
+class RevokedToken(models.Model):
+    """
+    A revoked login session (or single token) or, with an empty key, every
+    token issued to the user up to revoked_at. Kept until the tokens it
+    covers would have expired anyway; checked through accounts.revocation.
+    """
+    key = models.CharField(max_length=64, blank=True, help_text="Session ID or JTI; empty revokes all of the user's tokens")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='revoked_tokens')
+    revoked_at = models.DateTimeField(default=timezone.now, db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        db_table = 'revoked_tokens'
+        verbose_name = 'Revoked Token'
+        verbose_name_plural = 'Revoked Tokens'
+        ordering = ['-revoked_at']
+    
+    def __str__(self):
+        return f"{self.key or 'all tokens'} ({self.user_id})"
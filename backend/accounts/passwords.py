@@ -0,0 +1,155 @@
+import asyncio
+import inspect
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import get_user_model, load_backend, user_login_failed
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import make_password, verify_password
+from django.core.exceptions import PermissionDenied
+
+logger = logging.getLogger(__name__)
+
+
+class LoginOverloaded(Exception):
+    """The password check pool is saturated; the login should be shed."""
+
+
+class PasswordCheckPool:
+    """
+    Bounded thread pool for password hashing.
+
+    hashlib releases the GIL while it hashes, so the workers run in
+    parallel, but at most `workers` hashes use CPU at once no matter how
+    many logins arrive. Up to `max_queue` more may wait; beyond that
+    submit() raises LoginOverloaded instead of queueing, so a login storm
+    gets fast 503s rather than latency that spills onto other endpoints.
+    """
+
+    def __init__(self, workers, max_queue):
+        self.workers = workers
+        self.max_pending = workers + max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-check')
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        """Checks running or queued."""
+        return self._pending
+
+    def submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise LoginOverloaded
+            self._pending += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future=None):
+        with self._lock:
+            self._pending -= 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_password_pool():
+    """Return the process-wide password check pool."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PasswordCheckPool(settings.LOGIN_HASH_WORKERS, settings.LOGIN_HASH_MAX_QUEUE)
+    return _pool
+
+
+async def run_hasher(fn, *args):
+    """
+    Run a hashing function in the pool without blocking the event loop.
+    Raises LoginOverloaded when the pool is full or the result doesn't
+    arrive within LOGIN_HASH_TIMEOUT seconds.
+    """
+    future = get_password_pool().submit(fn, *args)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), settings.LOGIN_HASH_TIMEOUT)
+    except asyncio.TimeoutError:
+        future.cancel()
+        raise LoginOverloaded
+
+
+async def _model_backend_authenticate(backend, username=None, password=None, **kwargs):
+    """
+    ModelBackend.authenticate() with the hashing moved to the bounded
+    pool. Unknown emails still cost one hash, so response times don't
+    reveal which accounts exist. Passwords stored with an outdated hasher
+    or work factor are upgraded.
+    """
+    User = get_user_model()
+    if username is None:
+        username = kwargs.get(User.USERNAME_FIELD)
+    if username is None or password is None:
+        return None
+
+    user = await User._default_manager.filter(**{User.USERNAME_FIELD: username}).afirst()
+    if user is None:
+        await run_hasher(make_password, password)
+        return None
+
+    is_correct, must_update = await run_hasher(verify_password, password, user.password)
+    if not is_correct or not backend.user_can_authenticate(user):
+        return None
+
+    if must_update:
+        try:
+            user.password = await run_hasher(make_password, password)
+        except LoginOverloaded:
+            # Upgrading can wait for the next login
+            return user
+        await user.asave(update_fields=['password'])
+        logger.info(f"Upgraded password hash of user {user.pk}")
+    return user
+
+
+async def authenticate_async(request=None, **credentials):
+    """
+    Async counterpart of django.contrib.auth.authenticate(): tries each of
+    AUTHENTICATION_BACKENDS in turn and sends user_login_failed when none
+    accepts the credentials. The model backend hashes in the bounded pool
+    (raising LoginOverloaded when it is full); other backends run in a
+    thread as they would under authenticate().
+    """
+    for backend_path in settings.AUTHENTICATION_BACKENDS:
+        backend = load_backend(backend_path)
+        try:
+            inspect.signature(backend.authenticate).bind(request, **credentials)
+        except TypeError:
+            # This backend doesn't accept these credentials
+            continue
+        try:
+            if type(backend).authenticate is ModelBackend.authenticate:
+                user = await _model_backend_authenticate(backend, **credentials)
+            else:
+                user = await sync_to_async(backend.authenticate)(request, **credentials)
+        except PermissionDenied:
+            break
+        if user is None:
+            continue
+        user.backend = backend_path
+        return user
+
+    await user_login_failed.asend(
+        sender=auth.__name__,
+        credentials=auth._clean_credentials(credentials),
+        request=request
+    )
+    return None
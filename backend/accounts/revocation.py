@@ -0,0 +1,181 @@
+import logging
+import threading
+from time import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from .tokens import CLAIM_ISSUED_MS, CLAIM_SESSION
+
+logger = logging.getLogger(__name__)
+
+# Rows are read by revoked_at; look back this far on every sync so a row
+# committed late by a slow transaction is still picked up
+SYNC_OVERLAP = timedelta(seconds=30)
+
+
+def revocation_key(payload):
+    """The session ID a token belongs to, or its own JTI for tokens without one."""
+    return payload.get(CLAIM_SESSION) or payload.get(api_settings.JTI_CLAIM)
+
+
+def issued_at(payload):
+    """Issue time in seconds, to the millisecond for tokens that record it."""
+    if CLAIM_ISSUED_MS in payload:
+        return payload[CLAIM_ISSUED_MS] / 1000
+    return payload.get('iat', 0)
+
+
+class RevocationList:
+    """
+    Per-worker copy of the revoked_tokens table.
+
+    Lookups are a dict hit and never touch the database. Entries are also
+    filed in a time wheel of expiry buckets; once a bucket's time has
+    passed, its entries are dropped in one go instead of being scanned.
+    New rows are pulled in every sync_interval seconds by whichever
+    request comes along first.
+    """
+
+    def __init__(self, bucket_seconds, sync_interval):
+        self.bucket_seconds = bucket_seconds
+        self.sync_interval = sync_interval
+        self._keys = {}   # key -> expiry timestamp
+        self._users = {}  # user_id -> (cutoff timestamp, expiry timestamp)
+        self._wheel = {}  # bucket number -> [(kind, key or user_id)]
+        self._current_bucket = int(time() // bucket_seconds)
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._synced_at = None
+        self._next_sync = 0
+
+    def __len__(self):
+        return len(self._keys) + len(self._users)
+
+    def add(self, key, user_id, revoked_at, expires_at):
+        """Remember a revocation until expires_at (timestamps in seconds)."""
+        if expires_at <= time():
+            return
+        bucket = int(expires_at // self.bucket_seconds)
+        with self._lock:
+            if key:
+                if self._keys.get(key, 0) >= expires_at:
+                    return
+                self._keys[key] = expires_at
+                entry = ('key', key)
+            else:
+                cutoff, expiry = self._users.get(user_id, (0, 0))
+                self._users[user_id] = (max(cutoff, revoked_at), max(expiry, expires_at))
+                entry = ('user', user_id)
+            self._wheel.setdefault(bucket, []).append(entry)
+
+    def advance(self, now):
+        """Drop the entries of every bucket whose time has passed."""
+        bucket = int(now // self.bucket_seconds)
+        if bucket <= self._current_bucket:
+            return
+        with self._lock:
+            for expired in range(self._current_bucket, bucket):
+                for kind, ident in self._wheel.pop(expired, ()):
+                    # Skip entries that were re-added with a later expiry
+                    if kind == 'key':
+                        if self._keys.get(ident, 0) <= now:
+                            self._keys.pop(ident, None)
+                    elif self._users.get(ident, (0, 0))[1] <= now:
+                        self._users.pop(ident, None)
+            self._current_bucket = bucket
+
+    def sync(self):
+        """Pull rows revoked by other workers since the last sync."""
+        from .models import RevokedToken
+
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            started = timezone.now()
+            rows = RevokedToken.objects.filter(expires_at__gt=started)
+            if self._synced_at is not None:
+                rows = rows.filter(revoked_at__gte=self._synced_at - SYNC_OVERLAP)
+            for key, user_id, revoked_at, expires_at in rows.values_list(
+                'key', 'user_id', 'revoked_at', 'expires_at'
+            ).order_by():
+                self.add(key, user_id, revoked_at.timestamp(), expires_at.timestamp())
+            self._synced_at = started
+        except DatabaseError as e:
+            logger.error(f"Could not sync revoked tokens: {str(e)}")
+        finally:
+            self._next_sync = time() + self.sync_interval
+            self._sync_lock.release()
+
+    def is_revoked(self, payload):
+        now = time()
+        if now >= self._next_sync:
+            self.sync()
+        self.advance(now)
+
+        if revocation_key(payload) in self._keys:
+            return True
+        user_entry = self._users.get(payload.get(api_settings.USER_ID_CLAIM))
+        return user_entry is not None and issued_at(payload) < user_entry[0]
+
+
+_revocations = None
+_revocations_lock = threading.Lock()
+
+
+def get_revocation_list():
+    """Return the process-wide revocation list."""
+    global _revocations
+    if _revocations is None:
+        with _revocations_lock:
+            if _revocations is None:
+                _revocations = RevocationList(
+                    settings.JWT_REVOCATION_BUCKET_SECONDS,
+                    settings.JWT_REVOCATION_SYNC_INTERVAL
+                )
+    return _revocations
+
+
+def is_revoked(payload):
+    """Whether a validated token's session, JTI or user has been revoked."""
+    return get_revocation_list().is_revoked(payload)
+
+
+def _max_token_lifetime():
+    # A session's refresh token (and the access tokens minted from it)
+    # can't outlive this, counted from the moment it is revoked
+    return max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+
+
+def _store(key, user_id, expires_at):
+    from .models import RevokedToken
+
+    now = timezone.now()
+    RevokedToken.objects.filter(expires_at__lte=now).delete()
+    record = RevokedToken.objects.create(key=key, user_id=user_id, revoked_at=now, expires_at=expires_at)
+    get_revocation_list().add(key, user_id, now.timestamp(), expires_at.timestamp())
+    return record
+
+
+def revoke_token(token):
+    """
+    Revoke the session a token belongs to: its refresh token and every
+    access token minted from it. Tokens without a session ID (issued
+    before sessions were tracked) are revoked on their own.
+    """
+    payload = token.payload
+    if payload.get(CLAIM_SESSION):
+        expires_at = timezone.now() + _max_token_lifetime()
+    else:
+        expires_at = datetime.fromtimestamp(payload['exp'], tz=dt_timezone.utc)
+    return _store(revocation_key(payload), payload[api_settings.USER_ID_CLAIM], expires_at)
+
+
+def revoke_user_tokens(user_id):
+    """Revoke every token issued to a user so far, e.g. when the account is disabled."""
+    from .authentication import forget_users
+
+    record = _store('', user_id, timezone.now() + _max_token_lifetime())
+    forget_users([user_id])
+    return record
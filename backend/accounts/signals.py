@@ -0,0 +1,26 @@
+from functools import partial
+from django.db import transaction
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+from .models import User
+from .revocation import revoke_user_tokens
+
+
+@receiver(post_init, sender=User)
+def remember_is_active(sender, instance, **kwargs):
+    """Keep the loaded is_active so a save can tell it was switched off."""
+    instance._loaded_is_active = instance.__dict__.get('is_active')
+
+
+@receiver(post_save, sender=User)
+def revoke_tokens_of_disabled_user(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Disabling an account, from the admin or anywhere else that saves the
+    user, also ends the sessions it already has. QuerySet.update() sends
+    no signals; call revoke_user_tokens() after bulk updates.
+    """
+    if update_fields is not None and 'is_active' not in update_fields:
+        return
+    if not created and instance._loaded_is_active and not instance.is_active:
+        transaction.on_commit(partial(revoke_user_tokens, instance.pk))
+    instance._loaded_is_active = instance.is_active
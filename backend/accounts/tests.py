@@ -1,3 +1,438 @@
-from django.test import TestCase
+import time
+from io import StringIO
+from datetime import date, timedelta
+from unittest import mock
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ed25519
+from django.contrib.auth import user_login_failed
+from django.contrib.auth.hashers import check_password, identify_hasher
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.exceptions import ImproperlyConfigured, PermissionDenied
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenBackendError
+from rest_framework.throttling import AnonRateThrottle
+from rest_framework.test import APIClient
+from credentials.models import VerificationHistory
+from identity.models import CitizenProfile
+from organizations.models import Organization, OrgUser
+from .authentication import forget_users
+from .hashers import TunedPBKDF2PasswordHasher
+from .management.commands import benchmark_hashers
+from .keys import get_keyring, rotate_signing_keys, token_backend
+from .models import SigningKey, User
+from .passwords import LoginOverloaded, get_password_pool
+from .revocation import revoke_user_tokens
+from .tokens import CLAIM_ISSUED_MS, issue_tokens
+from .utils import make_email_verification_token
 
-# Create your tests here.
+
+class AccountsTestCase(TestCase):
+    """Clients authenticate with real tokens, as they do in production."""
+
+    def make_user(self, email, **fields):
+        user = User.objects.create_user(email=email, password='Pass12345!x', **fields)
+        # IDs are reused once a test's rows are rolled back
+        forget_users([user.pk])
+        return user
+
+    def client_for(self, user, refresh=None):
+        client = APIClient()
+        refresh = refresh or issue_tokens(user)
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        return client
+
+
+class IdentityClaimsTests(AccountsTestCase):
+
+    def make_organization(self, name):
+        return Organization.objects.create(
+            name=name, org_type='Bank', registration_number=name, approval_status='APPROVED'
+        )
+
+    def make_citizen(self, user):
+        return CitizenProfile.objects.create(
+            user=user, full_name='Citizen', nid_number_hash=f'hash-{user.pk}',
+            date_of_birth=date(1990, 1, 1), residency_district='Dhaka'
+        )
+
+    def test_profile_created_after_login_reaches_the_token(self):
+        user = self.make_user('citizen@example.com')
+        client = self.client_for(user)
+        self.assertEqual(client.get('/api/v1/consent/grants').status_code, 404)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_citizen(user)
+        user.refresh_from_db()
+        self.assertEqual(user.token_version, 1)
+        # The stale token is answered from the database until refreshed
+        self.assertEqual(client.get('/api/v1/consent/grants').status_code, 200)
+
+    def test_org_views_scope_by_org_claim(self):
+        organization = self.make_organization('Bank A')
+        other = self.make_organization('Bank B')
+        user = self.make_user('verifier@example.com', role='ORG_USER')
+        with self.captureOnCommitCallbacks(execute=True):
+            OrgUser.objects.create(user=user, organization=organization)
+
+        citizen = self.make_citizen(self.make_user('citizen@example.com'))
+        mine = VerificationHistory.objects.create(organization=organization, citizen=citizen)
+        VerificationHistory.objects.create(organization=other, citizen=citizen)
+
+        client = self.client_for(user)
+        history = client.get('/api/v1/credentials/history')
+        self.assertEqual([entry['id'] for entry in history.json()], [mine.id])
+
+        dashboard = client.get('/api/v1/organizations/dashboard')
+        self.assertEqual(dashboard.status_code, 200)
+        self.assertEqual(dashboard.json()['organization']['id'], organization.id)
+        self.assertTrue(dashboard.json()['is_approved'])
+
+    def test_model_user_answers_like_the_principal(self):
+        user = self.make_user('citizen@example.com')
+        profile = self.make_citizen(user)
+        user = User.objects.get(pk=user.pk)
+        self.assertEqual((user.citizen_id, user.org_id, user.org_approval_status), (profile.id, None, None))
+
+
+class RevocationTests(AccountsTestCase):
+
+    def setUp(self):
+        self.user = self.make_user('citizen@example.com')
+
+    def test_logout_revokes_the_whole_session(self):
+        refresh = issue_tokens(self.user)
+        client = self.client_for(self.user, refresh)
+        self.assertEqual(client.get('/api/v1/auth/me').status_code, 200)
+
+        self.assertEqual(client.post('/api/v1/auth/logout', {'refresh': str(refresh)}, format='json').status_code, 200)
+        self.assertEqual(client.get('/api/v1/auth/me').status_code, 401)
+        response = APIClient().post('/api/v1/auth/refresh', {'refresh': str(refresh)}, format='json')
+        self.assertEqual(response.status_code, 401)
+        # Other sessions are unaffected
+        self.assertEqual(self.client_for(self.user).get('/api/v1/auth/me').status_code, 200)
+
+    def test_login_right_after_revoking_all_tokens_is_accepted(self):
+        before = self.client_for(self.user)
+        revoke_user_tokens(self.user.pk)
+        # Issued within the same second as the revocation
+        after = issue_tokens(self.user)
+        self.assertEqual(before.get('/api/v1/auth/me').status_code, 401)
+        self.assertEqual(self.client_for(self.user, after).get('/api/v1/auth/me').status_code, 200)
+
+    def test_access_tokens_keep_their_own_issue_time(self):
+        refresh = issue_tokens(self.user)
+        refresh.payload[CLAIM_ISSUED_MS] -= 60000
+        access = refresh.access_token
+        self.assertGreaterEqual(access[CLAIM_ISSUED_MS], refresh[CLAIM_ISSUED_MS] + 60000)
+        self.assertEqual(access[CLAIM_ISSUED_MS] // 1000, access['iat'])
+
+    def test_disabling_the_account_revokes_its_tokens(self):
+        client = self.client_for(self.user)
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        # Even once re-enabled behind the model's back, old tokens stay revoked
+        User.objects.filter(pk=self.user.pk).update(is_active=True)
+        forget_users([self.user.pk])
+        self.assertEqual(client.get('/api/v1/auth/me').status_code, 401)
+        self.assertEqual(self.client_for(self.user).get('/api/v1/auth/me').status_code, 200)
+
+    def test_other_saves_do_not_revoke(self):
+        client = self.client_for(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+            self.user.save(update_fields=['last_login'])
+        self.assertEqual(client.get('/api/v1/auth/me').status_code, 200)
+
+
+@override_settings(VERIFICATION_TOKEN_EXPIRY=30)
+class EmailVerificationTests(AccountsTestCase):
+
+    def setUp(self):
+        self.user = self.make_user('citizen@example.com')
+
+    def verify(self, token):
+        return APIClient().post('/api/v1/auth/verify-email', {'token': token}, format='json')
+
+    def assertVerified(self, verified):
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.is_email_verified, verified)
+
+    def test_valid_link_verifies_the_email(self):
+        response = self.verify(make_email_verification_token(self.user))
+        self.assertEqual(response.status_code, 200)
+        self.assertVerified(True)
+
+    def test_link_works_from_a_get_request(self):
+        token = make_email_verification_token(self.user)
+        response = APIClient().get('/api/v1/auth/verify-email', {'token': token})
+        self.assertEqual(response.status_code, 200)
+        self.assertVerified(True)
+
+    def test_expired_link_is_rejected(self):
+        issued = time.time() - 31 * 60
+        with mock.patch('django.core.signing.time.time', return_value=issued):
+            token = make_email_verification_token(self.user)
+        response = self.verify(token)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('expired', response.json()['error'])
+        self.assertVerified(False)
+
+    def test_link_inside_expiry_window_is_accepted(self):
+        issued = time.time() - 29 * 60
+        with mock.patch('django.core.signing.time.time', return_value=issued):
+            token = make_email_verification_token(self.user)
+        self.assertEqual(self.verify(token).status_code, 200)
+
+    def test_resend_supersedes_earlier_links(self):
+        earlier = make_email_verification_token(self.user)
+        response = APIClient().post('/api/v1/auth/resend-verification', {'email': self.user.email}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.verify(earlier).status_code, 400)
+        self.assertVerified(False)
+        self.user.refresh_from_db()
+        self.assertEqual(self.verify(make_email_verification_token(self.user)).status_code, 200)
+        self.assertVerified(True)
+
+    def test_link_for_a_previous_email_is_rejected(self):
+        token = make_email_verification_token(self.user)
+        User.objects.filter(pk=self.user.pk).update(email='moved@example.com')
+        self.assertEqual(self.verify(token).status_code, 400)
+        self.assertVerified(False)
+
+    def test_tampered_link_is_rejected(self):
+        token = make_email_verification_token(self.user)
+        tampered = token[:-1] + ('A' if token[-1] != 'A' else 'B')
+        self.assertEqual(self.verify(tampered).status_code, 400)
+        self.assertEqual(self.verify('not-a-token').status_code, 400)
+        self.assertVerified(False)
+
+
+class DenyAllBackend:
+    """Authentication backend that vetoes every login."""
+
+    def authenticate(self, request, email=None, password=None):
+        raise PermissionDenied
+
+
+class LoginTests(AccountsTestCase):
+
+    def setUp(self):
+        self.user = self.make_user('citizen@example.com', is_email_verified=True)
+        self.failures = []
+        user_login_failed.connect(self.record_failure)
+        self.addCleanup(user_login_failed.disconnect, self.record_failure)
+
+    def record_failure(self, sender, credentials, request, **kwargs):
+        self.failures.append(credentials)
+
+    def login(self, email='citizen@example.com', password='Pass12345!x'):
+        return self.client.post('/api/v1/auth/login', {'email': email, 'password': password}, content_type='application/json')
+
+    def test_valid_credentials_return_tokens(self):
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user']['email'], 'citizen@example.com')
+        access = response.json()['tokens']['access']
+        me = APIClient().get('/api/v1/auth/me', HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(me.status_code, 200)
+        self.assertEqual(self.failures, [])
+
+    def test_failed_login_sends_user_login_failed(self):
+        for email, password in [('citizen@example.com', 'wrong-pass'), ('nobody@example.com', 'Pass12345!x')]:
+            response = self.login(email, password)
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(response.json()['error']['code'], 'INVALID_CREDENTIALS')
+        self.assertEqual([credentials['email'] for credentials in self.failures], ['citizen@example.com', 'nobody@example.com'])
+        # Passwords are masked, as authenticate() does
+        self.assertNotIn('wrong-pass', self.failures[0]['password'])
+
+    def test_unverified_email_is_refused(self):
+        User.objects.filter(pk=self.user.pk).update(is_email_verified=False)
+        response = self.login()
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()['error']['code'], 'EMAIL_NOT_VERIFIED')
+
+    @override_settings(AUTHENTICATION_BACKENDS=[
+        'accounts.tests.DenyAllBackend', 'django.contrib.auth.backends.ModelBackend'
+    ])
+    def test_configured_backends_are_consulted(self):
+        self.assertEqual(self.login().status_code, 401)
+        self.assertEqual(len(self.failures), 1)
+
+    def test_saturated_pool_sheds_the_login(self):
+        with mock.patch.object(get_password_pool(), 'submit', side_effect=LoginOverloaded):
+            response = self.login()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['error']['code'], 'LOGIN_BUSY')
+        self.assertIn('Retry-After', response)
+
+    @override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_CLASSES': ['rest_framework.throttling.AnonRateThrottle']})
+    def test_default_throttles_apply(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        with mock.patch.object(AnonRateThrottle, 'THROTTLE_RATES', {'anon': '2/min'}):
+            statuses = [self.login(password='wrong-pass').status_code for _ in range(3)]
+        self.assertEqual(statuses, [401, 401, 429])
+
+
+class PasswordUpgradeTests(AccountsTestCase):
+
+    def setUp(self):
+        self.user = self.make_user('citizen@example.com', is_email_verified=True)
+        # Hashed under an older, cheaper profile
+        old_hash = TunedPBKDF2PasswordHasher().encode('Pass12345!x', 'oldsalt', iterations=1000)
+        User.objects.filter(pk=self.user.pk).update(password=old_hash)
+
+    def login(self, password):
+        return self.client.post('/api/v1/auth/login', {'email': 'citizen@example.com', 'password': password}, content_type='application/json')
+
+    def test_login_rehashes_with_the_configured_hasher(self):
+        self.assertEqual(self.login('Pass12345!x').status_code, 200)
+        self.user.refresh_from_db()
+        hasher = TunedPBKDF2PasswordHasher()
+        self.assertIsInstance(identify_hasher(self.user.password), TunedPBKDF2PasswordHasher)
+        self.assertEqual(hasher.decode(self.user.password)['iterations'], hasher.iterations)
+        self.assertFalse(hasher.must_update(self.user.password))
+        self.assertTrue(check_password('Pass12345!x', self.user.password))
+
+    def test_failed_login_keeps_the_old_hash(self):
+        self.assertEqual(self.login('wrong-pass').status_code, 401)
+        self.user.refresh_from_db()
+        self.assertIn('$1000$oldsalt$', self.user.password)
+
+
+class BenchmarkHashersTests(TestCase):
+
+    def benchmark(self, *args):
+        out = StringIO()
+        call_command('benchmark_hashers', *args, stdout=out)
+        return out.getvalue()
+
+    def test_recommends_settings_for_the_target(self):
+        # 4 ms per thousand PBKDF2 iterations; scrypt takes n / 1000 ms
+        with mock.patch.object(benchmark_hashers, 'time_pbkdf2', side_effect=lambda iterations, samples: iterations / 250), \
+                mock.patch.object(benchmark_hashers, 'time_scrypt', side_effect=lambda n, r, p, samples: n / 1000):
+            output = self.benchmark('--target-ms', '4000', '--max-memory-mb', '64')
+        recommended = output.split('Recommended settings:')[1]
+        self.assertIn('PASSWORD_PBKDF2_ITERATIONS=1000000', recommended)
+        # 2**16 would need more than 64 MB
+        self.assertIn('PASSWORD_SCRYPT_N=32768', recommended)
+        self.assertNotIn('raised to the defaults', output)
+
+    def test_low_target_is_raised_to_the_defaults(self):
+        output = self.benchmark('--target-ms', '1', '--samples', '1', '--max-memory-mb', '17')
+        recommended = output.split('Recommended settings:')[1]
+        self.assertIn(f'PASSWORD_PBKDF2_ITERATIONS={benchmark_hashers.PBKDF2_MIN_ITERATIONS}', recommended)
+        self.assertIn(f'PASSWORD_SCRYPT_N={benchmark_hashers.SCRYPT_MIN_N}', recommended)
+        self.assertIn('raised to the defaults', output)
+
+
+class SigningKeyTests(AccountsTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Forget keys created or changed by these tests once they roll back
+        cls.addClassCleanup(get_keyring().keys, force=True)
+
+    def setUp(self):
+        self.keyring = get_keyring()
+        self.keyring.keys(force=True)
+        self.user = self.make_user('citizen@example.com')
+
+    def access_token(self):
+        # str() signs again on every call, with whichever key is current
+        return str(issue_tokens(self.user).access_token)
+
+    def kid(self, token):
+        return jwt.get_unverified_header(token)['kid']
+
+    def me(self, token):
+        return APIClient().get('/api/v1/auth/me', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_first_key_comes_from_the_migration(self):
+        [key] = SigningKey.objects.all()
+        self.assertEqual(self.keyring.signing_key().kid, key.kid)
+
+        SigningKey.objects.all().delete()
+        self.keyring.keys(force=True)
+        with self.assertRaises(ImproperlyConfigured):
+            self.keyring.signing_key()
+        self.assertFalse(SigningKey.objects.exists())
+
+    def test_eddsa_token_round_trip(self):
+        token = self.access_token()
+        header = jwt.get_unverified_header(token)
+        self.assertEqual((header['alg'], header['kid']), ('EdDSA', self.keyring.signing_key().kid))
+        self.assertEqual(token_backend.decode(token)['user_id'], self.user.pk)
+        self.assertEqual(self.me(token).status_code, 200)
+
+    def test_unknown_kid_is_rejected(self):
+        payload = {'user_id': self.user.pk, 'token_type': 'access', 'exp': int(time.time()) + 60}
+        token = jwt.encode(payload, ed25519.Ed25519PrivateKey.generate(), algorithm='EdDSA', headers={'kid': 'unknown'})
+        with self.assertRaises(TokenBackendError):
+            token_backend.decode(token)
+        self.assertEqual(self.me(token).status_code, 401)
+
+    def test_expired_key_stops_verifying(self):
+        token = self.access_token()
+        SigningKey.objects.filter(kid=self.kid(token)).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.keyring.keys(force=True)
+        with self.assertRaises(TokenBackendError):
+            token_backend.decode(token)
+        self.assertNotIn(self.kid(token), [key['kid'] for key in self.client.get('/.well-known/jwks.json').json()['keys']])
+
+    def test_rotated_key_signs_while_the_old_one_verifies(self):
+        old_token = self.access_token()
+        old_kid = self.kid(old_token)
+        created, deleted = rotate_signing_keys(force=True)
+        self.assertEqual(deleted, 0)
+        # Published ahead, but the old key signs until the new one activates
+        self.assertGreater(created.activates_at, timezone.now())
+        self.assertEqual(self.kid(self.access_token()), old_kid)
+        self.assertIsNone(rotate_signing_keys(force=True)[0])
+
+        with mock.patch('accounts.keys.timezone.now', return_value=created.activates_at + timedelta(seconds=1)):
+            new_token = self.access_token()
+            self.assertEqual(self.kid(new_token), created.kid)
+            self.assertEqual(token_backend.decode(old_token)['user_id'], self.user.pk)
+        self.assertEqual(token_backend.decode(new_token)['user_id'], self.user.pk)
+        old = SigningKey.objects.get(kid=old_kid)
+        self.assertEqual(old.retires_at, created.activates_at)
+        self.assertGreater(old.expires_at, old.retires_at)
+
+    def test_jwks_publishes_public_keys_only(self):
+        created, _ = rotate_signing_keys(force=True)
+        response = self.client.get('/.well-known/jwks.json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('max-age=', response['Cache-Control'])
+        keys = response.json()['keys']
+        # Oldest first, the pending key included
+        self.assertEqual([key['kid'] for key in keys][-1], created.kid)
+        for key in keys:
+            self.assertEqual(
+                {name: key[name] for name in ('kty', 'crv', 'alg', 'use')},
+                {'kty': 'OKP', 'crv': 'Ed25519', 'alg': 'EdDSA', 'use': 'sig'}
+            )
+            self.assertNotIn('d', key)
+        self.assertEqual(self.client.get('/api/v1/auth/jwks').json(), response.json())
+        repeat = self.client.get('/.well-known/jwks.json', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+
+    def test_legacy_hs256_tokens_until_turned_off(self):
+        with override_settings(JWT_ASYMMETRIC_SIGNING=False):
+            token = self.access_token()
+        header = jwt.get_unverified_header(token)
+        self.assertEqual(header['alg'], 'HS256')
+        self.assertNotIn('kid', header)
+
+        self.assertEqual(self.me(token).status_code, 200)
+        with override_settings(JWT_ACCEPT_LEGACY_HS256=False):
+            self.assertEqual(self.me(token).status_code, 401)
+            with self.assertRaises(TokenBackendError):
+                token_backend.decode(token)
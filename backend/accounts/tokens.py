@@ -0,0 +1,125 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken as BaseAccessToken
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+from .keys import token_backend
+
+# Identity claims embedded at login so requests can be authenticated
+# without loading the user (see accounts.authentication)
+CLAIM_EMAIL = 'email'
+CLAIM_ROLE = 'role'
+CLAIM_CITIZEN_ID = 'cid'
+CLAIM_ORG_ID = 'oid'
+CLAIM_ORG_APPROVAL = 'oas'
+CLAIM_VERSION = 'ver'
+# ID of the login session, shared by its refresh token and every access
+# token minted from it, so logout can revoke them together
+CLAIM_SESSION = 'sid'
+# Issue time in milliseconds; iat has whole seconds only, which can't
+# tell a token issued just after a revocation from one issued before it
+CLAIM_ISSUED_MS = 'ims'
+
+
+class IssuedAtMillisMixin:
+    """Records the issue time to the millisecond alongside iat."""
+
+    def set_iat(self, claim='iat', at_time=None):
+        super().set_iat(claim, at_time)
+        at_time = at_time or self.current_time
+        self.payload[CLAIM_ISSUED_MS] = int(at_time.timestamp() * 1000)
+
+
+class AccessToken(IssuedAtMillisMixin, BaseAccessToken):
+    """Access token signed with the rotating key set (see accounts.keys)."""
+    _token_backend = token_backend
+
+
+class RefreshToken(IssuedAtMillisMixin, BaseRefreshToken):
+    """Refresh token signed with the rotating key set (see accounts.keys)."""
+    _token_backend = token_backend
+    access_token_class = AccessToken
+    # Access tokens keep their own issue time
+    no_copy_claims = BaseRefreshToken.no_copy_claims + (CLAIM_ISSUED_MS,)
+
+
+def build_claims(user):
+    """Claims describing who the user is, read from the database."""
+    from identity.models import CitizenProfile
+    from organizations.models import OrgUser
+
+    claims = {
+        CLAIM_EMAIL: user.email,
+        CLAIM_ROLE: user.role,
+        CLAIM_CITIZEN_ID: None,
+        CLAIM_ORG_ID: None,
+        CLAIM_ORG_APPROVAL: None,
+        CLAIM_VERSION: user.token_version,
+    }
+    if user.role == 'CITIZEN':
+        claims[CLAIM_CITIZEN_ID] = (
+            CitizenProfile.objects.filter(user_id=user.pk).values_list('id', flat=True).first()
+        )
+    elif user.role == 'ORG_USER':
+        org = (
+            OrgUser.objects.filter(user_id=user.pk)
+            .values_list('organization_id', 'organization__approval_status')
+            .first()
+        )
+        if org:
+            claims[CLAIM_ORG_ID], claims[CLAIM_ORG_APPROVAL] = org
+    return claims
+
+
+def issue_tokens(user):
+    """Refresh token (and, through it, access tokens) carrying the user's claims."""
+    refresh = RefreshToken.for_user(user)
+    refresh[CLAIM_SESSION] = refresh[api_settings.JTI_CLAIM]
+    for claim, value in build_claims(user).items():
+        refresh[claim] = value
+    return refresh
+
+
+def bump_token_version(user_ids):
+    """
+    Mark the claims in every outstanding token of these users as stale,
+    e.g. after a role, profile or organization approval change. Stale
+    tokens still authenticate, but from the database, until refreshed.
+    """
+    from .authentication import forget_users
+
+    user_ids = list(user_ids)
+    get_user_model().objects.filter(pk__in=user_ids).update(token_version=F('token_version') + 1)
+    forget_users(user_ids)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh that re-reads the claims, so a refreshed access token is never stale."""
+
+    token_class = RefreshToken
+
+    def validate(self, attrs):
+        from .revocation import is_revoked
+
+        refresh = self.token_class(attrs['refresh'])
+        if is_revoked(refresh.payload):
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        user = get_user_model().objects.filter(
+            pk=refresh[api_settings.USER_ID_CLAIM],
+            is_active=True
+        ).first()
+        if user is None:
+            raise AuthenticationFailed('User is inactive or no longer exists', code='user_inactive')
+
+        for claim, value in build_claims(user).items():
+            refresh[claim] = value
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
@@ -9,5 +9,7 @@ urlpatterns = [
     path('logout', views.logout, name='logout'),
     path('refresh', TokenRefreshView.as_view(), name='token-refresh'),
     path('verify-email', views.verify_email, name='verify-email'),
+    path('jwks', views.jwks, name='jwks'),
+    path('set-password', views.set_password, name='set-password'),
     path('resend-verification', views.resend_verification, name='resend-verification'),
 ]
@@ -1,66 +1,138 @@
+import hashlib
 import logging
-from django.core.mail import send_mail
 from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core import signing
+from django.db.models import F
 from django.template.loader import render_to_string
+from django.utils.encoding import force_bytes
 from django.utils.html import strip_tags
-from .models import EmailVerificationToken
+from django.utils.http import urlsafe_base64_encode
+from notifications.outbox import enqueue_email
+from .models import EmailVerificationToken, User
 
 logger = logging.getLogger(__name__)
 
-def send_verification_email(user):
+EMAIL_VERIFICATION_SALT = 'accounts.email-verification'
+
+
+def _email_digest(email):
+    # Ties the token to the address without putting the address in the link
+    return hashlib.sha256(email.lower().encode()).hexdigest()[:16]
+
+
+def make_email_verification_token(user):
+    """
+    Signed, timestamped verification token carrying the user ID, a digest
+    of their email and their issuance counter. Nothing is stored.
+    """
+    return signing.dumps(
+        [user.pk, _email_digest(user.email), user.email_verification_counter],
+        salt=EMAIL_VERIFICATION_SALT
+    )
+
+
+def check_email_verification_token(token):
+    """
+    Return the user a verification token was issued to.
+    Raises signing.SignatureExpired for expired tokens and
+    signing.BadSignature for invalid ones, including tokens superseded by
+    a resend or issued for a different email address.
     """
-    Send verification email to user with token link.
+    user_id, digest, counter = signing.loads(
+        token,
+        salt=EMAIL_VERIFICATION_SALT,
+        max_age=settings.VERIFICATION_TOKEN_EXPIRY * 60
+    )
+    user = User.objects.filter(pk=user_id).first()
+    if (
+        user is None
+        or counter != user.email_verification_counter
+        or digest != _email_digest(user.email)
+    ):
+        raise signing.BadSignature('Verification token is no longer valid')
+    return user
+
+
+def build_verification_email(user):
+    """Subject, bodies and recipient of the verification email for user."""
+    token = make_email_verification_token(user)
+    
+    # Frontend URL mapping to verification handler
+    verification_link = f"{settings.FRONTEND_URL}/verify-email?token={token}"
+    
+    subject = 'Verify Your Identity Shield Account'
+    message = f'Welcome! Please verify your email by clicking the link below:\n\n{verification_link}\n\nThis link will expire in {getattr(settings, "VERIFICATION_TOKEN_EXPIRY", 60)} minutes.'
+    
+    # In a real app, use HTML templates
+    html_message = f"""
+    <div style="font-family: sans-serif; max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #e2e8f0; rounded-lg: 12px;">
+        <h2 style="color: #2563eb;">Identity Shield</h2>
+        <p>Welcome! Thank you for joining our privacy-preserving identity platform.</p>
+        <p>Please verify your email address to activate your account:</p>
+        <a href="{verification_link}" style="display: inline-block; background-color: #2563eb; color: white; padding: 12px 24px; border-radius: 8px; text-decoration: none; font-weight: bold; margin: 20px 0;">
+            Verify Email Address
+        </a>
+        <p style="color: #64748b; font-size: 14px;">
+            Alternatively, copy and paste this link in your browser: <br/>
+            {verification_link}
+        </p>
+        <hr style="border: 0; border-top: 1px solid #e2e8f0; margin: 20px 0;" />
+        <p style="color: #94a3b8; font-size: 12px;">
+            This link will expire in {getattr(settings, "VERIFICATION_TOKEN_EXPIRY", 60)} minutes. 
+            If you did not create an account, please ignore this email.
+        </p>
+    </div>
+    """
+    return {'subject': subject, 'body': message, 'to': [user.email], 'html_body': html_message}
+
+
+def build_set_password_email(user, organization_name):
+    """
+    Email inviting a provisioned user to choose a password.
+    The link carries a password-reset token, which stops working once the
+    password is set (or after PASSWORD_RESET_TIMEOUT).
+    """
+    uid = urlsafe_base64_encode(force_bytes(user.pk))
+    token = default_token_generator.make_token(user)
+    link = f"{settings.FRONTEND_URL}/set-password?uid={uid}&token={token}"
+    days = settings.PASSWORD_RESET_TIMEOUT // 86400
+    
+    subject = f'Your {organization_name} account on Identity Shield'
+    message = (
+        f'An account has been created for you at {organization_name}.\n\n'
+        f'Choose your password here:\n\n{link}\n\nThis link will expire in {days} days.'
+    )
+    html_message = f"""
+    <div style="font-family: sans-serif; max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #e2e8f0; rounded-lg: 12px;">
+        <h2 style="color: #2563eb;">Identity Shield</h2>
+        <p>An account has been created for you at {organization_name}.</p>
+        <a href="{link}" style="display: inline-block; background-color: #2563eb; color: white; padding: 12px 24px; border-radius: 8px; text-decoration: none; font-weight: bold; margin: 20px 0;">
+            Choose Password
+        </a>
+        <p style="color: #94a3b8; font-size: 12px;">This link will expire in {days} days.</p>
+    </div>
+    """
+    return {'subject': subject, 'body': message, 'to': [user.email], 'html_body': html_message}
+
+
+def send_verification_email(user, invalidate_previous=False):
+    """
+    Queue verification email to user with token link.
+    Delivered by the outbox dispatcher once the current transaction commits.
+    With invalidate_previous (resend), links sent earlier stop working.
     """
     try:
-        # 1. Create token
-        token_obj, created = EmailVerificationToken.objects.get_or_create(user=user)
-        if not created:
-             # Refresh token if already exists or reuse? 
-             # Let's refresh by creating new one if we want rotation, but for now reuse or update.
-             # Actually, if user requests a resend, we might want to rotate.
-             # For initial signup, create is fine.
-             pass
-        
-        # 2. Construct link
-        # Frontend URL mapping to verification handler
-        verification_link = f"{settings.FRONTEND_URL}/verify-email?token={token_obj.token}"
-        
-        # 3. Email Content
-        subject = 'Verify Your Identity Shield Account'
-        message = f'Welcome! Please verify your email by clicking the link below:\n\n{verification_link}\n\nThis link will expire in {getattr(settings, "VERIFICATION_TOKEN_EXPIRY", 60)} minutes.'
-        
-        # In a real app, use HTML templates
-        html_message = f"""
-        <div style="font-family: sans-serif; max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #e2e8f0; rounded-lg: 12px;">
-            <h2 style="color: #2563eb;">Identity Shield</h2>
-            <p>Welcome! Thank you for joining our privacy-preserving identity platform.</p>
-            <p>Please verify your email address to activate your account:</p>
-            <a href="{verification_link}" style="display: inline-block; background-color: #2563eb; color: white; padding: 12px 24px; border-radius: 8px; text-decoration: none; font-weight: bold; margin: 20px 0;">
-                Verify Email Address
-            </a>
-            <p style="color: #64748b; font-size: 14px;">
-                Alternatively, copy and paste this link in your browser: <br/>
-                {verification_link}
-            </p>
-            <hr style="border: 0; border-top: 1px solid #e2e8f0; margin: 20px 0;" />
-            <p style="color: #94a3b8; font-size: 12px;">
-                This link will expire in {getattr(settings, "VERIFICATION_TOKEN_EXPIRY", 60)} minutes. 
-                If you did not create an account, please ignore this email.
-            </p>
-        </div>
-        """
+        if invalidate_previous:
+            User.objects.filter(pk=user.pk).update(
+                email_verification_counter=F('email_verification_counter') + 1
+            )
+            user.refresh_from_db(fields=['email_verification_counter'])
+            EmailVerificationToken.objects.filter(user=user).delete()
         
-        # 4. Send email
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [user.email],
-            fail_silently=False,
-            html_message=html_message
-        )
-        logger.info(f"Verification email sent to {user.email}")
+        enqueue_email(**build_verification_email(user))
+        logger.info(f"Verification email queued for {user.email}")
         return True
     except Exception as e:
-        logger.error(f"Failed to send verification email to {user.email}: {str(e)}")
+        logger.error(f"Failed to queue verification email to {user.email}: {str(e)}")
         return False
@@ -1,11 +1,28 @@
+import json
+import uuid
+import hashlib
+from django.conf import settings
+from django.core import signing
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 from rest_framework import status
+from rest_framework.exceptions import Throttled
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth import authenticate
+from rest_framework.settings import api_settings as drf_settings
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from audit.emitter import emit_event
 from .serializers import RegisterSerializer, LoginSerializer, UserSerializer
-from .utils import send_verification_email
+from .keys import build_jwks
+from .passwords import LoginOverloaded, authenticate_async
+from .revocation import revocation_key, revoke_token
+from .tokens import RefreshToken, issue_tokens
+from .utils import check_email_verification_token, send_verification_email
 
 
 @api_view(['POST'])
@@ -38,11 +55,58 @@ def register(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-@api_view(['POST'])
-@permission_classes([AllowAny])
-def login(request):
+def _login_error(code, message, http_status, field='email'):
+    error = {'code': code, 'message': message}
+    if field:
+        error['field'] = field
+    return JsonResponse({'error': error}, status=http_status)
+
+
+def _throttle_response(request):
+    """
+    Apply the default DRF throttles, as @api_view would; returns the 429
+    response when any of them refuses the request, else None.
+    """
+    drf_request = Request(request)
+    waits = [
+        throttle.wait()
+        for throttle in (throttle_class() for throttle_class in drf_settings.DEFAULT_THROTTLE_CLASSES)
+        if not throttle.allow_request(drf_request, None)
+    ]
+    if not waits:
+        return None
+    waits = [wait for wait in waits if wait is not None]
+    exc = Throttled(max(waits, default=None))
+    response = JsonResponse({'detail': exc.detail}, status=exc.status_code)
+    if exc.wait is not None:
+        response['Retry-After'] = '%d' % exc.wait
+    return response
+
+
+def _login_success(request, user):
+    # Generate JWT tokens carrying the user's identity claims
+    refresh = issue_tokens(user)
+    emit_event('LOGIN_SUCCESS', request=request, actor=user)
+    
+    return {
+        'tokens': {
+            'access': str(refresh.access_token),
+            'refresh': str(refresh),
+        },
+        'user': UserSerializer(user).data
+    }
+
+
+@csrf_exempt
+@require_POST
+async def login(request):
     """
     Login user and return JWT tokens.
+    Password hashing runs in a bounded pool (accounts.passwords) so the
+    worker isn't pinned by PBKDF2; when the pool is saturated the login
+    is shed with 503 and Retry-After instead of queueing. Credentials go
+    through AUTHENTICATION_BACKENDS and the default DRF throttles apply,
+    as they did when this was an @api_view.
     
     POST /api/v1/auth/login
     {
@@ -50,52 +114,52 @@ def login(request):
         "password": "SecurePass123!"
     }
     """
-    serializer = LoginSerializer(data=request.data)
-    if serializer.is_valid():
-        email = serializer.validated_data['email']
-        password = serializer.validated_data['password']
-        
-        user = authenticate(email=email, password=password)
-        
-        if user is None:
-            return Response({
-                'error': {
-                    'code': 'INVALID_CREDENTIALS',
-                    'message': 'Email or password is incorrect',
-                    'field': 'email'
-                }
-            }, status=status.HTTP_401_UNAUTHORIZED)
-        
-        if not user.is_active:
-            return Response({
-                'error': {
-                    'code': 'ACCOUNT_DISABLED',
-                    'message': 'This account has been disabled',
-                    'field': 'email'
-                }
-            }, status=status.HTTP_403_FORBIDDEN)
-        
-        if not user.is_email_verified:
-            return Response({
-                'error': {
-                    'code': 'EMAIL_NOT_VERIFIED',
-                    'message': 'Please verify your email address before logging in.',
-                    'field': 'email'
-                }
-            }, status=status.HTTP_403_FORBIDDEN)
-        
-        # Generate JWT tokens
-        refresh = RefreshToken.for_user(user)
-        
-        return Response({
-            'tokens': {
-                'access': str(refresh.access_token),
-                'refresh': str(refresh),
-            },
-            'user': UserSerializer(user).data
-        })
+    throttled = await sync_to_async(_throttle_response)(request)
+    if throttled is not None:
+        return throttled
     
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'detail': 'JSON parse error'}, status=status.HTTP_400_BAD_REQUEST)
+    else:
+        data = request.POST
+    
+    serializer = LoginSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    email = serializer.validated_data['email']
+    password = serializer.validated_data['password']
+    
+    try:
+        user = await authenticate_async(request, email=email, password=password)
+    except LoginOverloaded:
+        response = _login_error(
+            'LOGIN_BUSY',
+            'Too many logins in progress. Please try again shortly.',
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            field=None
+        )
+        response['Retry-After'] = str(settings.LOGIN_RETRY_AFTER)
+        return response
+    
+    if user is None:
+        await sync_to_async(emit_event)('LOGIN_FAILED', request=request, metadata={'email': email})
+        return _login_error('INVALID_CREDENTIALS', 'Email or password is incorrect', status.HTTP_401_UNAUTHORIZED)
+    
+    if not user.is_active:
+        return _login_error('ACCOUNT_DISABLED', 'This account has been disabled', status.HTTP_403_FORBIDDEN)
+    
+    if not user.is_email_verified:
+        return _login_error(
+            'EMAIL_NOT_VERIFIED',
+            'Please verify your email address before logging in.',
+            status.HTTP_403_FORBIDDEN
+        )
+    
+    return JsonResponse(await sync_to_async(_login_success)(request, user))
 
 
 @api_view(['GET'])
@@ -113,10 +177,48 @@ def get_current_user(request):
 @permission_classes([AllowAny])
 def logout(request):
     """
-    Logout user (client should delete tokens).
+    Logout user by revoking the session of the presented tokens: the
+    refresh token and every access token minted from it stop working.
+    Works with just the refresh token, e.g. once the access token expired.
     
     POST /api/v1/auth/logout
+    {
+        "refresh": "<refresh_token>"  (optional if an access token is sent)
+    }
     """
+    tokens = []
+    if request.auth is not None:
+        tokens.append(request.auth)
+    
+    raw_refresh = request.data.get('refresh')
+    if raw_refresh:
+        try:
+            refresh = RefreshToken(raw_refresh)
+        except TokenError:
+            return Response({
+                'error': {
+                    'code': 'INVALID_TOKEN',
+                    'message': 'Refresh token is invalid or expired',
+                    'field': 'refresh'
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if request.auth is not None and refresh[api_settings.USER_ID_CLAIM] != request.user.id:
+            return Response({
+                'error': {
+                    'code': 'INVALID_TOKEN',
+                    'message': 'Refresh token belongs to another user',
+                    'field': 'refresh'
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+        tokens.append(refresh)
+    
+    revoked = set()
+    for token in tokens:
+        key = revocation_key(token.payload)
+        if key not in revoked:
+            revoke_token(token)
+            revoked.add(key)
+    
     return Response({
         'message': 'Successfully logged out'
     })
@@ -140,32 +242,108 @@ def verify_email(request):
             'error': 'Token is required'
         }, status=status.HTTP_400_BAD_REQUEST)
         
-    from .models import EmailVerificationToken
     try:
-        token_obj = EmailVerificationToken.objects.get(token=token_str)
-    except (EmailVerificationToken.DoesNotExist, ValueError):
-        return Response({
-            'error': 'Invalid verification token'
-        }, status=status.HTTP_400_BAD_REQUEST)
-        
-    if token_obj.is_expired():
+        uuid.UUID(str(token_str))
+    except ValueError:
+        legacy_token = None
+    else:
+        # UUID tokens were issued before links were signed
+        from .models import EmailVerificationToken
+        legacy_token = EmailVerificationToken.objects.select_related('user').filter(token=token_str).first()
+        if legacy_token is None:
+            return Response({
+                'error': 'Invalid verification token'
+            }, status=status.HTTP_400_BAD_REQUEST)
+    
+    if legacy_token is not None:
+        expired = legacy_token.is_expired()
+        user = legacy_token.user
+    else:
+        try:
+            user = check_email_verification_token(token_str)
+            expired = False
+        except signing.SignatureExpired:
+            expired = True
+        except (signing.BadSignature, ValueError, TypeError):
+            return Response({
+                'error': 'Invalid verification token'
+            }, status=status.HTTP_400_BAD_REQUEST)
+    
+    if expired:
         return Response({
             'error': 'Verification link has expired. Please request a new one.'
         }, status=status.HTTP_400_BAD_REQUEST)
         
     # Verify User
-    user = token_obj.user
     user.is_email_verified = True
-    user.save()
+    user.save(update_fields=['is_email_verified', 'updated_at'])
     
-    # Delete token after use
-    token_obj.delete()
+    if legacy_token is not None:
+        # Delete token after use
+        legacy_token.delete()
     
     return Response({
         'message': 'Email verified successfully! You can now log in.'
     })
 
 
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def set_password(request):
+    """
+    Choose a password from an invitation link (e.g. after bulk
+    provisioning). Also verifies the email, since the link was mailed to it.
+    
+    POST /api/v1/auth/set-password
+    {
+        "uid": "<uid from the link>",
+        "token": "<token from the link>",
+        "password": "SecurePass123!"
+    }
+    """
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.password_validation import validate_password
+    from django.contrib.auth.tokens import default_token_generator
+    from django.core.exceptions import ValidationError
+    from django.utils.http import urlsafe_base64_decode
+    User = get_user_model()
+    
+    try:
+        user_id = urlsafe_base64_decode(request.data.get('uid', '')).decode()
+        user = User.objects.get(pk=user_id)
+    except (ValueError, TypeError, User.DoesNotExist):
+        user = None
+    
+    if user is None or not default_token_generator.check_token(user, request.data.get('token', '')):
+        return Response({
+            'error': {
+                'code': 'INVALID_TOKEN',
+                'message': 'This link is invalid or has expired',
+                'field': 'token'
+            }
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    password = request.data.get('password', '')
+    try:
+        validate_password(password, user)
+    except ValidationError as e:
+        return Response({
+            'error': {
+                'code': 'INVALID_PASSWORD',
+                'message': ' '.join(e.messages),
+                'field': 'password'
+            }
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    user.set_password(password)
+    user.is_email_verified = True
+    user.save(update_fields=['password', 'is_email_verified', 'updated_at'])
+    
+    return Response({
+        'message': 'Password set. You can now log in.'
+    })
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def resend_verification(request):
@@ -194,8 +372,30 @@ def resend_verification(request):
     if user.is_email_verified:
         return Response({'message': 'This email is already verified. Please log in.'})
         
-    send_verification_email(user)
+    send_verification_email(user, invalidate_previous=True)
     
     return Response({
         'message': 'New verification link has been sent to your email.'
     })
+
+
+@require_GET
+def jwks(request):
+    """
+    Public keys for verifying access tokens, as a JWK Set.
+    Keys appear here before they start signing and stay until the last
+    token they signed has expired, so caching for max-age is safe.
+    
+    GET /api/v1/auth/jwks
+    GET /.well-known/jwks.json
+    """
+    body = json.dumps(build_jwks(), separators=(',', ':'))
+    etag = '"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"'
+    
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={settings.JWT_JWKS_MAX_AGE}'
+    return response
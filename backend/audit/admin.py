@@ -1,5 +1,29 @@
 from django.contrib import admin
-from .models import AuditEvent
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
+from .models import AuditEvent, AuditBatch
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses the planner's row estimate for unfiltered lists
+    on PostgreSQL instead of an exact COUNT(*) over the whole table.
+    """
+    
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if connection.vendor == 'postgresql' and query is not None and not query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                    [self.object_list.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] > 0:
+                return row[0]
+        return super().count
 
 
 @admin.register(AuditEvent)
@@ -10,6 +34,10 @@ class AuditEventAdmin(admin.ModelAdmin):
     list_filter = ['event_type', 'created_at']
     search_fields = ['actor__email', 'target_user__email', 'organization__name']
     readonly_fields = ['event_type', 'actor', 'target_user', 'organization', 'metadata', 'ip_address', 'user_agent', 'created_at']
+    list_select_related = ['actor', 'target_user', 'organization']
+    paginator = EstimatedCountPaginator
+    # Skip the unfiltered COUNT(*) over the whole table on every page
+    show_full_result_count = False
     
     def has_add_permission(self, request):
         """Prevent manual creation of audit events."""
@@ -22,3 +50,20 @@ class AuditEventAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         """Prevent deletion of audit events."""
         return False
+
+
+@admin.register(AuditBatch)
+class AuditBatchAdmin(admin.ModelAdmin):
+    """Admin configuration for AuditBatch (read-only)."""
+    
+    list_display = ['sequence', 'first_event_id', 'last_event_id', 'event_count', 'merkle_root', 'created_at']
+    readonly_fields = ['sequence', 'first_event_id', 'last_event_id', 'event_count', 'merkle_root', 'previous_chain_hash', 'chain_hash', 'created_at']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -1,6 +1,24 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
+
+
+def start_buffer(**kwargs):
+    from .emitter import get_buffer
+    # Re-checked in case the setting was overridden after startup
+    if settings.AUDIT_BUFFER_ENABLED:
+        get_buffer().start()
 
 
 class AuditConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "audit"
+
+    def ready(self):
+        """
+        Start the audit flush thread when this worker serves its first
+        request. The thread first replays spools left by earlier workers,
+        so that doesn't wait for this one's first event.
+        """
+        if settings.AUDIT_BUFFER_ENABLED:
+            request_started.connect(start_buffer, dispatch_uid='audit.start_buffer')
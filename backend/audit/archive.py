@@ -0,0 +1,399 @@
+import os
+import sys
+import json
+import mmap
+import zlib
+import struct
+import logging
+import threading
+from array import array
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'AUDSEG01'
+SEGMENT_SUFFIX = '.aseg'
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# Integer columns; foreign keys use 0 for NULL
+INT_COLUMNS = ['id', 'created_at', 'actor_id', 'target_user_id', 'organization_id']
+FK_COLUMNS = ['actor_id', 'target_user_id', 'organization_id']
+
+# Blocks touching more organizations than this are not org-indexed
+ORG_INDEX_LIMIT = 64
+
+
+def to_micros(value):
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(value):
+    return EPOCH + timedelta(microseconds=value)
+
+
+def _pack(typecode, values):
+    return zlib.compress(array(typecode, values).tobytes())
+
+
+def _unpack(typecode, data, swap):
+    values = array(typecode)
+    values.frombytes(zlib.decompress(data))
+    if swap:
+        values.byteswap()
+    return values
+
+
+def write_segment(path, rows, block_rows):
+    """
+    Write events to an immutable, compressed, columnar segment file.
+
+    Rows must be sorted by (created_at, id). They are split into blocks;
+    each column of each block is compressed separately so readers only
+    inflate the columns they filter on. A JSON footer holds the sparse
+    index: per-block time and ID bounds plus the event types and
+    organizations present.
+    """
+    event_types = sorted({row['event_type'] for row in rows})
+    type_codes = {event_type: code for code, event_type in enumerate(event_types)}
+    blocks = []
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+
+        def put(data):
+            offset = f.tell()
+            f.write(data)
+            return [offset, len(data)]
+
+        for start in range(0, len(rows), block_rows):
+            chunk = rows[start:start + block_rows]
+            columns = {}
+            for column in INT_COLUMNS:
+                if column == 'created_at':
+                    values = [to_micros(row['created_at']) for row in chunk]
+                else:
+                    values = [row[column] or 0 for row in chunk]
+                columns[column] = put(_pack('q', values))
+            columns['event_type'] = put(_pack('H', [type_codes[row['event_type']] for row in chunk]))
+            columns['payload'] = put(zlib.compress(json.dumps([
+                [
+                    str(row['event_id']) if row['event_id'] else None,
+                    row['metadata'],
+                    row['ip_address'],
+                    row['user_agent'],
+                ]
+                for row in chunk
+            ]).encode()))
+
+            orgs = sorted({row['organization_id'] for row in chunk if row['organization_id']})
+            blocks.append({
+                'rows': len(chunk),
+                'types': sorted({type_codes[row['event_type']] for row in chunk}),
+                'min_ts': to_micros(chunk[0]['created_at']),
+                'max_ts': to_micros(chunk[-1]['created_at']),
+                'min_id': min(row['id'] for row in chunk),
+                'max_id': max(row['id'] for row in chunk),
+                'orgs': orgs if len(orgs) <= ORG_INDEX_LIMIT else None,
+                'columns': columns,
+            })
+
+        footer = json.dumps({
+            'version': 1,
+            'byteorder': sys.byteorder,
+            'rows': len(rows),
+            'event_types': event_types,
+            'min_ts': blocks[0]['min_ts'],
+            'max_ts': blocks[-1]['max_ts'],
+            'min_id': min(block['min_id'] for block in blocks),
+            'max_id': max(block['max_id'] for block in blocks),
+            'blocks': blocks,
+        }).encode()
+        f.write(footer)
+        f.write(struct.pack('<Q', len(footer)))
+        f.write(MAGIC)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class Segment:
+    """Read-only, memory-mapped view of a segment file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:8] != MAGIC or self._mm[-8:] != MAGIC:
+            raise ValueError(f'Not an audit segment: {path}')
+        (footer_len,) = struct.unpack('<Q', self._mm[-16:-8])
+        footer = json.loads(self._mm[-16 - footer_len:-16])
+        self.event_types = footer['event_types']
+        self.blocks = footer['blocks']
+        self.min_ts = footer['min_ts']
+        self.max_ts = footer['max_ts']
+        self.min_id = footer['min_id']
+        self.max_id = footer['max_id']
+        self._swap = footer['byteorder'] != sys.byteorder
+
+    def column(self, block, name):
+        offset, length = block['columns'][name]
+        data = self._mm[offset:offset + length]
+        if name == 'payload':
+            return json.loads(zlib.decompress(data))
+        return _unpack('H' if name == 'event_type' else 'q', data, self._swap)
+
+    def build_row(self, block, index, columns, payload):
+        event_id, metadata, ip_address, user_agent = payload[index]
+        row = {
+            'id': columns['id'][index],
+            'event_id': event_id,
+            'event_type': self.event_types[columns['event_type'][index]],
+            'metadata': metadata,
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'created_at': from_micros(columns['created_at'][index]),
+        }
+        for name in FK_COLUMNS:
+            row[name] = columns[name][index] or None
+        return row
+
+    def close(self):
+        self._mm.close()
+
+
+_segments = {}
+_segments_lock = threading.Lock()
+
+
+def segment_paths():
+    """Segment files in the archive directory, oldest sequence first."""
+    archive_dir = settings.AUDIT_ARCHIVE_DIR
+    if not os.path.isdir(archive_dir):
+        return []
+    return sorted(
+        os.path.join(archive_dir, name)
+        for name in os.listdir(archive_dir)
+        if name.endswith(SEGMENT_SUFFIX)
+    )
+
+
+def get_segments():
+    """Open (and cache) every segment; files are immutable once written."""
+    paths = segment_paths()
+    with _segments_lock:
+        for path in set(_segments) - set(paths):
+            _segments.pop(path).close()
+        for path in paths:
+            if path not in _segments:
+                _segments[path] = Segment(path)
+        return [_segments[path] for path in paths]
+
+
+def _block_matches(block, filters, since, until, cursor, type_code):
+    if since is not None and block['max_ts'] < since:
+        return False
+    if until is not None and block['min_ts'] >= until:
+        return False
+    if cursor is not None and block['min_ts'] > cursor[0]:
+        return False
+    # Segments written before per-block types were recorded have no 'types'
+    if type_code is not None and type_code not in block.get('types', [type_code]):
+        return False
+    organization = filters.get('organization')
+    if organization is not None and block['orgs'] is not None and organization not in block['orgs']:
+        return False
+    return True
+
+
+def archive_max_ts():
+    """created_at of the newest archived event, or None if nothing is archived."""
+    segments = get_segments()
+    return from_micros(max(segment.max_ts for segment in segments)) if segments else None
+
+
+def query_archive(filters, cursor=None, floor=None, limit=50):
+    """
+    Archived events matching filters, newest first.
+
+    Segments and blocks are skipped using the sparse index, and only the
+    columns needed to test a block's rows are inflated. cursor is a
+    (created_at, id) tuple; rows at or after it are excluded. floor is
+    another such tuple; rows at or before it are excluded, so a caller
+    that already has a full page from the database only reads segments
+    and blocks newer than that page's oldest row.
+    Returns at most `limit` row dicts.
+    """
+    since = to_micros(filters['since']) if filters.get('since') else None
+    until = to_micros(filters['until']) if filters.get('until') else None
+    cursor_key = (to_micros(cursor[0]), cursor[1]) if cursor else None
+    floor_key = (to_micros(floor[0]), floor[1]) if floor else None
+    fk_filters = {
+        f'{name}_id': filters[name]
+        for name in ('actor', 'target_user', 'organization')
+        if filters.get(name) is not None
+    }
+    event_type = filters.get('event_type')
+
+    results = []
+    for segment in sorted(get_segments(), key=lambda s: s.max_ts, reverse=True):
+        if len(results) >= limit and segment.max_ts < results[-1][0][0]:
+            break
+        if floor_key is not None and segment.max_ts < floor_key[0]:
+            break
+        if since is not None and segment.max_ts < since:
+            continue
+        if until is not None and segment.min_ts >= until:
+            continue
+        if cursor_key is not None and segment.min_ts > cursor_key[0]:
+            continue
+        if event_type is not None and event_type not in segment.event_types:
+            continue
+        type_code = segment.event_types.index(event_type) if event_type else None
+
+        found_in_segment = 0
+        for block in reversed(segment.blocks):
+            if found_in_segment >= limit:
+                break
+            if floor_key is not None and block['max_ts'] < floor_key[0]:
+                # Blocks are in time order, so every earlier one is older still
+                break
+            if not _block_matches(block, filters, since, until, cursor_key, type_code):
+                continue
+
+            columns = {'id': segment.column(block, 'id'), 'created_at': segment.column(block, 'created_at')}
+            for name in fk_filters:
+                columns[name] = segment.column(block, name)
+            if type_code is not None:
+                columns['event_type'] = segment.column(block, 'event_type')
+
+            matches = []
+            for index in range(block['rows'] - 1, -1, -1):
+                key = (columns['created_at'][index], columns['id'][index])
+                if cursor_key is not None and key >= cursor_key:
+                    continue
+                if floor_key is not None and key <= floor_key:
+                    break
+                if since is not None and key[0] < since:
+                    continue
+                if until is not None and key[0] >= until:
+                    continue
+                if type_code is not None and columns['event_type'][index] != type_code:
+                    continue
+                if any(columns[name][index] != value for name, value in fk_filters.items()):
+                    continue
+                matches.append(index)
+                if len(matches) >= limit:
+                    break
+            if not matches:
+                continue
+
+            for name in INT_COLUMNS + ['event_type']:
+                if name not in columns:
+                    columns[name] = segment.column(block, name)
+            payload = segment.column(block, 'payload')
+            for index in matches:
+                key = (columns['created_at'][index], columns['id'][index])
+                results.append((key, segment.build_row(block, index, columns, payload)))
+            found_in_segment += len(matches)
+
+        results.sort(key=lambda item: item[0], reverse=True)
+        results = results[:limit]
+
+    return [row for _, row in results]
+
+
+def iter_archived_events(first_event_id, last_event_id):
+    """Yield archived events whose IDs fall in an inclusive range."""
+    for segment in get_segments():
+        if segment.max_id < first_event_id or segment.min_id > last_event_id:
+            continue
+        for block in segment.blocks:
+            if block['max_id'] < first_event_id or block['min_id'] > last_event_id:
+                continue
+            columns = {name: segment.column(block, name) for name in INT_COLUMNS + ['event_type']}
+            payload = None
+            for index in range(block['rows']):
+                if first_event_id <= columns['id'][index] <= last_event_id:
+                    if payload is None:
+                        payload = segment.column(block, 'payload')
+                    yield segment.build_row(block, index, columns, payload)
+
+
+def archived_event_ids(path):
+    """All event IDs stored in one segment file."""
+    segment = Segment(path)
+    try:
+        ids = []
+        for block in segment.blocks:
+            ids.extend(segment.column(block, 'id'))
+        return ids
+    finally:
+        segment.close()
+
+
+def next_segment_path():
+    """Path for the next segment, numbered after the newest existing one."""
+    paths = segment_paths()
+    sequence = int(os.path.basename(paths[-1]).split('-')[1].split('.')[0]) + 1 if paths else 1
+    return os.path.join(settings.AUDIT_ARCHIVE_DIR, f'seg-{sequence:08d}{SEGMENT_SUFFIX}')
+
+
+def delete_archived_rows(ids, batch_size):
+    """
+    Delete events that now live in a segment, in batches.
+    Archiving moves sealed events without changing them, so the Merkle
+    batches still verify against the archived copies.
+    """
+    from .models import AuditEvent
+
+    deleted = 0
+    for start in range(0, len(ids), batch_size):
+        count, _ = AuditEvent.objects.filter(id__in=ids[start:start + batch_size]).delete()
+        deleted += count
+    return deleted
+
+
+def archive_events(cutoff, segment_rows=None, block_rows=None, batch_size=5000):
+    """
+    Move sealed events created before cutoff into segment files.
+
+    Only events already covered by a Merkle batch are archived. If a
+    previous run crashed between writing a segment and deleting its rows,
+    those rows are deleted first so nothing is archived twice.
+    Returns (segments_written, events_archived).
+    """
+    from django.db.models import Max
+    from .models import AuditEvent, AuditBatch
+    from .sealing import EVENT_HASH_FIELDS
+
+    segment_rows = segment_rows or settings.AUDIT_SEGMENT_MAX_ROWS
+    block_rows = block_rows or settings.AUDIT_SEGMENT_BLOCK_ROWS
+    os.makedirs(settings.AUDIT_ARCHIVE_DIR, exist_ok=True)
+
+    paths = segment_paths()
+    if paths:
+        delete_archived_rows(archived_event_ids(paths[-1]), batch_size)
+
+    last_sealed_id = AuditBatch.objects.aggregate(last=Max('last_event_id'))['last'] or 0
+    pending = (
+        AuditEvent.objects
+        .filter(created_at__lt=cutoff, id__lte=last_sealed_id)
+        .order_by('created_at', 'id')
+        .values(*EVENT_HASH_FIELDS)
+    )
+
+    segments = 0
+    archived = 0
+    while True:
+        rows = list(pending[:segment_rows])
+        if not rows:
+            break
+        path = next_segment_path()
+        write_segment(path, rows, block_rows)
+        delete_archived_rows([row['id'] for row in rows], batch_size)
+        segments += 1
+        archived += len(rows)
+        logger.info(f"Archived {len(rows)} audit events to {path}")
+    return segments, archived
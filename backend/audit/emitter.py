@@ -0,0 +1,312 @@
+import os
+import json
+import uuid
+import atexit
+import logging
+import threading
+from datetime import datetime
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows - spool recovery falls back to the replay command
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def get_client_ip(request):
+    """Client IP, taking the first hop from X-Forwarded-For when present."""
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if forwarded:
+        return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR')
+
+
+def _pk(value):
+    """Accept either a model instance or a primary key."""
+    return getattr(value, 'pk', value)
+
+
+def build_record(event_type, request=None, actor=None, target_user=None,
+                 organization=None, metadata=None):
+    """Build a JSON-serializable audit record."""
+    if actor is None and request is not None and request.user.is_authenticated:
+        actor = request.user
+    return {
+        'event_id': str(uuid.uuid4()),
+        'event_type': event_type,
+        'actor_id': _pk(actor),
+        'target_user_id': _pk(target_user),
+        'organization_id': _pk(organization),
+        'metadata': metadata or {},
+        'ip_address': get_client_ip(request) if request is not None else None,
+        'user_agent': request.META.get('HTTP_USER_AGENT', '') if request is not None else '',
+        'created_at': timezone.now().isoformat(),
+    }
+
+
+def write_records(records, attempts=3):
+    """
+    Insert audit records with bulk INSERTs.
+
+    Only brand-new AuditEvent instances are created, so the model's
+    "no updates, no deletes" guarantee still holds. Records whose event_id
+    is already stored are skipped, which makes replaying a spool that was
+    partially flushed idempotent. If an insert still conflicts (a replay
+    racing this one, or a time-ordered ID collision), the chunk is retried
+    with freshly issued IDs instead of dropping events.
+    """
+    unique = {}
+    for record in records:
+        unique.setdefault(record['event_id'], record)
+    pending = list(unique.values())
+    written = 0
+    for start in range(0, len(pending), 500):
+        written += _write_chunk(pending[start:start + 500], attempts)
+    return written
+
+
+def _write_chunk(records, attempts):
+    from .models import AuditEvent
+
+    for attempt in range(1, attempts + 1):
+        stored = {
+            str(event_id) for event_id in AuditEvent.objects.filter(
+                event_id__in=[record['event_id'] for record in records]
+            ).values_list('event_id', flat=True)
+        }
+        # New instances draw new primary keys on every attempt
+        events = []
+        for record in records:
+            if record['event_id'] in stored:
+                continue
+            record = dict(record)
+            record['created_at'] = datetime.fromisoformat(record['created_at'])
+            events.append(AuditEvent(**record))
+        if not events:
+            return 0
+        try:
+            with transaction.atomic():
+                AuditEvent.objects.bulk_create(events)
+            return len(events)
+        except IntegrityError as e:
+            if attempt == attempts:
+                raise
+            logger.warning(f"Retrying {len(events)} audit events after conflict: {str(e)}")
+
+
+def _discard_spool(path, spool):
+    """
+    Remove a spool file whose events are stored, then close it. Removing
+    it while its lock is still held keeps recovery in another worker from
+    replaying it at the same time.
+    """
+    if fcntl is None:
+        spool.close()  # Windows can't remove an open file
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass  # Already replayed and removed elsewhere
+    spool.close()
+
+
+class AuditBuffer:
+    """
+    In-process write-behind buffer for audit events.
+
+    Every event is appended to a local spool file before it is buffered, so
+    events survive a crash. With fsync (the default) each append is also
+    forced to disk, so a power loss or kernel crash can't drop events
+    still sitting in the page cache. The buffer is flushed with one bulk INSERT when
+    it reaches AUDIT_BUFFER_SIZE events or every AUDIT_FLUSH_INTERVAL
+    seconds, whichever comes first. The flush thread starts with the
+    worker's first request or event (see AuditConfig.ready) and first
+    replays spool files left behind by workers that exited or crashed.
+    """
+
+    def __init__(self, spool_dir, max_size, flush_interval, fsync=True):
+        self.spool_dir = str(spool_dir)
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._records = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._spool = None
+        self._spool_path = None
+        self._pid = None
+        self._thread = None
+        self._pending_recovery = True
+
+    def start(self):
+        """Start the flush thread in this process if it isn't running yet."""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._start()
+
+    def _start(self):
+        """(Re)start per-process state; also runs after a fork."""
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._pid = os.getpid()
+        self._records = []
+        self._pending_recovery = True
+        self._open_spool()
+        self._thread = threading.Thread(target=self._run, name='audit-flush', daemon=True)
+        self._thread.start()
+
+    def _open_spool(self):
+        self._spool_path = os.path.join(
+            self.spool_dir, f'spool-{self._pid}-{uuid.uuid4().hex}.jsonl'
+        )
+        self._spool = open(self._spool_path, 'a', encoding='utf-8')
+        if fcntl is not None:
+            # Held for the spool's lifetime; tells recovery this file is live
+            fcntl.flock(self._spool.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            if self.fsync:
+                # The new file's directory entry must be durable too
+                dir_fd = os.open(self.spool_dir, os.O_RDONLY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+
+    def append(self, record):
+        """Spool and buffer a record, flushing if the buffer is full."""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._start()
+            self._spool.write(json.dumps(record) + '\n')
+            self._spool.flush()
+            if self.fsync:
+                os.fsync(self._spool.fileno())
+            self._records.append(record)
+            full = len(self._records) >= self.max_size
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write buffered records to the database."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._records:
+                    return 0
+                records, self._records = self._records, []
+                # Rotate the spool so new events don't land in the file we delete
+                spool, spool_path = self._spool, self._spool_path
+                self._open_spool()
+
+            try:
+                write_records(records)
+            except Exception as e:
+                # Keep the closed spool; recover() or replay_audit_spool retries it
+                spool.close()
+                logger.error(f"Failed to flush {len(records)} audit events: {str(e)}")
+                self._pending_recovery = True
+                return 0
+            _discard_spool(spool_path, spool)
+            return len(records)
+
+    def recover(self):
+        """Replay spool files left behind by workers that exited or crashed."""
+        for name in sorted(os.listdir(self.spool_dir)):
+            path = os.path.join(self.spool_dir, name)
+            if not name.endswith('.jsonl') or path == self._spool_path:
+                continue
+            replay_spool_file(path)
+
+    def _run(self):
+        while True:
+            try:
+                self.flush()
+                if self._pending_recovery:
+                    self._pending_recovery = False
+                    self.recover()
+            except Exception as e:
+                logger.error(f"Audit flush thread error: {str(e)}")
+            finally:
+                close_old_connections()
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+
+
+def replay_spool_file(path):
+    """
+    Write the events in a spool file to the database and remove it.
+    Files still locked by a live worker are skipped.
+    """
+    try:
+        f = open(path, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        return 0
+    with f:
+        if fcntl is not None:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0
+        records = []
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # Torn final line from a crash mid-write
+                continue
+        try:
+            write_records(records)
+        except Exception as e:
+            logger.error(f"Failed to replay audit spool {path}: {str(e)}")
+            return 0
+        _discard_spool(path, f)
+    if records:
+        logger.info(f"Replayed {len(records)} audit events from {path}")
+    return len(records)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Return the process-wide audit buffer."""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = AuditBuffer(
+                    settings.AUDIT_SPOOL_DIR,
+                    settings.AUDIT_BUFFER_SIZE,
+                    settings.AUDIT_FLUSH_INTERVAL,
+                    fsync=settings.AUDIT_SPOOL_FSYNC
+                )
+                atexit.register(_buffer.flush)
+    return _buffer
+
+
+def emit_event(event_type, request=None, actor=None, target_user=None,
+               organization=None, metadata=None):
+    """
+    Record an audit event.
+
+    With AUDIT_BUFFER_ENABLED the event is spooled and written in the
+    background; otherwise it is inserted immediately. Never raises - a
+    failure to audit must not fail the request that triggered it.
+    """
+    try:
+        record = build_record(
+            event_type,
+            request=request,
+            actor=actor,
+            target_user=target_user,
+            organization=organization,
+            metadata=metadata
+        )
+        if settings.AUDIT_BUFFER_ENABLED:
+            get_buffer().append(record)
+        else:
+            write_records([record])
+    except Exception as e:
+        logger.error(f"Failed to emit audit event {event_type}: {str(e)}")
@@ -0,0 +1,45 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from audit.archive import archive_events
+
+
+class Command(BaseCommand):
+    """
+    Move aged, sealed audit events into compressed segment files.
+    The audit query API keeps reading them from the archive.
+    """
+
+    help = 'Archive old audit events to compressed columnar segment files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=settings.AUDIT_ARCHIVE_AFTER_DAYS,
+            help='Archive events older than this many days'
+        )
+        parser.add_argument(
+            '--segment-rows',
+            type=int,
+            default=settings.AUDIT_SEGMENT_MAX_ROWS,
+            help='Maximum events per segment file'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows deleted per DELETE statement'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        segments, archived = archive_events(
+            cutoff,
+            segment_rows=options['segment_rows'],
+            batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {archived} audit events into {segments} segments"
+        ))
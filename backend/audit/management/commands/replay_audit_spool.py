@@ -0,0 +1,26 @@
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from audit.emitter import replay_spool_file
+
+
+class Command(BaseCommand):
+    """
+    Write audit events left in spool files to the database.
+    Spools that belong to running workers are skipped.
+    """
+
+    help = 'Replay audit events from spool files left by stopped or crashed workers'
+
+    def handle(self, *args, **options):
+        spool_dir = settings.AUDIT_SPOOL_DIR
+        if not os.path.isdir(spool_dir):
+            self.stdout.write('No audit spool directory found')
+            return
+
+        total = 0
+        for name in sorted(os.listdir(spool_dir)):
+            if name.endswith('.jsonl'):
+                total += replay_spool_file(os.path.join(spool_dir, name))
+
+        self.stdout.write(self.style.SUCCESS(f"Replayed {total} audit events"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from audit.sealing import seal_pending_events
+
+
+class Command(BaseCommand):
+    """
+    Commit unsealed audit events as Merkle-rooted batches.
+    Meant to run periodically (e.g. every minute from cron).
+    """
+
+    help = 'Seal pending audit events into hash-chained Merkle batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Maximum events per batch (defaults to AUDIT_BATCH_MAX_SIZE)'
+        )
+
+    def handle(self, *args, **options):
+        count = seal_pending_events(max_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Sealed {count} audit batches"))
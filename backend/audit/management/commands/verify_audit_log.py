@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from audit.sealing import verify_batches, get_event_proof
+
+
+class Command(BaseCommand):
+    """Verify sealed audit batches, or print the inclusion proof for one event."""
+
+    help = 'Verify audit log Merkle batches and hash chain'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from-sequence', type=int, default=None)
+        parser.add_argument('--to-sequence', type=int, default=None)
+        parser.add_argument(
+            '--event',
+            type=int,
+            default=None,
+            help='Print the inclusion proof for this audit event ID'
+        )
+
+    def handle(self, *args, **options):
+        if options['event'] is not None:
+            proof = get_event_proof(options['event'])
+            if proof is None:
+                raise CommandError(f"Event {options['event']} is not sealed yet")
+            for key, value in proof.items():
+                self.stdout.write(f"{key}: {value}")
+            if not proof['root_matches']:
+                raise CommandError("Batch Merkle root does not match its events")
+            return
+
+        problems = verify_batches(options['from_sequence'], options['to_sequence'])
+        if problems:
+            for problem in problems:
+                self.stderr.write(problem)
+            raise CommandError(f"Audit log verification failed ({len(problems)} problems)")
+        self.stdout.write(self.style.SUCCESS("Audit log verified"))
@@ -0,0 +1,107 @@
+import json
+import hashlib
+from datetime import timezone as dt_timezone
+
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+
+def _sha256(data):
+    return hashlib.sha256(data).digest()
+
+
+def _split(n):
+    """Largest power of two strictly smaller than n."""
+    k = 1
+    while k * 2 < n:
+        k *= 2
+    return k
+
+
+def canonical_event(event):
+    """Stable byte encoding of an audit event's contents."""
+    created_at = event['created_at'].astimezone(dt_timezone.utc).isoformat()
+    return json.dumps({
+        'id': event['id'],
+        'event_id': str(event['event_id']) if event['event_id'] else None,
+        'event_type': event['event_type'],
+        'actor_id': event['actor_id'],
+        'target_user_id': event['target_user_id'],
+        'organization_id': event['organization_id'],
+        'metadata': event['metadata'],
+        'ip_address': event['ip_address'],
+        'user_agent': event['user_agent'],
+        'created_at': created_at,
+    }, sort_keys=True, separators=(',', ':')).encode()
+
+
+def leaf_hash(data):
+    return _sha256(LEAF_PREFIX + data)
+
+
+def node_hash(left, right):
+    return _sha256(NODE_PREFIX + left + right)
+
+
+def merkle_root(leaves):
+    """
+    Root hash over a list of leaf hashes (RFC 6962 construction).
+    Leaves and interior nodes use different prefixes, and n leaves are
+    split at the largest power of two smaller than n.
+    """
+    n = len(leaves)
+    if n == 0:
+        return _sha256(b'')
+    if n == 1:
+        return leaves[0]
+    k = _split(n)
+    return node_hash(merkle_root(leaves[:k]), merkle_root(leaves[k:]))
+
+
+def inclusion_proof(leaves, index):
+    """Audit path for the leaf at index, ordered from the leaf up."""
+    n = len(leaves)
+    if n <= 1:
+        return []
+    k = _split(n)
+    if index < k:
+        return inclusion_proof(leaves[:k], index) + [merkle_root(leaves[k:])]
+    return inclusion_proof(leaves[k:], index - k) + [merkle_root(leaves[:k])]
+
+
+def verify_inclusion(leaf, index, size, proof, root):
+    """
+    Check an inclusion proof without access to the other leaves.
+    Runs in O(log n) hash operations.
+    """
+    if index >= size:
+        return False
+
+    # Walk down to find which side each proof hash sits on, then fold up
+    sides = []
+    lo, n = index, size
+    while n > 1:
+        k = _split(n)
+        if lo < k:
+            sides.append('right')
+            n = k
+        else:
+            sides.append('left')
+            lo -= k
+            n -= k
+    if len(sides) != len(proof):
+        return False
+
+    computed = leaf
+    for side, sibling in zip(reversed(sides), proof):
+        if side == 'right':
+            computed = node_hash(computed, sibling)
+        else:
+            computed = node_hash(sibling, computed)
+    return computed == root
+
+
+def chain_hash(previous_chain_hash, sequence, first_event_id, last_event_id, event_count, root):
+    """Link a batch root to everything committed before it."""
+    header = f'{sequence}:{first_event_id}:{last_event_id}:{event_count}'.encode()
+    return _sha256(bytes.fromhex(previous_chain_hash) + header + root)
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:58
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("audit", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="auditevent",
+            name="event_id",
+            field=models.UUIDField(
+                editable=False,
+                help_text="Emitter-assigned ID, makes spool replays idempotent",
+                null=True,
+                unique=True,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="auditevent",
+            name="created_at",
+            field=models.DateTimeField(
+                db_index=True, default=django.utils.timezone.now, editable=False
+            ),
+        ),
+    ]
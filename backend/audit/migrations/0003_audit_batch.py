@@ -0,0 +1,41 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("audit", "0002_audit_event_id"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AuditBatch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sequence", models.PositiveBigIntegerField(unique=True)),
+                ("first_event_id", models.BigIntegerField()),
+                ("last_event_id", models.BigIntegerField()),
+                ("event_count", models.PositiveIntegerField()),
+                ("merkle_root", models.CharField(max_length=64)),
+                ("previous_chain_hash", models.CharField(max_length=64)),
+                ("chain_hash", models.CharField(max_length=64, unique=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Audit Batch",
+                "verbose_name_plural": "Audit Batches",
+                "db_table": "audit_batches",
+                "ordering": ["-sequence"],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.0.1 on 2026-10-19 03:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("audit", "0003_audit_batch"),
+        ("organizations", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="auditevent",
+            index=models.Index(
+                fields=["organization", "created_at", "id"],
+                name="audit_org_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="auditevent",
+            index=models.Index(
+                fields=["actor", "created_at", "id"], name="audit_actor_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="auditevent",
+            index=models.Index(
+                fields=["target_user", "created_at", "id"],
+                name="audit_target_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="auditevent",
+            index=models.Index(
+                fields=["event_type", "created_at", "id"], name="audit_type_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="auditevent",
+            index=models.Index(
+                fields=["created_at", "id"], name="audit_created_id_idx"
+            ),
+        ),
+    ]
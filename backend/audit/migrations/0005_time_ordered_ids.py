@@ -0,0 +1,45 @@
+# Generated by Django 5.0.1 on 2026-10-19 03:05
+
+import config.ids
+import django.utils.timezone
+from django.contrib.postgres.indexes import BrinIndex
+from django.db import migrations, models
+
+# Rows are appended in time order, so a BRIN index (one min/max summary per
+# block range) covers created_at at a tiny fraction of a B-tree's size.
+BRIN_INDEX = BrinIndex(fields=["created_at"], name="audit_created_brin")
+
+
+def add_brin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.add_index(apps.get_model("audit", "AuditEvent"), BRIN_INDEX)
+
+
+def remove_brin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.remove_index(apps.get_model("audit", "AuditEvent"), BRIN_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("audit", "0004_audit_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="auditevent",
+            name="created_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False
+            ),
+        ),
+        migrations.AlterField(
+            model_name="auditevent",
+            name="id",
+            field=models.BigAutoField(
+                default=config.ids.time_ordered_pk, primary_key=True, serialize=False
+            ),
+        ),
+        migrations.RunPython(add_brin_index, remove_brin_index),
+    ]
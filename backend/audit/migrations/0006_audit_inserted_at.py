@@ -0,0 +1,21 @@
+# Generated by Django 5.0.1 on 2026-10-19 03:54
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("audit", "0005_time_ordered_ids"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="auditevent",
+            name="inserted_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False
+            ),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+from config.ids import time_ordered_pk
 
 
 class AuditEvent(models.Model):
@@ -37,6 +39,7 @@ class AuditEvent(models.Model):
         ('OTHER', 'Other Event'),
     ]
     
+    id = models.BigAutoField(primary_key=True, default=time_ordered_pk)
     event_type = models.CharField(max_length=100, choices=EVENT_TYPE_CHOICES)
     actor = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -62,13 +65,32 @@ class AuditEvent(models.Model):
     metadata = models.JSONField(default=dict, help_text="Event-specific data")
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True)
-    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    event_id = models.UUIDField(
+        unique=True,
+        null=True,
+        editable=False,
+        help_text="Emitter-assigned ID, makes spool replays idempotent"
+    )
+    # Set by the emitter at emit time, not when the buffer is flushed.
+    # Range scans use audit_created_id_idx (plus a BRIN index on Postgres).
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    # When the row was written. Sealing settles on this rather than
+    # created_at, since spooled events can be inserted long after emission.
+    inserted_at = models.DateTimeField(default=timezone.now, editable=False)
     
     class Meta:
         db_table = 'audit_events'
         verbose_name = 'Audit Event'
         verbose_name_plural = 'Audit Events'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination walks (created_at, id) within each filter
+            models.Index(fields=['organization', 'created_at', 'id'], name='audit_org_created_idx'),
+            models.Index(fields=['actor', 'created_at', 'id'], name='audit_actor_created_idx'),
+            models.Index(fields=['target_user', 'created_at', 'id'], name='audit_target_created_idx'),
+            models.Index(fields=['event_type', 'created_at', 'id'], name='audit_type_created_idx'),
+            models.Index(fields=['created_at', 'id'], name='audit_created_id_idx'),
+        ]
         permissions = [
             ('view_audit', 'Can view audit logs'),
         ]
@@ -79,10 +101,47 @@ class AuditEvent(models.Model):
     
     def save(self, *args, **kwargs):
         """Override save to prevent updates after creation."""
-        if self.pk:
+        # pk may already be set by the time-ordered ID default
+        if not self._state.adding:
             raise ValueError("Audit events are immutable and cannot be updated")
         super().save(*args, **kwargs)
     
     def delete(self, *args, **kwargs):
         """Prevent deletion of audit events."""
         raise ValueError("Audit events cannot be deleted")
+
+
+class AuditBatch(models.Model):
+    """
+    Merkle commitment over a contiguous range of audit events.
+    Each batch's chain hash covers the previous one, so rewriting any
+    committed event (or batch) breaks every later link.
+    """
+    
+    sequence = models.PositiveBigIntegerField(unique=True)
+    first_event_id = models.BigIntegerField()
+    last_event_id = models.BigIntegerField()
+    event_count = models.PositiveIntegerField()
+    merkle_root = models.CharField(max_length=64)
+    previous_chain_hash = models.CharField(max_length=64)
+    chain_hash = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'audit_batches'
+        verbose_name = 'Audit Batch'
+        verbose_name_plural = 'Audit Batches'
+        ordering = ['-sequence']
+    
+    def __str__(self):
+        return f"Batch #{self.sequence} (events {self.first_event_id}-{self.last_event_id})"
+    
+    def save(self, *args, **kwargs):
+        """Override save to prevent updates after creation."""
+        if self.pk:
+            raise ValueError("Audit batches are immutable and cannot be updated")
+        super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        """Prevent deletion of audit batches."""
+        raise ValueError("Audit batches cannot be deleted")
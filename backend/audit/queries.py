@@ -0,0 +1,77 @@
+import base64
+from datetime import datetime
+from django.db.models import Q
+from .archive import archive_max_ts, query_archive
+from .models import AuditEvent
+from .serializers import AuditEventSerializer
+
+FILTER_FIELDS = ['actor', 'target_user', 'organization', 'event_type']
+
+
+def encode_cursor(created_at, event_id):
+    """Opaque cursor pointing just past (created_at, id)."""
+    raw = f'{created_at.isoformat()}|{event_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return (created_at, id) from a cursor, or raise ValueError."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, event_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(event_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def query_events(filters, cursor=None, limit=50):
+    """
+    Page through audit events newest-first using a keyset cursor.
+
+    Each page is a range scan on one of the (<filter>, created_at, id)
+    indexes that starts right after the cursor, so the cost does not grow
+    with how deep into the table the caller has paged. Archived events are
+    merged in from the segment files transparently.
+
+    Returns (rows, next_cursor).
+    """
+    position = decode_cursor(cursor) if cursor else None
+
+    events = AuditEvent.objects.all()
+    for field in FILTER_FIELDS:
+        if filters.get(field) is not None:
+            events = events.filter(**{field: filters[field]})
+    if filters.get('since'):
+        events = events.filter(created_at__gte=filters['since'])
+    if filters.get('until'):
+        events = events.filter(created_at__lt=filters['until'])
+    if position:
+        created_at, event_id = position
+        events = events.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=event_id)
+        )
+
+    page = list(events.order_by('-created_at', '-id')[:limit + 1])
+
+    # Archived rows older than a full database page can't make it onto
+    # the page, so only newer ones are read - and none at all when the
+    # whole archive is older than the page
+    floor = (page[-1].created_at, page[-1].id) if len(page) > limit else None
+    newest_archived = archive_max_ts()
+    if newest_archived is not None and (floor is None or newest_archived >= floor[0]):
+        seen = {event.id for event in page}
+        page.extend(
+            AuditEvent(**row)
+            for row in query_archive(filters, cursor=position, floor=floor, limit=limit + 1)
+            if row['id'] not in seen
+        )
+    page.sort(key=lambda event: (event.created_at, event.id), reverse=True)
+
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = page[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return AuditEventSerializer(page, many=True).data, next_cursor
@@ -0,0 +1,185 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .merkle import (
+    canonical_event,
+    leaf_hash,
+    merkle_root,
+    inclusion_proof,
+    chain_hash,
+)
+from .models import AuditEvent, AuditBatch
+from .archive import iter_archived_events
+
+logger = logging.getLogger(__name__)
+
+GENESIS_CHAIN_HASH = '0' * 64
+
+EVENT_HASH_FIELDS = [
+    'id', 'event_id', 'event_type', 'actor_id', 'target_user_id',
+    'organization_id', 'metadata', 'ip_address', 'user_agent', 'created_at',
+]
+
+
+def get_leaves(first_event_id, last_event_id):
+    """
+    Return (event_ids, leaf_hashes) for events in an ID range,
+    reading archived events from segment files.
+    """
+    events = {
+        event['id']: event
+        for event in iter_archived_events(first_event_id, last_event_id)
+    }
+    rows = (
+        AuditEvent.objects
+        .filter(id__gte=first_event_id, id__lte=last_event_id)
+        .values(*EVENT_HASH_FIELDS)
+    )
+    for event in rows.iterator(chunk_size=2000):
+        events[event['id']] = event
+
+    ids = sorted(events)
+    return ids, [leaf_hash(canonical_event(events[event_id])) for event_id in ids]
+
+
+def seal_next_batch(max_size=None, settle_seconds=None):
+    """
+    Commit the next run of unsealed events as a batch.
+
+    Inserts never wait on this: events are written freely and sealed
+    afterwards in ID order. Only events inserted before the settle delay
+    are sealed, so in-flight inserts don't leave gaps behind a sealed
+    range. This goes by insert time, not created_at: an event replayed
+    from a spool is emitted long before it is written.
+    Returns the new AuditBatch, or None if there was nothing to seal.
+    """
+    max_size = max_size or settings.AUDIT_BATCH_MAX_SIZE
+    settle_seconds = settings.AUDIT_SEAL_DELAY if settle_seconds is None else settle_seconds
+    cutoff = timezone.now() - timedelta(seconds=settle_seconds)
+
+    previous = AuditBatch.objects.order_by('-sequence').first()
+    after_id = previous.last_event_id if previous else 0
+
+    candidates = list(
+        AuditEvent.objects
+        .filter(id__gt=after_id)
+        .order_by('id')
+        .values(*EVENT_HASH_FIELDS, 'inserted_at')[:max_size]
+    )
+    # Stop at the first event that is still too recent to be settled
+    events = []
+    for event in candidates:
+        if event.pop('inserted_at') >= cutoff:
+            break
+        events.append(event)
+    if not events:
+        return None
+
+    root = merkle_root([leaf_hash(canonical_event(event)) for event in events])
+    sequence = previous.sequence + 1 if previous else 1
+    previous_chain_hash = previous.chain_hash if previous else GENESIS_CHAIN_HASH
+    first_id, last_id = events[0]['id'], events[-1]['id']
+
+    try:
+        with transaction.atomic():
+            batch = AuditBatch.objects.create(
+                sequence=sequence,
+                first_event_id=first_id,
+                last_event_id=last_id,
+                event_count=len(events),
+                merkle_root=root.hex(),
+                previous_chain_hash=previous_chain_hash,
+                chain_hash=chain_hash(
+                    previous_chain_hash, sequence, first_id, last_id, len(events), root
+                ).hex(),
+            )
+    except IntegrityError:
+        # Another sealer committed this sequence first
+        return None
+    return batch
+
+
+def seal_pending_events(max_size=None, settle_seconds=None):
+    """Seal batches until no settled events remain. Returns the batch count."""
+    count = 0
+    while seal_next_batch(max_size, settle_seconds):
+        count += 1
+    return count
+
+
+def get_event_proof(event_id):
+    """
+    Inclusion proof for a single event against its batch root.
+    Returns None if the event has not been sealed yet.
+    """
+    batch = AuditBatch.objects.filter(
+        first_event_id__lte=event_id,
+        last_event_id__gte=event_id
+    ).first()
+    if batch is None:
+        return None
+
+    ids, leaves = get_leaves(batch.first_event_id, batch.last_event_id)
+    if event_id not in ids:
+        return None
+    index = ids.index(event_id)
+    return {
+        'event_id': event_id,
+        'batch_sequence': batch.sequence,
+        'leaf_hash': leaves[index].hex(),
+        'leaf_index': index,
+        'tree_size': len(leaves),
+        'proof': [node.hex() for node in inclusion_proof(leaves, index)],
+        'merkle_root': batch.merkle_root,
+        'chain_hash': batch.chain_hash,
+        'root_matches': merkle_root(leaves).hex() == batch.merkle_root,
+    }
+
+
+def verify_batches(start_sequence=None, end_sequence=None):
+    """
+    Recompute batch roots and check the hash chain over a range.
+    Returns a list of problems; an empty list means the range verified.
+    """
+    batches = AuditBatch.objects.order_by('sequence')
+    if start_sequence is not None:
+        batches = batches.filter(sequence__gte=start_sequence)
+    if end_sequence is not None:
+        batches = batches.filter(sequence__lte=end_sequence)
+
+    problems = []
+    previous = None
+    if start_sequence and start_sequence > 1:
+        previous = AuditBatch.objects.filter(sequence=start_sequence - 1).first()
+
+    for batch in batches.iterator():
+        expected_previous = previous.chain_hash if previous else GENESIS_CHAIN_HASH
+        if batch.previous_chain_hash != expected_previous:
+            problems.append(f"Batch #{batch.sequence}: broken link to previous batch")
+        if previous and batch.first_event_id <= previous.last_event_id:
+            problems.append(f"Batch #{batch.sequence}: overlaps previous batch")
+
+        _, leaves = get_leaves(batch.first_event_id, batch.last_event_id)
+        root = merkle_root(leaves)
+        if len(leaves) != batch.event_count:
+            problems.append(
+                f"Batch #{batch.sequence}: expected {batch.event_count} events, found {len(leaves)}"
+            )
+        elif root.hex() != batch.merkle_root:
+            problems.append(f"Batch #{batch.sequence}: Merkle root mismatch")
+
+        expected_chain = chain_hash(
+            batch.previous_chain_hash,
+            batch.sequence,
+            batch.first_event_id,
+            batch.last_event_id,
+            batch.event_count,
+            bytes.fromhex(batch.merkle_root)
+        ).hex()
+        if batch.chain_hash != expected_chain:
+            problems.append(f"Batch #{batch.sequence}: chain hash mismatch")
+        previous = batch
+
+    return problems
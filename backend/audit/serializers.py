@@ -0,0 +1,27 @@
+from rest_framework import serializers
+from .models import AuditEvent
+
+
+class AuditEventSerializer(serializers.ModelSerializer):
+    """Serializer for AuditEvent (IDs only, so listing needs no joins)."""
+    
+    class Meta:
+        model = AuditEvent
+        fields = [
+            'id', 'event_id', 'event_type', 'actor', 'target_user', 'organization',
+            'metadata', 'ip_address', 'user_agent', 'created_at'
+        ]
+        read_only_fields = fields
+
+
+class AuditQuerySerializer(serializers.Serializer):
+    """Query parameters for the audit event listing."""
+    
+    actor = serializers.IntegerField(required=False)
+    target_user = serializers.IntegerField(required=False)
+    organization = serializers.IntegerField(required=False)
+    event_type = serializers.ChoiceField(choices=AuditEvent.EVENT_TYPE_CHOICES, required=False)
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    cursor = serializers.CharField(required=False)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=200, default=50)
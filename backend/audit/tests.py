@@ -1,3 +1,262 @@
-from django.test import TestCase
+import os
+import json
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.models import User
+from . import archive
+from .emitter import AuditBuffer, build_record, replay_spool_file, write_records
+from .models import AuditBatch, AuditEvent
+from .sealing import get_event_proof, seal_pending_events, verify_batches
 
-# Create your tests here.
+
+class AuditSpoolTests(TestCase):
+
+    def setUp(self):
+        spool_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(spool_dir.cleanup)
+        self.spool_dir = spool_dir.name
+        # Flush and recover by hand rather than from the background thread
+        patcher = mock.patch.object(AuditBuffer, '_run')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_buffer(self):
+        return AuditBuffer(self.spool_dir, max_size=100, flush_interval=3600)
+
+    def spool_files(self):
+        return sorted(name for name in os.listdir(self.spool_dir) if name.endswith('.jsonl'))
+
+    def test_flush_writes_events_and_removes_spool(self):
+        buffer = self.make_buffer()
+        buffer.append(build_record('LOGIN_SUCCESS'))
+        buffer.append(build_record('LOGIN_FAILED'))
+        self.assertEqual(len(self.spool_files()), 1)
+
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(AuditEvent.objects.count(), 2)
+        # Only the fresh, empty spool is left
+        self.assertEqual(self.spool_files(), [os.path.basename(buffer._spool_path)])
+
+    def test_appended_events_are_forced_to_disk(self):
+        with mock.patch.object(os, 'fsync') as fsync:
+            buffer = self.make_buffer()
+            buffer.append(build_record('LOGIN_SUCCESS'))
+        # The new spool's directory entry, then the event itself
+        self.assertEqual(fsync.call_count, 2)
+        self.assertEqual(fsync.call_args.args[0], buffer._spool.fileno())
+
+        with mock.patch.object(os, 'fsync') as fsync:
+            unsynced = AuditBuffer(self.spool_dir, max_size=100, flush_interval=3600, fsync=False)
+            unsynced.append(build_record('LOGIN_SUCCESS'))
+        fsync.assert_not_called()
+
+    def test_recover_replays_abandoned_spool(self):
+        records = [build_record('CONSENT_GRANTED'), build_record('CONSENT_REVOKED')]
+        path = os.path.join(self.spool_dir, 'spool-1-dead.jsonl')
+        with open(path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+            f.write('{"torn": ')
+
+        buffer = self.make_buffer()
+        buffer.start()
+        buffer.recover()
+
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(
+            sorted(str(event_id) for event_id in AuditEvent.objects.values_list('event_id', flat=True)),
+            sorted(record['event_id'] for record in records)
+        )
+
+    def test_recover_skips_spool_of_live_buffer(self):
+        live = self.make_buffer()
+        live.append(build_record('LOGIN_SUCCESS'))
+        # The live spool is locked by its buffer, so it is left alone
+        replay_spool_file(live._spool_path)
+
+        self.assertEqual(AuditEvent.objects.count(), 0)
+        self.assertTrue(os.path.exists(live._spool_path))
+
+    def test_replay_is_idempotent(self):
+        record = build_record('LOGIN_SUCCESS')
+        write_records([record])
+        self.assertEqual(write_records([record, record]), 0)
+        self.assertEqual(AuditEvent.objects.count(), 1)
+
+    def test_id_collision_is_retried_with_new_ids(self):
+        existing = AuditEvent.objects.create(event_type='OTHER')
+        ids = iter([existing.id, existing.id + 1])
+        pk = AuditEvent._meta.pk
+        with mock.patch.dict(pk.__dict__, {'_get_default': lambda: next(ids)}):
+            self.assertEqual(write_records([build_record('LOGIN_SUCCESS')]), 1)
+
+        self.assertEqual(AuditEvent.objects.count(), 2)
+        self.assertTrue(AuditEvent.objects.filter(id=existing.id + 1, event_type='LOGIN_SUCCESS').exists())
+
+
+class AuditSealingTests(TestCase):
+
+    def insert(self, event_type, emitted_ago, inserted_ago=None):
+        """Write an event as the emitter would, backdated where asked."""
+        record = build_record(event_type)
+        record['created_at'] = (timezone.now() - emitted_ago).isoformat()
+        write_records([record])
+        event = AuditEvent.objects.get(event_id=record['event_id'])
+        if inserted_ago is not None:
+            AuditEvent.objects.filter(pk=event.pk).update(inserted_at=timezone.now() - inserted_ago)
+        return event
+
+    def test_sealed_batches_verify(self):
+        events = [self.insert('LOGIN_SUCCESS', timedelta(minutes=5), timedelta(minutes=5)) for _ in range(5)]
+        self.assertEqual(seal_pending_events(max_size=2, settle_seconds=60), 3)
+        self.assertEqual(verify_batches(), [])
+
+        proof = get_event_proof(events[2].id)
+        self.assertTrue(proof['root_matches'])
+        self.assertEqual(proof['batch_sequence'], 2)
+
+    def test_late_replayed_event_is_sealed_after_it_settles(self):
+        settled = self.insert('LOGIN_SUCCESS', timedelta(minutes=5), timedelta(minutes=5))
+        # Emitted ten minutes ago, but only just written from a spool
+        late = self.insert('CONSENT_GRANTED', timedelta(minutes=10))
+
+        self.assertEqual(seal_pending_events(settle_seconds=60), 1)
+        batch = AuditBatch.objects.get()
+        self.assertEqual((batch.first_event_id, batch.last_event_id), (settled.id, settled.id))
+        self.assertIsNone(get_event_proof(late.id))
+        self.assertEqual(verify_batches(), [])
+
+        AuditEvent.objects.filter(pk=late.pk).update(inserted_at=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(seal_pending_events(settle_seconds=60), 1)
+        self.assertTrue(get_event_proof(late.id)['root_matches'])
+        self.assertEqual(verify_batches(), [])
+
+    def test_tampered_event_fails_verification(self):
+        event = self.insert('LOGIN_SUCCESS', timedelta(minutes=5), timedelta(minutes=5))
+        seal_pending_events(settle_seconds=60)
+        AuditEvent.objects.filter(pk=event.pk).update(event_type='OTHER')
+        self.assertEqual(verify_batches(), ['Batch #1: Merkle root mismatch'])
+
+
+class AuditArchiveTestCase(TestCase):
+    """Runs with an empty archive directory of its own."""
+
+    def setUp(self):
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        override = override_settings(AUDIT_ARCHIVE_DIR=archive_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.admin = User.objects.create_superuser(email='admin@example.com', password='Pass12345!x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.now = timezone.now()
+
+    def make_events(self, count, start_minutes_ago, event_type='LOGIN_SUCCESS', **fields):
+        """count events one minute apart, oldest first."""
+        return [
+            AuditEvent.objects.create(
+                event_type=event_type,
+                created_at=self.now - timedelta(minutes=start_minutes_ago - offset),
+                **fields
+            )
+            for offset in range(count)
+        ]
+
+    def list_all(self, **params):
+        """Follow next_cursor to the end; returns the pages' event IDs."""
+        pages = []
+        while True:
+            response = self.client.get('/api/v1/audit/events', params)
+            self.assertEqual(response.status_code, 200)
+            pages.append([event['id'] for event in response.json()['results']])
+            cursor = response.json()['next_cursor']
+            if cursor is None:
+                return pages
+            params['cursor'] = cursor
+
+
+class AuditPaginationTests(AuditArchiveTestCase):
+
+    def test_pages_walk_newest_first_without_gaps(self):
+        events = self.make_events(7, 10)
+        # Ties on created_at are broken by ID
+        tied = AuditEvent.objects.create(event_type='OTHER', created_at=events[3].created_at)
+        expected = sorted(events + [tied], key=lambda event: (event.created_at, event.id), reverse=True)
+
+        pages = self.list_all(limit=3)
+        self.assertEqual([len(page) for page in pages], [3, 3, 2])
+        self.assertEqual(sum(pages, []), [event.id for event in expected])
+
+    def test_filters_apply_across_pages(self):
+        self.make_events(4, 20, event_type='CONSENT_GRANTED')
+        self.make_events(4, 10, event_type='LOGIN_FAILED')
+        pages = self.list_all(limit=3, event_type='CONSENT_GRANTED')
+        self.assertEqual(len(sum(pages, [])), 4)
+        self.assertEqual(
+            set(AuditEvent.objects.filter(id__in=sum(pages, [])).values_list('event_type', flat=True)),
+            {'CONSENT_GRANTED'}
+        )
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/v1/audit/events', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error']['code'], 'INVALID_CURSOR')
+
+    def test_citizens_cannot_list_events(self):
+        citizen = User.objects.create_user(email='citizen@example.com', password='Pass12345!x')
+        self.client.force_authenticate(citizen)
+        self.assertEqual(self.client.get('/api/v1/audit/events').status_code, 403)
+
+
+class AuditArchiveMergeTests(AuditArchiveTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.archived = (
+            self.make_events(2, 200, event_type='CONSENT_GRANTED')
+            + self.make_events(4, 150, event_type='LOGIN_SUCCESS')
+        )
+        self.recent = self.make_events(4, 10)
+        seal_pending_events(settle_seconds=0)
+        archive.archive_events(self.now - timedelta(minutes=60), block_rows=2)
+
+        read = archive.Segment.column
+        patcher = mock.patch.object(archive.Segment, 'column', autospec=True, side_effect=read)
+        self.column = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def blocks_read(self):
+        """Blocks whose rows were tested, as counted by ID column reads."""
+        return sum(1 for call in self.column.call_args_list if call.args[2] == 'id')
+
+    def test_pages_continue_into_archive(self):
+        self.assertEqual(AuditEvent.objects.count(), 4)
+        pages = self.list_all(limit=3)
+        self.assertEqual(
+            sum(pages, []),
+            [event.id for event in reversed(self.archived + self.recent)]
+        )
+        self.assertEqual(verify_batches(), [])
+
+    def test_full_page_newer_than_archive_skips_it(self):
+        response = self.client.get('/api/v1/audit/events', {'limit': 3})
+        self.assertEqual(len(response.json()['results']), 3)
+        self.column.assert_not_called()
+
+    def test_floor_prunes_older_blocks(self):
+        floor = self.archived[3]
+        rows = archive.query_archive({}, floor=(floor.created_at, floor.id), limit=10)
+        self.assertEqual([row['id'] for row in rows], [self.archived[5].id, self.archived[4].id])
+        # The oldest of the three blocks is never inflated
+        self.assertEqual(self.blocks_read(), 2)
+
+    def test_event_type_prunes_blocks(self):
+        rows = archive.query_archive({'event_type': 'CONSENT_GRANTED'}, limit=10)
+        self.assertEqual([row['id'] for row in rows], [self.archived[1].id, self.archived[0].id])
+        self.assertEqual(self.blocks_read(), 1)
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('events', views.list_audit_events, name='list-audit-events'),
+    path('events/<int:event_id>/proof', views.get_event_proof, name='audit-event-proof'),
+    path('batches/verify', views.verify_audit_batches, name='verify-audit-batches'),
+]
@@ -1,3 +1,122 @@
-from django.shortcuts import render
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from . import sealing
+from .queries import query_events
+from .serializers import AuditQuerySerializer
 
-# Create your views here.
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def list_audit_events(request):
+    """
+    List audit events, newest first, with keyset pagination.
+    - Admins see all events
+    - Organization users see their organization's events
+    
+    GET /api/v1/audit/events?actor=&target_user=&organization=&event_type=&since=&until=&cursor=&limit=
+    """
+    if request.user.role not in ('ADMIN', 'ORG_USER'):
+        return Response({
+            'error': {
+                'code': 'PERMISSION_DENIED',
+                'message': 'You do not have permission to view audit events'
+            }
+        }, status=status.HTTP_403_FORBIDDEN)
+    
+    serializer = AuditQuerySerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    filters = dict(serializer.validated_data)
+    
+    if request.user.role == 'ORG_USER':
+        filters['organization'] = request.user.org_id
+        if filters['organization'] is None:
+            return Response({
+                'error': {
+                    'code': 'NOT_FOUND',
+                    'message': 'Organization profile not found'
+                }
+            }, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        results, next_cursor = query_events(
+            filters,
+            cursor=filters.pop('cursor', None),
+            limit=filters.pop('limit')
+        )
+    except ValueError:
+        return Response({
+            'error': {
+                'code': 'INVALID_CURSOR',
+                'message': 'Invalid pagination cursor'
+            }
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({
+        'results': results,
+        'next_cursor': next_cursor
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_event_proof(request, event_id):
+    """
+    Get the Merkle inclusion proof for an audit event.
+    
+    GET /api/v1/audit/events/{id}/proof
+    """
+    if request.user.role != 'ADMIN':
+        return Response({
+            'error': {
+                'code': 'PERMISSION_DENIED',
+                'message': 'Only admins can view audit proofs'
+            }
+        }, status=status.HTTP_403_FORBIDDEN)
+    
+    proof = sealing.get_event_proof(event_id)
+    if proof is None:
+        return Response({
+            'error': {
+                'code': 'NOT_FOUND',
+                'message': 'Audit event not found or not sealed yet'
+            }
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response(proof)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def verify_audit_batches(request):
+    """
+    Verify Merkle roots and the hash chain over a range of batches.
+    
+    GET /api/v1/audit/batches/verify?from=1&to=100
+    """
+    if request.user.role != 'ADMIN':
+        return Response({
+            'error': {
+                'code': 'PERMISSION_DENIED',
+                'message': 'Only admins can verify the audit log'
+            }
+        }, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        start = int(request.query_params['from']) if 'from' in request.query_params else None
+        end = int(request.query_params['to']) if 'to' in request.query_params else None
+    except ValueError:
+        return Response({
+            'error': {
+                'code': 'INVALID_RANGE',
+                'message': 'from and to must be batch sequence numbers'
+            }
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    problems = sealing.verify_batches(start, end)
+    return Response({
+        'valid': not problems,
+        'problems': problems
+    })
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
 application = get_asgi_application()
+
+# kill -USR2 <pid> logs that worker's memory report (if tracking is on)
+from monitoring.memory import install_report_signal  # noqa: E402
+
+install_report_signal()
@@ -0,0 +1,30 @@
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+
+class TTLCache:
+    """Small process-local cache whose entries expire after ttl seconds."""
+
+    def __init__(self, ttl, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < monotonic():
+            return None
+        return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
@@ -0,0 +1,27 @@
+import multiprocessing
+
+
+def process_pool_context():
+    """
+    Multiprocessing context for the project's process pools.
+
+    Pools are created lazily from request handler threads. Forking a
+    multi-threaded process copies locks other threads may be holding
+    (logging, DB drivers, the allocator), so workers are started from a
+    fork server, or spawned where there is none, rather than forked.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+def setup_django_worker():
+    """
+    Process pool initializer for workers that need Django configured
+    (settings, hashers, models). Lives here because workers import it
+    before apps are ready, which an app module's imports may not allow.
+    """
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
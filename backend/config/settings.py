@@ -47,9 +47,15 @@ INSTALLED_APPS = [
     "credentials",
     "uploads",
     "audit",
+    "monitoring",
+    "notifications",
 ]
 
 MIDDLEWARE = [
+    "monitoring.middleware.MetricsMiddleware",  # First, so timings cover the whole stack
+    "monitoring.middleware.TracingMiddleware",
+    "monitoring.middleware.NPlusOneMiddleware",
+    "monitoring.middleware.MemoryTrackingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",  # CORS - must be before CommonMiddleware
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -58,6 +64,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "monitoring.middleware.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
@@ -80,6 +87,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "config.wsgi.application"
 
+# Writes audit events inline and spools to a temp dir during tests
+TEST_RUNNER = "config.test_runner.TestRunner"
+
 # =============================================================================
 # DATABASE - Neon PostgreSQL
 # =============================================================================
@@ -101,12 +111,39 @@ if 'postgresql' in DATABASES['default']['ENGINE']:
         'DISABLE_SERVER_SIDE_CURSORS', default=True, cast=bool
     )
 
+# Time-ordered (UUIDv7-style) 64-bit IDs for the append-only tables
+# (verification history/events, audit events), so ID ranges map to time
+# ranges. New IDs sort after all sequence-assigned ones; don't switch this
+# back off on Postgres, or new rows would sort before existing ones.
+# IDs exceed 2^53, so JavaScript clients should treat them as opaque.
+TIME_ORDERED_IDS = config('TIME_ORDERED_IDS', default=False, cast=bool)
+
 # =============================================================================
 # AUTHENTICATION & AUTHORIZATION
 # =============================================================================
 
 AUTH_USER_MODEL = 'accounts.User'
 
+# Password hashing profile. Measure candidates on the production hardware
+# with `manage.py benchmark_hashers --target-ms 250` and set the values it
+# recommends; users are rehashed with the new profile on their next login.
+PASSWORD_HASH_PROFILE = config('PASSWORD_HASH_PROFILE', default='pbkdf2')  # pbkdf2 or scrypt
+PASSWORD_PBKDF2_ITERATIONS = config('PASSWORD_PBKDF2_ITERATIONS', default=720000, cast=int)
+PASSWORD_SCRYPT_N = config('PASSWORD_SCRYPT_N', default=2 ** 14, cast=int)
+PASSWORD_SCRYPT_R = config('PASSWORD_SCRYPT_R', default=8, cast=int)
+PASSWORD_SCRYPT_P = config('PASSWORD_SCRYPT_P', default=1, cast=int)
+
+_PASSWORD_HASHER_PROFILES = {
+    'pbkdf2': 'accounts.hashers.TunedPBKDF2PasswordHasher',
+    'scrypt': 'accounts.hashers.TunedScryptPasswordHasher',
+}
+# The first hasher hashes new passwords; the rest only verify existing ones
+PASSWORD_HASHERS = [_PASSWORD_HASHER_PROFILES[PASSWORD_HASH_PROFILE]] + [
+    hasher for profile, hasher in _PASSWORD_HASHER_PROFILES.items() if profile != PASSWORD_HASH_PROFILE
+] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -128,7 +165,7 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.ClaimsJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -167,10 +204,67 @@ SIMPLE_JWT = {
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
     
-    'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
+    'AUTH_TOKEN_CLASSES': ('accounts.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+    
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.tokens.ClaimsTokenRefreshSerializer',
 }
 
+# How long each worker trusts a user's cached token version / active flag
+# (and full user row) before re-reading it. Bounds how long a disabled
+# account or stale claims stay usable on other workers.
+AUTH_CLAIMS_CACHE_TTL = config('AUTH_CLAIMS_CACHE_TTL', default=30, cast=int)
+
+# Sign tokens with a rotating asymmetric key pair (published at
+# /.well-known/jwks.json) instead of the shared HS256 secret above.
+# Tokens without a kid header are still accepted while
+# JWT_ACCEPT_LEGACY_HS256 is on; turn it off once they have expired.
+JWT_ASYMMETRIC_SIGNING = config('JWT_ASYMMETRIC_SIGNING', default=True, cast=bool)
+JWT_KEY_ALGORITHM = config('JWT_KEY_ALGORITHM', default='EdDSA')  # EdDSA or RS256
+JWT_ACCEPT_LEGACY_HS256 = config('JWT_ACCEPT_LEGACY_HS256', default=True, cast=bool)
+# Encrypts the private keys stored in the database. Required with asymmetric
+# signing, so a leaked or defaulted SECRET_KEY doesn't also expose them.
+# Changing it makes existing keys unreadable: rotate with --force first.
+JWT_KEY_ENCRYPTION_SECRET = (
+    config('JWT_KEY_ENCRYPTION_SECRET') if JWT_ASYMMETRIC_SIGNING
+    else config('JWT_KEY_ENCRYPTION_SECRET', default='')
+)
+JWT_KEY_ROTATION_DAYS = config('JWT_KEY_ROTATION_DAYS', default=30, cast=int)
+# New keys are published this many seconds before they start signing,
+# so verifiers that cache the JWKS pick them up first
+JWT_KEY_PUBLISH_AHEAD = config('JWT_KEY_PUBLISH_AHEAD', default=86400, cast=int)
+JWT_KEYS_RELOAD_INTERVAL = config('JWT_KEYS_RELOAD_INTERVAL', default=300, cast=int)
+JWT_JWKS_MAX_AGE = config('JWT_JWKS_MAX_AGE', default=3600, cast=int)
+
+# Revoked sessions (logout, disabled accounts) are held in memory by each
+# worker, which pulls new revocations every JWT_REVOCATION_SYNC_INTERVAL
+# seconds; entries are dropped in buckets of JWT_REVOCATION_BUCKET_SECONDS
+# once the tokens they cover have expired.
+JWT_REVOCATION_SYNC_INTERVAL = config('JWT_REVOCATION_SYNC_INTERVAL', default=5, cast=int)
+JWT_REVOCATION_BUCKET_SECONDS = config('JWT_REVOCATION_BUCKET_SECONDS', default=60, cast=int)
+
+# Login password checks run in a per-process pool of LOGIN_HASH_WORKERS
+# threads with at most LOGIN_HASH_MAX_QUEUE waiting; further logins (and
+# any waiting longer than LOGIN_HASH_TIMEOUT seconds) get a 503.
+LOGIN_HASH_WORKERS = config('LOGIN_HASH_WORKERS', default=2, cast=int)
+LOGIN_HASH_MAX_QUEUE = config('LOGIN_HASH_MAX_QUEUE', default=8, cast=int)
+LOGIN_HASH_TIMEOUT = config('LOGIN_HASH_TIMEOUT', default=5.0, cast=float)
+LOGIN_RETRY_AFTER = config('LOGIN_RETRY_AFTER', default=2, cast=int)
+
+# Bulk staff provisioning (POST /organizations/{id}/users/bulk and
+# `manage.py provision_org_users`) hashes passwords in a process pool
+ORG_PROVISIONING_HASH_WORKERS = config('ORG_PROVISIONING_HASH_WORKERS', default=4, cast=int)
+ORG_PROVISIONING_MAX_ROWS = config('ORG_PROVISIONING_MAX_ROWS', default=1000, cast=int)
+
+# The organization directory (GET /organizations) is served from a copy in
+# each worker; other workers' changes are picked up within this many seconds
+ORG_DIRECTORY_CHECK_INTERVAL = config('ORG_DIRECTORY_CHECK_INTERVAL', default=5, cast=int)
+
+# Organization dashboard metrics are cached per worker for this many seconds;
+# the worker recording a verification or consent change drops them at once,
+# other workers may serve stale figures until their copy expires
+ORG_DASHBOARD_CACHE_TTL = config('ORG_DASHBOARD_CACHE_TTL', default=60, cast=int)
+
 # =============================================================================
 # CORS SETTINGS
 # =============================================================================
@@ -221,6 +315,19 @@ DEFAULT_FROM_EMAIL = config(
     default='NID Privacy Pass <noreply@nidprivacypass.com>'
 )
 
+# Emails are queued in the outbox table and delivered in batches, over one
+# SMTP connection per batch, by a background thread in each web worker.
+# Set EMAIL_DISPATCHER_IN_PROCESS=False and run `manage.py dispatch_emails`
+# instead to send from a single process (EMAIL_RATE_LIMIT is per dispatcher).
+EMAIL_DISPATCHER_IN_PROCESS = config('EMAIL_DISPATCHER_IN_PROCESS', default=True, cast=bool)
+EMAIL_BATCH_SIZE = config('EMAIL_BATCH_SIZE', default=50, cast=int)
+EMAIL_POLL_INTERVAL = config('EMAIL_POLL_INTERVAL', default=10.0, cast=float)
+EMAIL_RATE_LIMIT = config('EMAIL_RATE_LIMIT', default=0, cast=float)  # messages/second, 0 = unlimited
+EMAIL_MAX_ATTEMPTS = config('EMAIL_MAX_ATTEMPTS', default=8, cast=int)
+EMAIL_RETRY_BASE_DELAY = config('EMAIL_RETRY_BASE_DELAY', default=30, cast=int)  # doubles per attempt
+EMAIL_RETRY_MAX_DELAY = config('EMAIL_RETRY_MAX_DELAY', default=3600, cast=int)
+EMAIL_CLAIM_LEASE = config('EMAIL_CLAIM_LEASE', default=300, cast=int)
+
 # =============================================================================
 # SECURITY & PRIVACY
 # =============================================================================
@@ -242,6 +349,56 @@ ALLOWED_DOCUMENT_FORMATS = config(
     default='jpg,jpeg,png,pdf'
 ).split(',')
 
+# Image normalization (auto-orient, strip metadata, downsize, re-encode)
+IMAGE_NORMALIZATION_ENABLED = config('IMAGE_NORMALIZATION_ENABLED', default=True, cast=bool)
+IMAGE_MAX_DIMENSION = config('IMAGE_MAX_DIMENSION', default=2048, cast=int)
+IMAGE_OUTPUT_FORMAT = config('IMAGE_OUTPUT_FORMAT', default='WEBP').upper()
+IMAGE_OUTPUT_QUALITY = config('IMAGE_OUTPUT_QUALITY', default=82, cast=int)
+IMAGE_PROCESS_POOL_WORKERS = config('IMAGE_PROCESS_POOL_WORKERS', default=2, cast=int)
+IMAGE_PROCESSING_TIMEOUT = config('IMAGE_PROCESSING_TIMEOUT', default=30, cast=int)
+KEEP_ORIGINAL_UPLOADS = config('KEEP_ORIGINAL_UPLOADS', default=False, cast=bool)
+
+# Concurrent uploads for multi-document submissions
+UPLOAD_THREAD_POOL_WORKERS = config('UPLOAD_THREAD_POOL_WORKERS', default=8, cast=int)
+
+# Review thumbnails (generated lazily, cached on local disk)
+THUMBNAIL_SIZES = {
+    'small': 256,
+    'medium': 768,
+}
+THUMBNAIL_CACHE_DIR = config('THUMBNAIL_CACHE_DIR', default=str(BASE_DIR / 'cache' / 'thumbnails'))
+THUMBNAIL_CACHE_MAX_MB = config('THUMBNAIL_CACHE_MAX_MB', default=512, cast=int)
+THUMBNAIL_CACHE_MAX_AGE = config('THUMBNAIL_CACHE_MAX_AGE', default=31536000, cast=int)
+THUMBNAIL_FETCH_TIMEOUT = config('THUMBNAIL_FETCH_TIMEOUT', default=15, cast=int)
+
+# Orphaned upload cleanup (see `manage.py gc_uploads`)
+UPLOAD_GC_GRACE_DAYS = config('UPLOAD_GC_GRACE_DAYS', default=7, cast=int)
+
+# =============================================================================
+# AUDIT LOG
+# =============================================================================
+
+# Audit events are spooled to disk and written in batches by a background thread
+AUDIT_BUFFER_ENABLED = config('AUDIT_BUFFER_ENABLED', default=True, cast=bool)
+AUDIT_BUFFER_SIZE = config('AUDIT_BUFFER_SIZE', default=100, cast=int)
+AUDIT_FLUSH_INTERVAL = config('AUDIT_FLUSH_INTERVAL', default=2.0, cast=float)
+AUDIT_SPOOL_DIR = config('AUDIT_SPOOL_DIR', default=str(BASE_DIR / 'var' / 'audit_spool'))
+# Each spooled event is fsynced before the request carries on, so events
+# survive power loss and kernel crashes, at the cost of a disk flush (well
+# under a millisecond on SSDs, several on network disks) per event. With
+# False, only a crash of the worker process itself is survived.
+AUDIT_SPOOL_FSYNC = config('AUDIT_SPOOL_FSYNC', default=True, cast=bool)
+
+# Merkle batch commitments (see `manage.py seal_audit_log`)
+AUDIT_BATCH_MAX_SIZE = config('AUDIT_BATCH_MAX_SIZE', default=1024, cast=int)
+AUDIT_SEAL_DELAY = config('AUDIT_SEAL_DELAY', default=60, cast=int)
+
+# Cold-tier archive of sealed events (see `manage.py archive_audit_log`)
+AUDIT_ARCHIVE_DIR = config('AUDIT_ARCHIVE_DIR', default=str(BASE_DIR / 'var' / 'audit_archive'))
+AUDIT_ARCHIVE_AFTER_DAYS = config('AUDIT_ARCHIVE_AFTER_DAYS', default=90, cast=int)
+AUDIT_SEGMENT_MAX_ROWS = config('AUDIT_SEGMENT_MAX_ROWS', default=200000, cast=int)
+AUDIT_SEGMENT_BLOCK_ROWS = config('AUDIT_SEGMENT_BLOCK_ROWS', default=4096, cast=int)
+
 # =============================================================================
 # INTERNATIONALIZATION
 # =============================================================================
@@ -295,6 +452,51 @@ LOGGING = {
     },
 }
 
+# =============================================================================
+# MONITORING
+# =============================================================================
+
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='127.0.0.1,::1').split(',')
+
+# Shared directory for per-worker metric files when running several worker
+# processes (gunicorn etc.). Empty it before (re)starting the server.
+PROMETHEUS_MULTIPROC_DIR = config('PROMETHEUS_MULTIPROC_DIR', default='')
+if PROMETHEUS_MULTIPROC_DIR:
+    # prometheus_client reads this from the environment at import time
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = PROMETHEUS_MULTIPROC_DIR
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+# Tracing: spans for views, serializers, SQL, password hashing, email and
+# Cloudinary calls. Traces are exported as OTLP/JSON, one request per line
+# in TRACE_EXPORT_FILE and/or POSTed to an OTLP/HTTP collector
+# (e.g. http://localhost:4318/v1/traces).
+TRACING_ENABLED = config('TRACING_ENABLED', default=False, cast=bool)
+TRACE_SAMPLE_RATE = config('TRACE_SAMPLE_RATE', default=0.01, cast=float)
+TRACE_EXPORT_FILE = config('TRACE_EXPORT_FILE', default=str(BASE_DIR / 'var' / 'traces' / 'spans.jsonl'))
+TRACE_OTLP_ENDPOINT = config('TRACE_OTLP_ENDPOINT', default='')
+TRACE_EXPORT_TIMEOUT = config('TRACE_EXPORT_TIMEOUT', default=2, cast=int)
+TRACE_SERVICE_NAME = config('TRACE_SERVICE_NAME', default='identity-shield-backend')
+
+# N+1 detection (development/staging): report query shapes run more than
+# NPLUSONE_THRESHOLD times in one request; raise instead when NPLUSONE_RAISE.
+NPLUSONE_ENABLED = config('NPLUSONE_ENABLED', default=False, cast=bool)
+NPLUSONE_THRESHOLD = config('NPLUSONE_THRESHOLD', default=5, cast=int)
+NPLUSONE_RAISE = config('NPLUSONE_RAISE', default=False, cast=bool)
+
+# On-demand profiling: admins send X-Profile: 1 (or ?_profile=1) to run one
+# request under cProfile; stats are written to PROFILE_DIR.
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=True, cast=bool)
+PROFILE_DIR = config('PROFILE_DIR', default=str(BASE_DIR / 'var' / 'profiles'))
+PROFILE_SUMMARY_LIMIT = config('PROFILE_SUMMARY_LIMIT', default=5, cast=int)
+
+# Memory growth tracking with tracemalloc (slows allocation, so opt-in).
+# Requests whose peak allocation exceeds the threshold are logged; 0 disables.
+MEMORY_TRACKING_ENABLED = config('MEMORY_TRACKING_ENABLED', default=False, cast=bool)
+MEMORY_TRACE_FRAMES = config('MEMORY_TRACE_FRAMES', default=10, cast=int)
+MEMORY_REQUEST_THRESHOLD_MB = config('MEMORY_REQUEST_THRESHOLD_MB', default=50, cast=int)
+MEMORY_REPORT_LIMIT = config('MEMORY_REPORT_LIMIT', default=20, cast=int)
+
 # =============================================================================
 # OTHER SETTINGS
 # =============================================================================
@@ -0,0 +1,26 @@
+import tempfile
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Test runner that writes audit events inline, so each test's events
+    roll back with it instead of reaching a later test from the flush
+    thread, and keeps spools out of the real AUDIT_SPOOL_DIR, where the
+    audit buffer would replay them into the next database it runs on.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._spool_dir = tempfile.TemporaryDirectory()
+        self._audit_settings = override_settings(
+            AUDIT_BUFFER_ENABLED=False,
+            AUDIT_SPOOL_DIR=self._spool_dir.name
+        )
+        self._audit_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._audit_settings.disable()
+        self._spool_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,56 @@
+import threading
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
+from django.test import SimpleTestCase
+from . import ids
+
+
+class TimeOrderedIdTests(SimpleTestCase):
+
+    def test_ids_strictly_increase(self):
+        values = [ids.generate_time_ordered_id() for _ in range(20000)]
+        self.assertEqual(values, sorted(set(values)))
+
+    def test_ids_are_unique_across_threads(self):
+        values = []
+
+        def generate():
+            batch = [ids.generate_time_ordered_id() for _ in range(5000)]
+            with lock:
+                values.extend(batch)
+
+        lock = threading.Lock()
+        threads = [threading.Thread(target=generate) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(values)), 20000)
+
+    def test_sequence_overflow_borrows_next_millisecond(self):
+        # A millisecond ahead of any ID issued so far
+        now = ids._now_ms() + 1000
+        with mock.patch.object(ids, '_now_ms', return_value=now):
+            values = [ids.generate_time_ordered_id() for _ in range(ids.SEQUENCE_MASK + 2)]
+        self.assertEqual(values, sorted(set(values)))
+        self.assertEqual(values[-2] >> ids.LOW_BITS, now)
+        self.assertEqual(values[-1] >> ids.LOW_BITS, now + 1)
+
+    def test_forked_process_draws_its_own_node(self):
+        nodes = iter([1, 2])
+        with mock.patch.object(ids.secrets, 'randbits', side_effect=lambda bits: next(nodes)), \
+                mock.patch.object(ids, '_now_ms', return_value=10 ** 9):
+            with mock.patch.object(ids.os, 'getpid', return_value=-1):
+                parent = ids.generate_time_ordered_id()
+            with mock.patch.object(ids.os, 'getpid', return_value=-2):
+                child = ids.generate_time_ordered_id()
+        # Same millisecond and sequence, told apart by the node
+        self.assertNotEqual(parent, child)
+        self.assertEqual(parent >> ids.SEQUENCE_BITS, ((10 ** 9) << ids.NODE_BITS) | 1)
+        self.assertEqual(child >> ids.SEQUENCE_BITS, ((10 ** 9) << ids.NODE_BITS) | 2)
+
+    def test_id_floor_matches_encoded_time(self):
+        moment = datetime(2025, 6, 1, 12, 30, tzinfo=dt_timezone.utc)
+        floor = ids.id_floor(moment)
+        self.assertEqual(ids.id_to_datetime(floor), moment)
+        self.assertEqual(ids.id_to_datetime(floor + (1 << ids.LOW_BITS) - 1), moment)
@@ -1,12 +1,16 @@
 from django.contrib import admin
 from django.urls import path, include
+from accounts.views import jwks
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('.well-known/jwks.json', jwks, name='well-known-jwks'),
     path('api/v1/auth/', include('accounts.urls')),
     path('api/v1/enrollment/', include('identity.urls')),
     path('api/v1/uploads/', include('uploads.urls')),
     path('api/v1/organizations/', include('organizations.urls')),
     path('api/v1/credentials/', include('credentials.urls')),
     path('api/v1/consent/', include('consent.urls')),
+    path('api/v1/audit/', include('audit.urls')),
+    path('', include('monitoring.urls')),
 ]
@@ -3,10 +3,10 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from .models import ConsentGrant
-from identity.models import CitizenProfile
 from organizations.models import Organization
 from .serializers import ConsentGrantSerializer, ConsentCreateSerializer
 from django.utils import timezone
+from audit.emitter import emit_event
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
@@ -28,11 +28,18 @@ def manage_grants(request):
             }
         }, status=status.HTTP_403_FORBIDDEN)
         
-    citizen = request.user.citizen_profile
+    citizen_id = request.user.citizen_id
+    if citizen_id is None:
+        return Response({
+            'error': {
+                'code': 'PROFILE_NOT_FOUND',
+                'message': 'Citizen profile not found'
+            }
+        }, status=status.HTTP_404_NOT_FOUND)
 
     # HANDLE GET
     if request.method == 'GET':
-        grants = ConsentGrant.objects.filter(citizen=citizen, is_active=True).order_by('-granted_at')
+        grants = ConsentGrant.objects.filter(citizen_id=citizen_id, is_active=True).order_by('-granted_at')
         return Response(ConsentGrantSerializer(grants, many=True).data)
 
     # HANDLE POST
@@ -48,7 +55,7 @@ def manage_grants(request):
             
         # Update existing or create new
         grant, created = ConsentGrant.objects.update_or_create(
-            citizen=citizen,
+            citizen_id=citizen_id,
             organization=organization,
             defaults={
                 'scopes': scopes,
@@ -57,6 +64,13 @@ def manage_grants(request):
                 'granted_at': timezone.now() # Update timestamp if re-granting
             }
         )
+        emit_event(
+            'CONSENT_GRANTED',
+            request=request,
+            target_user=request.user,
+            organization=organization,
+            metadata={'grant_id': grant.id, 'scopes': scopes}
+        )
         
         return Response(ConsentGrantSerializer(grant).data, status=status.HTTP_201_CREATED)
         
@@ -71,9 +85,15 @@ def revoke_consent(request, grant_id):
     POST /api/v1/consent/grants/{id}/revoke
     """
     try:
-        citizen = request.user.citizen_profile
-        grant = ConsentGrant.objects.get(id=grant_id, citizen=citizen)
+        grant = ConsentGrant.objects.get(id=grant_id, citizen_id=request.user.citizen_id)
         grant.revoke()
+        emit_event(
+            'CONSENT_REVOKED',
+            request=request,
+            target_user=request.user,
+            organization=grant.organization_id,
+            metadata={'grant_id': grant.id}
+        )
         return Response({'status': 'revoked'})
-    except (CitizenProfile.DoesNotExist, ConsentGrant.DoesNotExist):
+    except ConsentGrant.DoesNotExist:
         return Response({'error': 'Grant not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,49 @@
+# Generated by Django 5.0.1 on 2026-10-19 03:05
+
+import config.ids
+from django.contrib.postgres.indexes import BrinIndex
+from django.db import migrations, models
+
+# Rows are appended in time order, so BRIN indexes on verified_at support
+# time-bounded scans at a tiny fraction of a B-tree's size.
+BRIN_INDEXES = [
+    ("VerificationEvent", BrinIndex(fields=["verified_at"], name="verif_event_verified_brin")),
+    ("VerificationHistory", BrinIndex(fields=["verified_at"], name="verif_history_verified_brin")),
+]
+
+
+def add_brin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for model_name, index in BRIN_INDEXES:
+            schema_editor.add_index(apps.get_model("credentials", model_name), index)
+
+
+def remove_brin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for model_name, index in BRIN_INDEXES:
+            schema_editor.remove_index(apps.get_model("credentials", model_name), index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("credentials", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="verificationevent",
+            name="id",
+            field=models.BigAutoField(
+                default=config.ids.time_ordered_pk, primary_key=True, serialize=False
+            ),
+        ),
+        migrations.AlterField(
+            model_name="verificationhistory",
+            name="id",
+            field=models.BigAutoField(
+                default=config.ids.time_ordered_pk, primary_key=True, serialize=False
+            ),
+        ),
+        migrations.RunPython(add_brin_indexes, remove_brin_indexes),
+    ]
@@ -2,6 +2,7 @@ import uuid
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
+from config.ids import time_ordered_pk
 
 
 class AliasIdentifier(models.Model):
@@ -99,6 +100,7 @@ class VerificationEvent(models.Model):
     Records what was disclosed and when.
     """
     
+    id = models.BigAutoField(primary_key=True, default=time_ordered_pk)
     request = models.ForeignKey(
         VerificationRequest,
         on_delete=models.CASCADE,
@@ -133,7 +135,9 @@ class VerificationEvent(models.Model):
 class VerificationHistory(models.Model):
     """
     Simple log of instant verifications.
+    status is SUCCESS, or DENIED when the organization had no consent.
     """
+    id = models.BigAutoField(primary_key=True, default=time_ordered_pk)
     organization = models.ForeignKey(
         'organizations.Organization',
         on_delete=models.CASCADE,
@@ -1,3 +1,79 @@
+from datetime import date
 from django.test import TestCase
+from rest_framework.test import APIClient
+from accounts.authentication import forget_users
+from accounts.models import User
+from accounts.tokens import issue_tokens
+from audit.models import AuditEvent
+from consent.models import ConsentGrant
+from identity.models import CitizenProfile
+from organizations import dashboard
+from organizations.models import Organization, OrgUser
+from .models import AliasIdentifier, VerificationHistory
 
-# Create your tests here.
+
+class VerifyCredentialTests(TestCase):
+
+    def setUp(self):
+        self.organization = Organization.objects.create(
+            name='Bank A', org_type='Bank', registration_number='REG-1', approval_status='APPROVED'
+        )
+        verifier = self.make_user('verifier@example.com', role='ORG_USER')
+        OrgUser.objects.create(user=verifier, organization=self.organization)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_tokens(verifier).access_token}')
+
+        self.citizen = CitizenProfile.objects.create(
+            user=self.make_user('citizen@example.com'), full_name='Citizen', nid_number_hash='hash',
+            date_of_birth=date(1990, 1, 1), residency_district='Dhaka'
+        )
+        self.alias = AliasIdentifier.objects.create(
+            citizen=self.citizen, alias_type='GLOBAL', alias_id=AliasIdentifier.generate_alias_id()
+        )
+        # Cached metrics outlive each test's rolled-back rows
+        dashboard.forget_dashboard_metrics(self.organization.id)
+
+    def make_user(self, email, **fields):
+        user = User.objects.create_user(email=email, password='Pass12345!x', **fields)
+        # IDs are reused once a test's rows are rolled back
+        forget_users([user.pk])
+        return user
+
+    def verify(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/v1/credentials/verify', {
+                'alias_id': f'NID_VERIFY:{self.alias.alias_id}',
+                'org_id': self.organization.id,
+            }, format='json')
+
+    def dashboard_today(self):
+        return self.client.get('/api/v1/organizations/dashboard').json()['metrics']['verifications']['today']
+
+    def history_statuses(self):
+        return [entry['status'] for entry in self.client.get('/api/v1/credentials/history').json()]
+
+    def test_denied_verification_is_recorded_but_not_listed(self):
+        self.assertEqual(self.dashboard_today()['total'], 0)
+        response = self.verify()
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(response.json()['valid'])
+
+        entry = VerificationHistory.objects.get(organization=self.organization)
+        self.assertEqual((entry.citizen, entry.status, entry.data_accessed), (self.citizen, 'DENIED', {}))
+        event = AuditEvent.objects.get(event_type='VERIFICATION_DENIED')
+        self.assertEqual(event.metadata, {'reason': 'NO_CONSENT'})
+        # Counted as a failure, with the cached metrics dropped at once
+        self.assertEqual(self.dashboard_today(), {'total': 1, 'success': 0, 'failed': 1, 'distinct_citizens': 0})
+        self.assertEqual(self.history_statuses(), [])
+
+    def test_consented_verification_is_listed(self):
+        ConsentGrant.objects.create(citizen=self.citizen, organization=self.organization, scopes=['name_match'])
+        self.verify()
+        response = self.verify()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['full_name'], 'Citizen')
+        ConsentGrant.objects.filter(citizen=self.citizen).update(is_active=False)
+        self.assertEqual(self.verify().status_code, 403)
+
+        self.assertEqual(self.history_statuses(), ['SUCCESS', 'SUCCESS'])
+        self.assertEqual(self.dashboard_today(), {'total': 3, 'success': 2, 'failed': 1, 'distinct_citizens': 1})
@@ -5,6 +5,7 @@ from rest_framework.response import Response
 from .models import AliasIdentifier
 from identity.models import CitizenProfile
 from .serializers import AliasIdentifierSerializer, AliasCreateSerializer
+from audit.emitter import emit_event
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
@@ -27,10 +28,9 @@ def manage_aliases(request):
             }
         }, status=status.HTTP_403_FORBIDDEN)
         
-    # 2. Get Citizen Profile
-    try:
-        citizen = request.user.citizen_profile
-    except CitizenProfile.DoesNotExist:
+    # 2. Get Citizen Profile (its ID is a token claim)
+    citizen_id = request.user.citizen_id
+    if citizen_id is None:
         return Response({
             'error': {
                 'code': 'PROFILE_NOT_FOUND',
@@ -40,12 +40,15 @@ def manage_aliases(request):
 
     # HANDLE GET
     if request.method == 'GET':
-        aliases = AliasIdentifier.objects.filter(citizen=citizen).order_by('-created_at')
+        aliases = AliasIdentifier.objects.filter(citizen_id=citizen_id).select_related('organization').order_by('-created_at')
         return Response(AliasIdentifierSerializer(aliases, many=True).data)
 
     # HANDLE POST
     # 3. Verify Enrollment Status
-    if citizen.enrollment_status != 'APPROVED':
+    enrollment_status = (
+        CitizenProfile.objects.filter(pk=citizen_id).values_list('enrollment_status', flat=True).first()
+    )
+    if enrollment_status != 'APPROVED':
         return Response({
             'error': {
                 'code': 'NOT_VERIFIED',
@@ -60,7 +63,7 @@ def manage_aliases(request):
         
         # Check if Global Alias already exists
         if alias_type == 'GLOBAL':
-            existing = AliasIdentifier.objects.filter(citizen=citizen, alias_type='GLOBAL').first()
+            existing = AliasIdentifier.objects.filter(citizen_id=citizen_id, alias_type='GLOBAL').first()
             if existing:
                 return Response(AliasIdentifierSerializer(existing).data)
         
@@ -73,11 +76,17 @@ def manage_aliases(request):
         # Create Alias
         alias_id = AliasIdentifier.generate_alias_id()
         alias = AliasIdentifier.objects.create(
-            citizen=citizen,
+            citizen_id=citizen_id,
             alias_type=alias_type,
             organization=organization,
             alias_id=alias_id
         )
+        emit_event(
+            'ALIAS_GENERATED',
+            request=request,
+            target_user=request.user,
+            metadata={'alias_type': alias_type, 'alias_id': alias.id}
+        )
         
         return Response(AliasIdentifierSerializer(alias).data, status=status.HTTP_201_CREATED)
         
@@ -134,6 +143,21 @@ def verify_credential(request):
     ).first()
     
     if not grant:
+        # Recorded so the org dashboard can count failures; the history
+        # endpoint below lists SUCCESS rows only, as it did before
+        from .models import VerificationHistory
+        VerificationHistory.objects.create(
+            organization=organization,
+            citizen=citizen,
+            status='DENIED'
+        )
+        emit_event(
+            'VERIFICATION_DENIED',
+            request=request,
+            target_user=citizen.user_id,
+            organization=organization,
+            metadata={'reason': 'NO_CONSENT'}
+        )
         return Response({
             'valid': False,
             'error': 'Access Denied: User has not granted consent to this organization.'
@@ -171,6 +195,13 @@ def verify_credential(request):
         status='SUCCESS',
         data_accessed=verified_data
     )
+    emit_event(
+        'VERIFICATION_COMPLETED',
+        request=request,
+        target_user=citizen.user_id,
+        organization=organization,
+        metadata={'scopes': scopes}
+    )
 
     return Response({
         'valid': True,
@@ -184,24 +215,20 @@ def verify_credential(request):
 def get_verification_history(request):
     """
     Get verification history for the authenticated organization.
+    Only successful verifications are listed; consent-denied attempts are
+    stored as DENIED rows for the dashboard's failure counts.
     GET /api/v1/credentials/history
     """
     if request.user.role != 'ORG_USER':
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
         
-    from organizations.models import Organization
-    try:
-        # Assuming one org per user for now, or fetch from profile
-        # For simplicity, we get the org the user belongs to. 
-        # But wait, User model doesn't strictly link to Org except via Org Profile logic which we haven't fully seen.
-        # However, views.register_organization links user to org.
-        # Let's assume request.user.organization exists if we added it, or we query.
-        org_profile = Organization.objects.get(contact_email=request.user.email) # Weak link but works for now
-    except Organization.DoesNotExist:
+    # The user's organization is a token claim
+    org_id = request.user.org_id
+    if org_id is None:
          return Response({'error': 'Organization not found'}, status=status.HTTP_404_NOT_FOUND)
 
     from .models import VerificationHistory
     from .serializers import VerificationHistorySerializer
     
-    history = VerificationHistory.objects.filter(organization=org_profile).order_by('-verified_at')
+    history = VerificationHistory.objects.filter(organization_id=org_id, status='SUCCESS').select_related('citizen').order_by('-verified_at')
     return Response(VerificationHistorySerializer(history, many=True).data)
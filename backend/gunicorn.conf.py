@@ -0,0 +1,25 @@
+"""
+Gunicorn settings, loaded automatically when gunicorn is started from
+this directory (e.g. `gunicorn config.wsgi -w 4`).
+"""
+import os
+
+
+def child_exit(server, worker):
+    """
+    Drop a finished worker's live gauge files from PROMETHEUS_MULTIPROC_DIR.
+    Its counters and histograms are kept, so totals don't go backwards.
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    """
+    Install the SIGUSR2 memory report handler in each worker. Gunicorn
+    resets worker signals after forking, which undoes config.wsgi's own
+    install when the app is preloaded.
+    """
+    from monitoring.memory import install_report_signal
+    install_report_signal()
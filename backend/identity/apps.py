@@ -7,4 +7,4 @@ class IdentityConfig(AppConfig):
     
     def ready(self):
         """Import signal handlers when app is ready."""
-        pass
+        from . import signals
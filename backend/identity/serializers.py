@@ -1,3 +1,4 @@
+from django.urls import reverse
 from rest_framework import serializers
 from .models import CitizenProfile, EnrollmentCase, EnrollmentDocument
 
@@ -37,18 +38,18 @@ class EnrollmentCaseCreateSerializer(serializers.ModelSerializer):
         from django.db import IntegrityError
         from .models import hash_nid
 
-        user = self.context['request'].user
+        user_id = self.context['request'].user.id
         nid_number = validated_data.pop('nid_number')
         hashed_nid = hash_nid(nid_number)
 
         # Check if NID is already used by another user to give clear error
-        if CitizenProfile.objects.filter(nid_number_hash=hashed_nid).exclude(user=user).exists():
+        if CitizenProfile.objects.filter(nid_number_hash=hashed_nid).exclude(user_id=user_id).exists():
             raise serializers.ValidationError({"nid_number": "This NID number is already registered."})
         
         try:
             # Create or update citizen profile with ALL fields including hash
             citizen, created = CitizenProfile.objects.update_or_create(
-                user=user,
+                user_id=user_id,
                 defaults={
                     'full_name': validated_data['full_name'],
                     'date_of_birth': validated_data['date_of_birth'],
@@ -91,10 +92,15 @@ class EnrollmentDocumentSerializer(serializers.ModelSerializer):
     """Serializer for EnrollmentDocument."""
     
     file_url = serializers.CharField(source='upload_asset.secure_url', read_only=True)
+    thumbnail_url = serializers.SerializerMethodField()
     
     class Meta:
         model = EnrollmentDocument
-        fields = ['id', 'case', 'document_type', 'upload_asset', 'file_url', 'uploaded_at']
-        read_only_fields = ['id', 'case', 'uploaded_at', 'file_url']
+        fields = ['id', 'case', 'document_type', 'upload_asset', 'file_url', 'thumbnail_url', 'uploaded_at']
+        read_only_fields = ['id', 'case', 'uploaded_at', 'file_url', 'thumbnail_url']
+    
+    def get_thumbnail_url(self, obj):
+        """Review-sized preview instead of the full-size original."""
+        return f"{reverse('upload-thumbnail', args=[obj.upload_asset_id])}?size=medium"
 
 
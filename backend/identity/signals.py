@@ -0,0 +1,13 @@
+from functools import partial
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from accounts.tokens import bump_token_version
+from .models import CitizenProfile
+
+
+@receiver(post_save, sender=CitizenProfile)
+def refresh_citizen_claims(sender, instance, created, **kwargs):
+    """Tokens issued before the profile existed carry no citizen ID."""
+    if created:
+        transaction.on_commit(partial(bump_token_version, [instance.user_id]))
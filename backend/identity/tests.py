@@ -1,3 +1,114 @@
+from datetime import date
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
+from rest_framework.test import APIClient
+from accounts.models import User
+from uploads.models import UploadAsset
+from .models import CitizenProfile, EnrollmentCase, EnrollmentDocument
 
-# Create your tests here.
+
+def stored(file_obj, folder):
+    """What store_upload returns for a file, without calling Cloudinary."""
+    public_id = f'{folder}/{file_obj.name}'
+    return {
+        'public_id': public_id,
+        'secure_url': f'https://res.cloudinary.com/test-cloud/image/upload/{public_id}',
+        'resource_type': 'image',
+        'format': 'pdf',
+        'bytes': file_obj.size,
+    }
+
+
+class SubmitEnrollmentDocumentsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='citizen@example.com', password='Pass12345!x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        citizen = CitizenProfile.objects.create(
+            user=self.user, full_name='Citizen', nid_number_hash='hash',
+            date_of_birth=date(1990, 1, 1), residency_district='Dhaka'
+        )
+        self.case = EnrollmentCase.objects.create(citizen=citizen)
+        self.url = f'/api/v1/enrollment/cases/{self.case.id}/documents/submit'
+
+        patcher = mock.patch('identity.views.store_upload', side_effect=stored)
+        self.store_upload = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('identity.views.delete_remote_assets')
+        self.delete_remote_assets = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def document(self, name):
+        return SimpleUploadedFile(name, b'%PDF-1.4 scan', content_type='application/pdf')
+
+    def make_upload(self, user, name):
+        return UploadAsset.objects.create(
+            user=user, public_id=f'user_{user.id}/{name}', secure_url=f'https://example.com/{name}',
+            resource_type='image', format='jpg', bytes=1000
+        )
+
+    def test_files_and_upload_ids_are_recorded(self):
+        selfie = self.make_upload(self.user, 'selfie')
+        response = self.client.post(self.url, {
+            'NID_FRONT': self.document('front.pdf'),
+            'NID_BACK': self.document('back.pdf'),
+            'SELFIE': selfie.id,
+        }, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        documents = {document['document_type']: document for document in response.json()}
+        self.assertEqual(set(documents), {'NID_FRONT', 'NID_BACK', 'SELFIE'})
+        self.assertTrue(all(document['id'] for document in documents.values()))
+        self.assertEqual(documents['SELFIE']['upload_asset'], selfie.id)
+        self.assertEqual(self.store_upload.call_count, 2)
+        self.assertEqual(UploadAsset.objects.count(), 3)
+        self.assertEqual(EnrollmentDocument.objects.filter(case=self.case).count(), 3)
+
+    def test_reviewed_case_is_rejected_before_upload(self):
+        EnrollmentCase.objects.filter(pk=self.case.pk).update(status='APPROVED')
+        response = self.client.post(self.url, {'NID_FRONT': self.document('front.pdf')}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error']['code'], 'INVALID_STATE')
+        self.store_upload.assert_not_called()
+
+    def test_disallowed_format_is_rejected_before_upload(self):
+        response = self.client.post(self.url, {
+            'NID_FRONT': self.document('front.pdf'),
+            'NID_BACK': self.document('back.exe'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error']['code'], 'INVALID_FORMAT')
+        self.assertEqual(response.json()['error']['field'], 'NID_BACK')
+        self.store_upload.assert_not_called()
+
+    def test_missing_or_unowned_upload_is_not_found(self):
+        other = User.objects.create_user(email='other@example.com', password='Pass12345!x')
+        for upload_id in (self.make_upload(other, 'selfie').id, 999999):
+            response = self.client.post(self.url, {
+                'NID_FRONT': self.document('front.pdf'),
+                'SELFIE': upload_id,
+            }, format='multipart')
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.json()['error']['field'], 'SELFIE')
+        self.store_upload.assert_not_called()
+        self.assertFalse(EnrollmentDocument.objects.exists())
+
+    def test_failed_upload_records_nothing(self):
+        def store(file_obj, folder):
+            if file_obj.name == 'back.pdf':
+                raise RuntimeError('Cloudinary is down')
+            return stored(file_obj, folder)
+
+        self.store_upload.side_effect = store
+        response = self.client.post(self.url, {
+            'NID_FRONT': self.document('front.pdf'),
+            'NID_BACK': self.document('back.pdf'),
+        }, format='multipart')
+
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(response.json()['error']['code'], 'UPLOAD_FAILED')
+        self.assertFalse(UploadAsset.objects.exists())
+        removed = self.delete_remote_assets.call_args.args[0]
+        self.assertEqual([asset.public_id for asset in removed], [f'user_{self.user.id}/enrollments/case_{self.case.id}/front.pdf'])
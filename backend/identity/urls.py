@@ -8,4 +8,5 @@ urlpatterns = [
     path('admin/stats', views.get_admin_stats, name='get-admin-stats'),
     path('cases/<int:case_id>/review', views.review_enrollment_case, name='review-enrollment-case'),
     path('cases/<int:case_id>/documents', views.manage_enrollment_documents, name='manage-enrollment-documents'),
+    path('cases/<int:case_id>/documents/submit', views.submit_enrollment_documents, name='submit-enrollment-documents'),
 ]
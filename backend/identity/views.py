@@ -1,7 +1,9 @@
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, parser_classes
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
+from django.db import transaction
 from django.utils import timezone
 from django.conf import settings
 from .models import CitizenProfile, EnrollmentCase, EnrollmentDocument
@@ -12,7 +14,11 @@ from .serializers import (
     EnrollmentReviewSerializer,
     EnrollmentDocumentSerializer
 )
+from audit.emitter import emit_event
+from uploads.models import UploadAsset
+from uploads.utils import get_upload_executor, store_upload, delete_remote_assets
 import os
+import contextvars
 import requests
 import tempfile
 
@@ -42,6 +48,12 @@ def create_enrollment_case(request):
     serializer = EnrollmentCaseCreateSerializer(data=request.data, context={'request': request})
     if serializer.is_valid():
         case = serializer.save()
+        emit_event(
+            'ENROLLMENT_SUBMITTED',
+            request=request,
+            target_user=request.user,
+            metadata={'case_id': case.id}
+        )
         return Response(
             EnrollmentCaseSerializer(case).data,
             status=status.HTTP_201_CREATED
@@ -63,11 +75,8 @@ def list_enrollment_cases(request):
     if request.user.role == 'ADMIN':
         cases = EnrollmentCase.objects.all()
     elif request.user.role == 'CITIZEN':
-        try:
-            citizen = request.user.citizen_profile
-            cases = EnrollmentCase.objects.filter(citizen=citizen)
-        except CitizenProfile.DoesNotExist:
-            cases = EnrollmentCase.objects.none()
+        # No citizen ID claim means no profile, and so no cases
+        cases = EnrollmentCase.objects.filter(citizen_id=request.user.citizen_id)
     else:
         return Response({
             'error': {
@@ -76,6 +85,7 @@ def list_enrollment_cases(request):
             }
         }, status=status.HTTP_403_FORBIDDEN)
     
+    cases = cases.select_related('citizen', 'reviewed_by')
     serializer = EnrollmentCaseSerializer(cases, many=True)
     return Response(serializer.data)
 
@@ -99,7 +109,7 @@ def get_enrollment_case(request, case_id):
         }, status=status.HTTP_404_NOT_FOUND)
     
     # Check permissions
-    if request.user.role == 'CITIZEN' and case.citizen.user != request.user:
+    if request.user.role == 'CITIZEN' and case.citizen.user_id != request.user.id:
         return Response({
             'error': {
                 'code': 'PERMISSION_DENIED',
@@ -145,7 +155,7 @@ def review_enrollment_case(request, case_id):
     if serializer.is_valid():
         case.status = serializer.validated_data['status']
         case.admin_notes = serializer.validated_data.get('admin_notes', '')
-        case.reviewed_by = request.user
+        case.reviewed_by_id = request.user.id
         case.reviewed_at = timezone.now()
         case.save()
         
@@ -153,6 +163,13 @@ def review_enrollment_case(request, case_id):
         case.citizen.enrollment_status = serializer.validated_data['status']
         case.citizen.save()
         
+        emit_event(
+            f"ENROLLMENT_{case.status}",
+            request=request,
+            target_user=case.citizen.user_id,
+            metadata={'case_id': case.id}
+        )
+        
         return Response(EnrollmentCaseSerializer(case).data)
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -181,7 +198,7 @@ def manage_enrollment_documents(request, case_id):
         }, status=status.HTTP_404_NOT_FOUND)
     
     # Check permissions
-    if request.user.role == 'CITIZEN' and case.citizen.user != request.user:
+    if request.user.role == 'CITIZEN' and case.citizen.user_id != request.user.id:
         return Response({
             'error': {
                 'code': 'PERMISSION_DENIED',
@@ -211,6 +228,191 @@ def manage_enrollment_documents(request, case_id):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser, FormParser])
+def submit_enrollment_documents(request, case_id):
+    """
+    Submit all documents for an enrollment case in one request.
+    Each document is either a file, uploaded here, or the ID of an upload
+    already registered through /uploads/register. Files are uploaded
+    concurrently; the UploadAsset and EnrollmentDocument rows are created
+    together in a single transaction.
+    
+    POST /api/v1/enrollment/cases/{id}/documents/submit
+    Form Data:
+      NID_FRONT: <file_object>
+      NID_BACK: <file_object> or <upload ID>
+      SELFIE: <file_object>
+      PROOF: (optional) <file_object>
+    """
+    try:
+        case = EnrollmentCase.objects.select_related('citizen').get(id=case_id)
+    except EnrollmentCase.DoesNotExist:
+        return Response({
+            'error': {
+                'code': 'NOT_FOUND',
+                'message': 'Enrollment case not found'
+            }
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    if request.user.role != 'CITIZEN' or case.citizen.user_id != request.user.id:
+        return Response({
+            'error': {
+                'code': 'PERMISSION_DENIED',
+                'message': 'You can only add documents to your own enrollment cases'
+            }
+        }, status=status.HTTP_403_FORBIDDEN)
+    
+    if case.status != 'PENDING_REVIEW':
+        return Response({
+            'error': {
+                'code': 'INVALID_STATE',
+                'message': f"Documents can't be added to a case that is {case.get_status_display().lower()}"
+            }
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    document_types = [choice for choice, _ in EnrollmentDocument.DOCUMENT_TYPE_CHOICES]
+    files = {
+        document_type: request.FILES[document_type]
+        for document_type in document_types
+        if document_type in request.FILES
+    }
+    upload_ids = {
+        document_type: request.data[document_type]
+        for document_type in document_types
+        if document_type not in files and request.data.get(document_type)
+    }
+    if not files and not upload_ids:
+        return Response({
+            'error': {
+                'code': 'NO_FILES',
+                'message': f"Provide at least one of: {', '.join(document_types)}"
+            }
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Reject everything the client got wrong before uploading anything
+    max_bytes = settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024
+    for document_type, f in files.items():
+        if f.size > max_bytes:
+            return Response({
+                'error': {
+                    'code': 'FILE_TOO_LARGE',
+                    'message': f"File too large (max {settings.MAX_UPLOAD_SIZE_MB}MB)",
+                    'field': document_type
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+        extension = os.path.splitext(f.name)[1].lstrip('.').lower()
+        if extension not in settings.ALLOWED_DOCUMENT_FORMATS:
+            return Response({
+                'error': {
+                    'code': 'INVALID_FORMAT',
+                    'message': f"Allowed formats: {', '.join(settings.ALLOWED_DOCUMENT_FORMATS)}",
+                    'field': document_type
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+    
+    for document_type, upload_id in upload_ids.items():
+        if not str(upload_id).isdigit():
+            return Response({
+                'error': {
+                    'code': 'VALIDATION_ERROR',
+                    'message': 'Expected a file or an upload ID',
+                    'field': document_type
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+    existing = UploadAsset.objects.filter(
+        user_id=request.user.id,
+        id__in=[int(upload_id) for upload_id in upload_ids.values()]
+    ).in_bulk()
+    for document_type, upload_id in upload_ids.items():
+        if int(upload_id) not in existing:
+            # Other users' uploads look the same as missing ones
+            return Response({
+                'error': {
+                    'code': 'NOT_FOUND',
+                    'message': f"Upload {upload_id} not found",
+                    'field': document_type
+                }
+            }, status=status.HTTP_404_NOT_FOUND)
+    
+    # Upload every file at once; total latency is that of the slowest file.
+    # Each upload runs in a copy of this context so it joins the request's trace.
+    folder = f'user_{request.user.id}/enrollments/case_{case.id}'
+    executor = get_upload_executor()
+    futures = {
+        document_type: executor.submit(contextvars.copy_context().run, store_upload, f, folder)
+        for document_type, f in files.items()
+    }
+    stored, failed = {}, {}
+    for document_type, future in futures.items():
+        try:
+            stored[document_type] = future.result()
+        except Exception as e:
+            failed[document_type] = str(e)
+    
+    new_assets = [
+        UploadAsset(user_id=request.user.id, **fields)
+        for fields in stored.values()
+    ]
+    if failed:
+        # Nothing is recorded, so don't leave the other uploaded files behind
+        discard_remote_assets(new_assets)
+        return Response({
+            'error': {
+                'code': 'UPLOAD_FAILED',
+                'message': f"Upload failed for {', '.join(failed)}",
+                'details': failed
+            }
+        }, status=status.HTTP_502_BAD_GATEWAY)
+    
+    try:
+        with transaction.atomic():
+            UploadAsset.objects.bulk_create(new_assets)
+            # Backends that can't return IDs from a bulk insert (e.g. MySQL)
+            # leave pk unset, so look the new rows up by their unique public ID
+            created = UploadAsset.objects.in_bulk(
+                [asset.public_id for asset in new_assets], field_name='public_id'
+            )
+            assets = {
+                document_type: created[fields['public_id']]
+                for document_type, fields in stored.items()
+            }
+            assets.update({
+                document_type: existing[int(upload_id)]
+                for document_type, upload_id in upload_ids.items()
+            })
+            EnrollmentDocument.objects.bulk_create([
+                EnrollmentDocument(case=case, document_type=document_type, upload_asset=asset)
+                for document_type, asset in assets.items()
+            ])
+    except Exception as e:
+        discard_remote_assets(new_assets)
+        return Response({
+            'error': {
+                'code': 'UPLOAD_FAILED',
+                'message': str(e)
+            }
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    documents = EnrollmentDocument.objects.filter(
+        case=case,
+        upload_asset__in=[asset.id for asset in assets.values()]
+    ).select_related('upload_asset')
+    return Response(
+        EnrollmentDocumentSerializer(documents, many=True).data,
+        status=status.HTTP_201_CREATED
+    )
+
+
+def discard_remote_assets(assets):
+    """Best-effort removal of files uploaded for a submission that failed."""
+    try:
+        delete_remote_assets(assets)
+    except Exception:
+        pass
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_admin_stats(request):
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class MonitoringConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "monitoring"
+
+    def ready(self):
+        from django.conf import settings
+        if settings.TRACING_ENABLED:
+            from .tracing import instrument
+            instrument()
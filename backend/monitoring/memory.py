@@ -0,0 +1,148 @@
+import os
+import signal
+import logging
+import threading
+import tracemalloc
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# Allocations made by the profiler and import machinery are noise here
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+]
+
+_lock = threading.Lock()
+_baseline = None
+_baseline_at = None
+_request_peaks = {}
+
+
+def ensure_tracing():
+    """Start tracemalloc if it isn't running yet."""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(settings.MEMORY_TRACE_FRAMES)
+
+
+def take_snapshot():
+    return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+
+def reset_baseline():
+    """Take the snapshot later reports are diffed against."""
+    global _baseline, _baseline_at
+    ensure_tracing()
+    snapshot = take_snapshot()
+    with _lock:
+        _baseline, _baseline_at = snapshot, timezone.now()
+        _request_peaks.clear()
+    return _baseline_at
+
+
+def top_allocations(limit=20, group_by='lineno'):
+    """
+    Allocation sites that grew most since the baseline (or the largest
+    ones, if no baseline was taken).
+    """
+    snapshot = take_snapshot()
+    with _lock:
+        baseline = _baseline
+    if baseline is not None:
+        stats = snapshot.compare_to(baseline, group_by)
+        stats.sort(key=lambda stat: stat.size_diff, reverse=True)
+        return [
+            {
+                'site': _format_traceback(stat.traceback),
+                'size_mb': round(stat.size / MB, 3),
+                'size_diff_mb': round(stat.size_diff / MB, 3),
+                'count': stat.count,
+                'count_diff': stat.count_diff,
+            }
+            for stat in stats[:limit]
+        ]
+    return [
+        {
+            'site': _format_traceback(stat.traceback),
+            'size_mb': round(stat.size / MB, 3),
+            'count': stat.count,
+        }
+        for stat in snapshot.statistics(group_by)[:limit]
+    ]
+
+
+def _format_traceback(traceback):
+    base_dir = str(settings.BASE_DIR)
+    frames = []
+    for frame in traceback:
+        filename = frame.filename
+        if filename.startswith(base_dir):
+            filename = os.path.relpath(filename, base_dir)
+        frames.append(f'{filename}:{frame.lineno}')
+    return ' <- '.join(reversed(frames))
+
+
+def record_request_peak(view, peak_bytes):
+    """Remember the largest per-request peak seen for each view."""
+    with _lock:
+        if peak_bytes > _request_peaks.get(view, 0):
+            _request_peaks[view] = peak_bytes
+
+
+def top_request_peaks(limit=20):
+    with _lock:
+        peaks = sorted(_request_peaks.items(), key=lambda item: item[1], reverse=True)
+    return [{'view': view, 'peak_mb': round(peak / MB, 3)} for view, peak in peaks[:limit]]
+
+
+def memory_report(limit=20, group_by='lineno'):
+    """Everything the diagnostics endpoint and signal handler report."""
+    tracing = tracemalloc.is_tracing()
+    current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+    return {
+        'pid': os.getpid(),
+        'tracing': tracing,
+        'traced_current_mb': round(current / MB, 3),
+        'traced_peak_mb': round(peak / MB, 3),
+        'baseline_at': _baseline_at,
+        'top_allocations': top_allocations(limit, group_by) if tracing else [],
+        'top_request_peaks': top_request_peaks(limit),
+    }
+
+
+def log_memory_report(signum=None, frame=None):
+    """Signal handler: log this worker's report (kill -USR2 <pid>)."""
+    report = memory_report(limit=settings.MEMORY_REPORT_LIMIT)
+    lines = [
+        f"Memory report for worker {report['pid']}: "
+        f"{report['traced_current_mb']} MB traced, peak {report['traced_peak_mb']} MB"
+    ]
+    for item in report['top_allocations']:
+        lines.append(f"  {item.get('size_diff_mb', item['size_mb'])} MB {item['site']}")
+    for item in report['top_request_peaks']:
+        lines.append(f"  request peak {item['peak_mb']} MB {item['view']}")
+    logger.warning('\n'.join(lines))
+
+
+def install_report_signal():
+    """
+    Log this worker's report on SIGUSR2 when MEMORY_TRACKING_ENABLED.
+
+    Called from the WSGI/ASGI entry points (and gunicorn's post_worker_init,
+    since gunicorn resets worker signals), not from AppConfig.ready(), so
+    management commands and the test runner keep the default handler.
+    Returns whether the handler was installed.
+    """
+    if not settings.MEMORY_TRACKING_ENABLED:
+        return False
+    try:
+        signal.signal(signal.SIGUSR2, log_memory_report)
+    except (AttributeError, ValueError):
+        # No SIGUSR2 (Windows) or not the main thread
+        return False
+    return True
@@ -0,0 +1,93 @@
+import os
+from time import perf_counter
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+KNOWN_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+# Labelled by URL name, never by raw path, so cardinality stays bounded
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Time to produce a response, by URL name',
+    ['view', 'method'],
+    buckets=LATENCY_BUCKETS,
+)
+RESPONSES = Counter(
+    'http_responses',
+    'Responses sent, by URL name and status code',
+    ['view', 'method', 'status'],
+)
+DB_QUERIES = Histogram(
+    'http_request_db_queries',
+    'Database queries executed per request, by URL name',
+    ['view'],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+DB_TIME = Histogram(
+    'http_request_db_duration_seconds',
+    'Time spent in the database per request, by URL name',
+    ['view'],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+class QueryRecorder:
+    """
+    Database execute-wrapper that counts queries and the time spent in
+    them. Installed per request with connection.execute_wrapper().
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += perf_counter() - start
+
+
+def get_view_label(request):
+    """URL name of the matched route, e.g. 'login' or 'upload-thumbnail'."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match._func_path
+
+
+def observe_request(request, response, duration, queries):
+    view = get_view_label(request)
+    method = request.method if request.method in KNOWN_METHODS else 'OTHER'
+    REQUEST_LATENCY.labels(view, method).observe(duration)
+    RESPONSES.labels(view, method, str(response.status_code)).inc()
+    DB_QUERIES.labels(view).observe(queries.count)
+    DB_TIME.labels(view).observe(queries.duration)
+
+
+def render_metrics():
+    """
+    Current metrics in the Prometheus text format.
+
+    With PROMETHEUS_MULTIPROC_DIR set, every worker writes its samples to
+    memory-mapped files in that directory and this aggregates all of them,
+    so whichever worker serves the scrape reports the whole server.
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
@@ -0,0 +1,190 @@
+import os
+import logging
+import tracemalloc
+from time import perf_counter
+from django.conf import settings
+from django.db import connection
+from .memory import MB, ensure_tracing, record_request_peak
+from .metrics import QueryRecorder, get_view_label, observe_request
+from .nplusone import NPlusOneError, QueryShapeCounter, format_report
+from .profiling import (
+    format_summary,
+    is_profiling_authorized,
+    is_profiling_requested,
+    profile_call,
+    top_functions,
+)
+from .tracing import KIND_SERVER, QueryTracer, get_exporter, span, start_trace
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    """
+    Record latency, status and database usage for every request.
+
+    Should be first in MIDDLEWARE so the timing covers the whole stack.
+    Costs two perf_counter() calls per query and a few histogram updates
+    per request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.METRICS_ENABLED
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        queries = QueryRecorder()
+        start = perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        duration = perf_counter() - start
+
+        try:
+            observe_request(request, response, duration, queries)
+        except Exception as e:
+            logger.error(f"Failed to record request metrics: {str(e)}")
+        return response
+
+
+class TracingMiddleware:
+    """
+    Open a server span per request and trace the SQL it runs.
+
+    Continues the trace from an incoming W3C traceparent header, and
+    returns the trace ID in X-Trace-Id so a slow response can be matched
+    to its spans. Unsampled requests only pay for the sampling decision.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.TRACING_ENABLED
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        trace = start_trace(request.META.get('HTTP_TRACEPARENT'))
+        if not trace.sampled:
+            response = self.get_response(request)
+            response['X-Trace-Id'] = trace.trace_id
+            return response
+
+        attributes = {'http.method': request.method, 'http.target': request.path}
+        with span(f'{request.method} {request.path}', kind=KIND_SERVER, attributes=attributes, trace=trace) as root:
+            with connection.execute_wrapper(QueryTracer(connection.vendor)):
+                response = self.get_response(request)
+            root.name = f'{request.method} {get_view_label(request)}'
+            root.set_attribute('http.route', get_view_label(request))
+            root.set_attribute('http.status_code', response.status_code)
+            if response.status_code >= 500:
+                root.error = f'HTTP {response.status_code}'
+
+        get_exporter().export(trace)
+        response['X-Trace-Id'] = trace.trace_id
+        return response
+
+
+class NPlusOneMiddleware:
+    """
+    Flag query shapes run more than NPLUSONE_THRESHOLD times in a request.
+
+    Meant for development and staging. Offenders are logged with the
+    serializer field or code location responsible; with NPLUSONE_RAISE
+    (e.g. under tests) the request fails with NPlusOneError instead.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.NPLUSONE_ENABLED
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        counter = QueryShapeCounter(settings.NPLUSONE_THRESHOLD)
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+
+        offenders = counter.offenders()
+        if offenders:
+            report = format_report(offenders, f'{request.method} {get_view_label(request)}')
+            if settings.NPLUSONE_RAISE:
+                raise NPlusOneError(report)
+            logger.warning(report)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profile a single request on demand.
+
+    An admin adds X-Profile: 1 (or ?_profile=1) and the rest of the stack
+    runs under cProfile. The stats are saved to PROFILE_DIR and the
+    response carries the top functions in X-Profile-Summary. Requests
+    without the flag only pay for one header lookup.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.PROFILING_ENABLED
+
+    def __call__(self, request):
+        if not self.enabled or not is_profiling_requested(request):
+            return self.get_response(request)
+        if not is_profiling_authorized(request):
+            return self.get_response(request)
+
+        label = request.path.strip('/').replace('/', '-') or 'root'
+        try:
+            response, stats, path = profile_call(label, self.get_response, request)
+        except ValueError as e:
+            # Another profiler is already active in this thread
+            logger.warning(f"Could not profile {request.path}: {str(e)}")
+            return self.get_response(request)
+
+        rows = top_functions(stats, settings.PROFILE_SUMMARY_LIMIT)
+        response['X-Profile-Total'] = f'{stats.total_tt * 1000:.1f}ms'
+        response['X-Profile-Summary'] = format_summary(rows)
+        response['X-Profile-File'] = os.path.basename(path)
+        logger.info(f"Profiled {request.method} {get_view_label(request)} to {path}")
+        return response
+
+
+class MemoryTrackingMiddleware:
+    """
+    Measure how much memory each request allocates at its peak.
+
+    Uses tracemalloc, so it is opt-in (MEMORY_TRACKING_ENABLED). Requests
+    peaking above MEMORY_REQUEST_THRESHOLD_MB are logged with their URL
+    name. The peak is process-wide, so with threaded workers a request
+    may be charged for allocations made by concurrent ones.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.MEMORY_TRACKING_ENABLED
+        self.threshold = settings.MEMORY_REQUEST_THRESHOLD_MB * MB
+        if self.enabled:
+            ensure_tracing()
+
+    def __call__(self, request):
+        if not self.enabled or not tracemalloc.is_tracing():
+            return self.get_response(request)
+
+        start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        response = self.get_response(request)
+        _, peak = tracemalloc.get_traced_memory()
+
+        allocated = max(peak - start, 0)
+        view = get_view_label(request)
+        record_request_peak(view, allocated)
+        if self.threshold and allocated > self.threshold:
+            logger.warning(
+                f"{request.method} {view} allocated {allocated / MB:.1f} MB at peak "
+                f"(threshold {settings.MEMORY_REQUEST_THRESHOLD_MB} MB)"
+            )
+        return response
@@ -0,0 +1,129 @@
+import os
+import re
+import sys
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+_MONITORING_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class NPlusOneError(Exception):
+    """Raised when NPLUSONE_RAISE is on and a request repeats a query shape."""
+
+
+def normalize_sql(sql):
+    """
+    Reduce a statement to its shape: literals become ?, IN lists of any
+    length become (...), so the same query for different rows compares equal.
+    """
+    shape = _STRING.sub('?', sql)
+    shape = _NUMBER.sub('?', shape)
+    shape = _PLACEHOLDER_LIST.sub('(...)', shape)
+    shape = shape.replace('%s', '?')
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+def _serializer_field(frame):
+    """The DRF field whose get_attribute() is on the stack, if any."""
+    from rest_framework.fields import Field
+
+    while frame is not None:
+        if frame.f_code.co_name in ('get_attribute', 'to_representation'):
+            field = frame.f_locals.get('self')
+            if isinstance(field, Field) and field.parent is not None:
+                return (
+                    f"{type(field.parent).__name__}.{field.field_name} "
+                    f"(source='{field.source}')"
+                )
+        frame = frame.f_back
+    return None
+
+
+def _project_frame(frame):
+    """Innermost frame in this project's code, outside this module."""
+    base_dir = str(settings.BASE_DIR)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if (
+            filename.startswith(base_dir)
+            and not filename.startswith(_MONITORING_DIR)
+            and 'site-packages' not in filename
+        ):
+            return f"{os.path.relpath(filename, base_dir)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def find_call_site():
+    """Describe where the current query comes from: serializer field and/or code location."""
+    frame = sys._getframe(2)
+    parts = [part for part in (_serializer_field(frame), _project_frame(frame)) if part]
+    return ' at '.join(parts) or 'unknown'
+
+
+class QueryShapeCounter:
+    """
+    Database execute-wrapper that counts statements by shape.
+
+    The stack is only inspected once per shape, when it first goes over
+    the threshold, so well-behaved requests pay for a few regexes per query.
+    """
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.counts = Counter()
+        self.call_sites = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        shape = normalize_sql(sql)
+        self.counts[shape] += 1
+        if self.counts[shape] == self.threshold + 1:
+            self.call_sites[shape] = find_call_site()
+        return execute(sql, params, many, context)
+
+    def offenders(self):
+        """[(shape, count, call_site)] for shapes run more than threshold times."""
+        return [
+            (shape, self.counts[shape], call_site)
+            for shape, call_site in self.call_sites.items()
+        ]
+
+
+def format_report(offenders, label):
+    lines = [f"Possible N+1 queries in {label}:"]
+    for shape, count, call_site in offenders:
+        lines.append(f"  {count}x from {call_site}: {shape[:300]}")
+    return '\n'.join(lines)
+
+
+@contextmanager
+def detect_nplusone(threshold=None, label='block', raise_error=None):
+    """
+    Watch the queries run inside a block for repeated shapes.
+
+    Usable directly in tests, e.g.:
+        with detect_nplusone(threshold=3, raise_error=True):
+            EnrollmentCaseSerializer(cases, many=True).data
+    """
+    threshold = settings.NPLUSONE_THRESHOLD if threshold is None else threshold
+    raise_error = settings.NPLUSONE_RAISE if raise_error is None else raise_error
+    counter = QueryShapeCounter(threshold)
+    with connection.execute_wrapper(counter):
+        yield counter
+
+    offenders = counter.offenders()
+    if offenders:
+        report = format_report(offenders, label)
+        if raise_error:
+            raise NPlusOneError(report)
+        logger.warning(report)
@@ -0,0 +1,79 @@
+import os
+import io
+import pstats
+import cProfile
+import logging
+from datetime import datetime
+from django.conf import settings
+from accounts.authentication import ClaimsJWTAuthentication
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_QUERY_PARAM = '_profile'
+
+
+def is_profiling_requested(request):
+    """True if the request asks to be profiled via X-Profile: 1 or ?_profile=1."""
+    flag = request.META.get(PROFILE_HEADER) or request.GET.get(PROFILE_QUERY_PARAM)
+    return flag in ('1', 'true', 'True')
+
+
+def is_profiling_authorized(request):
+    """
+    Only admins may profile. API clients send a JWT, which DRF would only
+    check inside the view, so it is authenticated here directly - with the
+    API's own authentication, so revoked tokens are refused here too.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated and (user.is_staff or getattr(user, 'role', None) == 'ADMIN'):
+        return True
+
+    try:
+        result = ClaimsJWTAuthentication().authenticate(request)
+    except Exception:
+        return False
+    return result is not None and result[0].role == 'ADMIN'
+
+
+def top_functions(stats, limit):
+    """[(label, calls, own_seconds, cumulative_seconds)] for the costliest functions by own time."""
+    rows = []
+    for (filename, line, name), (_, calls, own, cumulative, _) in stats.stats.items():
+        if filename == '~':
+            label = name  # built-in
+        else:
+            label = f'{os.path.basename(filename)}:{line}({name})'
+        rows.append((label, calls, own, cumulative))
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return rows[:limit]
+
+
+def format_summary(rows):
+    """Compact one-line summary for a response header."""
+    return '; '.join(f'{label} {own * 1000:.1f}ms/{calls}' for label, calls, own, _ in rows)
+
+
+def profile_call(label, func, *args, **kwargs):
+    """
+    Run func under cProfile and save the stats to PROFILE_DIR.
+
+    The .prof file loads with pstats, snakeviz, or flameprof/gprof2dot for
+    a flame graph. Returns (result, stats, path).
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        profiler.disable()
+
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    safe_label = ''.join(c if c.isalnum() or c in '-_' else '_' for c in label)
+    path = os.path.join(
+        settings.PROFILE_DIR,
+        f'{datetime.now():%Y%m%d-%H%M%S-%f}-{safe_label}.prof'
+    )
+    stats.dump_stats(path)
+    return result, stats, path
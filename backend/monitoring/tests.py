@@ -0,0 +1,336 @@
+import os
+import json
+import runpy
+import signal
+import tempfile
+import tracemalloc
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory, TestCase, override_settings
+from prometheus_client import REGISTRY
+from accounts.authentication import forget_users
+from accounts.models import User
+from accounts.revocation import revoke_token
+from accounts.tokens import issue_tokens
+from notifications.models import OutboxEmail
+from organizations.models import Organization, OrgUser
+from organizations.serializers import OrgUserSerializer
+from . import memory, tracing
+from .nplusone import NPlusOneError, detect_nplusone, normalize_sql
+from .profiling import is_profiling_authorized
+
+
+class ProfilingAuthorizationTests(TestCase):
+
+    def make_user(self, create, email):
+        user = create(email=email, password='Pass12345!x')
+        # IDs are reused once a test's rows are rolled back
+        forget_users([user.pk])
+        return user
+
+    def request_with(self, token):
+        request = RequestFactory().get('/api/v1/health', HTTP_AUTHORIZATION=f'Bearer {token}')
+        request.user = AnonymousUser()
+        return request
+
+    def test_admin_token_is_authorized_until_revoked(self):
+        admin = self.make_user(User.objects.create_superuser, 'admin@example.com')
+        refresh = issue_tokens(admin)
+        request = self.request_with(refresh.access_token)
+        self.assertTrue(is_profiling_authorized(request))
+
+        revoke_token(refresh)
+        self.assertFalse(is_profiling_authorized(request))
+
+    def test_citizen_token_is_not_authorized(self):
+        citizen = self.make_user(User.objects.create_user, 'citizen@example.com')
+        self.assertFalse(is_profiling_authorized(self.request_with(issue_tokens(citizen).access_token)))
+
+
+class MetricsTests(TestCase):
+
+    def latency_count(self, view, method='GET'):
+        value = REGISTRY.get_sample_value(
+            'http_request_duration_seconds_count', {'view': view, 'method': method}
+        )
+        return value or 0
+
+    def test_requests_are_labelled_by_url_name(self):
+        before = self.latency_count('get-organization')
+        self.client.get('/api/v1/organizations/41')
+        self.client.get('/api/v1/organizations/42')
+        self.assertEqual(self.latency_count('get-organization'), before + 2)
+        self.assertIsNone(REGISTRY.get_sample_value(
+            'http_request_duration_seconds_count', {'view': '/api/v1/organizations/41', 'method': 'GET'}
+        ))
+
+    def test_unresolved_paths_share_one_label(self):
+        before = self.latency_count('unmatched')
+        self.client.get('/no-such-page/1')
+        self.client.get('/no-such-page/2')
+        self.assertEqual(self.latency_count('unmatched'), before + 2)
+        responses = REGISTRY.get_sample_value(
+            'http_responses_total', {'view': 'unmatched', 'method': 'GET', 'status': '404'}
+        )
+        self.assertGreaterEqual(responses, 2)
+
+    def test_scrape_is_limited_to_allowed_addresses(self):
+        self.client.get('/api/v1/organizations/')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'http_request_duration_seconds_bucket{', response.content)
+
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.8').status_code, 404)
+        with override_settings(METRICS_ALLOWED_IPS=['10.0.0.8']):
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.8').status_code, 200)
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+    def test_gunicorn_marks_exited_workers_dead(self):
+        hooks = runpy.run_path(os.path.join(settings.BASE_DIR, 'gunicorn.conf.py'))
+        worker = mock.Mock(pid=4321)
+        with mock.patch('prometheus_client.multiprocess.mark_process_dead') as mark_dead:
+            with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': '/tmp/metrics'}):
+                hooks['child_exit'](None, worker)
+            mark_dead.assert_called_once_with(4321)
+            with mock.patch.dict(os.environ):
+                os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+                hooks['child_exit'](None, worker)
+            mark_dead.assert_called_once()
+
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+PARENT_ID = '00f067aa0ba902b7'
+
+
+@override_settings(TRACING_ENABLED=True, TRACE_SAMPLE_RATE=1.0)
+class TracingTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # The patched code paths only do extra work inside a sampled trace
+        tracing.instrument()
+
+    def setUp(self):
+        self.exported = []
+        patcher = mock.patch('monitoring.middleware.get_exporter')
+        patcher.start().return_value.export.side_effect = self.exported.append
+        self.addCleanup(patcher.stop)
+
+    def register(self, **headers):
+        return self.client.post('/api/v1/auth/register', {
+            'email': 'citizen@example.com',
+            'password': 'Str0ng-Passw0rd',
+            'password_confirm': 'Str0ng-Passw0rd',
+        }, content_type='application/json', **headers)
+
+    def spans_named(self, trace, prefix):
+        return [item for item in trace.spans if item.name.startswith(prefix)]
+
+    def test_spans_nest_under_the_request(self):
+        response = self.register()
+        self.assertEqual(response.status_code, 201)
+        [trace] = self.exported
+        self.assertEqual(response['X-Trace-Id'], trace.trace_id)
+
+        [root] = [item for item in trace.spans if item.kind == tracing.KIND_SERVER]
+        self.assertEqual(root.name, 'POST register')
+        self.assertIsNone(root.parent_id)
+        [view] = self.spans_named(trace, 'view ')
+        self.assertEqual((view.name, view.parent_id), ('view register', root.span_id))
+        [validate] = self.spans_named(trace, 'serializer.validate')
+        self.assertEqual((validate.name, validate.parent_id), ('serializer.validate RegisterSerializer', view.span_id))
+        [hash_span] = self.spans_named(trace, 'password.hash')
+        self.assertEqual(hash_span.parent_id, view.span_id)
+
+        # Every span, including each SQL statement, hangs off this trace
+        span_ids = {item.span_id for item in trace.spans}
+        queries = self.spans_named(trace, 'db.')
+        self.assertTrue(queries)
+        for item in trace.spans:
+            if item is not root:
+                self.assertIn(item.parent_id, span_ids)
+            self.assertLessEqual(root.start_ns, item.start_ns)
+            self.assertLessEqual(item.end_ns, root.end_ns)
+
+        # The verification email carries the trace to the outbox dispatcher
+        email = OutboxEmail.objects.get(to=['citizen@example.com'])
+        _, trace_id, parent_id, _ = email.traceparent.split('-')
+        self.assertEqual((trace_id, parent_id), (trace.trace_id, view.span_id))
+
+    def test_incoming_traceparent_is_continued(self):
+        response = self.register(HTTP_TRACEPARENT=f'00-{TRACE_ID}-{PARENT_ID}-01')
+        [trace] = self.exported
+        self.assertEqual(response['X-Trace-Id'], TRACE_ID)
+        [root] = [item for item in trace.spans if item.kind == tracing.KIND_SERVER]
+        self.assertEqual((root.trace.trace_id, root.parent_id), (TRACE_ID, PARENT_ID))
+
+    def test_unsampled_request_is_not_exported(self):
+        response = self.register(HTTP_TRACEPARENT=f'00-{TRACE_ID}-{PARENT_ID}-00')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['X-Trace-Id'], TRACE_ID)
+        self.assertEqual(self.exported, [])
+        self.assertEqual(OutboxEmail.objects.get(to=['citizen@example.com']).traceparent, '')
+
+    def test_sampling_decision(self):
+        with override_settings(TRACE_SAMPLE_RATE=0.0):
+            self.assertFalse(tracing.start_trace().sampled)
+            # An upstream decision wins over the local rate
+            self.assertTrue(tracing.start_trace(f'00-{TRACE_ID}-{PARENT_ID}-01').sampled)
+        with override_settings(TRACE_SAMPLE_RATE=0.5), mock.patch.object(tracing.random, 'random', return_value=0.3):
+            self.assertTrue(tracing.start_trace().sampled)
+            # Malformed headers fall back to the rate, with a fresh trace ID
+            trace = tracing.start_trace(f'00-{TRACE_ID}-{"0" * 16}-01')
+            self.assertTrue(trace.sampled)
+            self.assertNotEqual(trace.trace_id, TRACE_ID)
+        self.assertFalse(tracing.start_trace(f'00-{TRACE_ID}-{PARENT_ID}-00').sampled)
+        self.assertIsNone(tracing.parse_traceparent('garbage'))
+
+    def test_patched_calls_only_trace_inside_a_sampled_trace(self):
+        user = User(email='citizen@example.com')
+        user.set_password('Str0ng-Passw0rd')
+        trace = tracing.Trace(sampled=True)
+        with tracing.span('outer', trace=trace) as outer:
+            user.check_password('Str0ng-Passw0rd')
+        [check] = self.spans_named(trace, 'password.check')
+        self.assertEqual(check.parent_id, outer.span_id)
+        self.assertEqual(len(trace.spans), 2)
+
+        unsampled = tracing.Trace(sampled=False)
+        with tracing.span('outer', trace=unsampled) as outer:
+            user.check_password('Str0ng-Passw0rd')
+        self.assertIsNone(outer)
+        self.assertEqual(unsampled.spans, [])
+
+    def test_exporter_writes_otlp_json(self):
+        trace = tracing.Trace(TRACE_ID, PARENT_ID, sampled=True)
+        with self.assertRaises(ValueError):
+            with tracing.span('GET thing', kind=tracing.KIND_SERVER, trace=trace, attributes={'http.status_code': 500}):
+                with tracing.span('child', attributes={'cached': False, 'ratio': 0.5, 'note': 'x'}):
+                    raise ValueError('boom')
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'spans.jsonl')
+            tracing.SpanExporter(path=path, service_name='test-service').write(trace.spans)
+            with open(path, encoding='utf-8') as f:
+                [line] = f.read().splitlines()
+        [resource_spans] = json.loads(line)['resourceSpans']
+        self.assertEqual(
+            resource_spans['resource']['attributes'],
+            [{'key': 'service.name', 'value': {'stringValue': 'test-service'}}]
+        )
+        child, root = resource_spans['scopeSpans'][0]['spans']
+        self.assertEqual((root['traceId'], root['parentSpanId'], root['kind']), (TRACE_ID, PARENT_ID, 2))
+        self.assertEqual(root['attributes'], [{'key': 'http.status_code', 'value': {'intValue': '500'}}])
+        self.assertEqual(child['parentSpanId'], root['spanId'])
+        self.assertEqual(child['attributes'], [
+            {'key': 'cached', 'value': {'boolValue': False}},
+            {'key': 'ratio', 'value': {'doubleValue': 0.5}},
+            {'key': 'note', 'value': {'stringValue': 'x'}},
+        ])
+        self.assertEqual(child['status'], {'code': tracing.STATUS_ERROR, 'message': 'ValueError: boom'})
+        self.assertLessEqual(int(root['startTimeUnixNano']), int(child['startTimeUnixNano']))
+
+
+class NPlusOneTests(TestCase):
+
+    def setUp(self):
+        for n in range(4):
+            organization = Organization.objects.create(
+                name=f'Bank {n}', org_type='Bank', registration_number=f'REG-{n}'
+            )
+            user = User.objects.create_user(email=f'staff{n}@example.com', password='Pass12345!x', role='ORG_USER')
+            OrgUser.objects.create(user=user, organization=organization)
+
+    def test_queries_differing_only_in_literals_share_a_shape(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE id = 12 AND name = 'o''k' AND pk IN (%s, %s)"),
+            normalize_sql("SELECT *  FROM t WHERE id = 7 AND name = 'x' AND pk IN (%s)")
+        )
+
+    def test_per_row_foreign_key_access_is_reported(self):
+        with self.assertLogs('monitoring.nplusone', 'WARNING') as logs:
+            with detect_nplusone(threshold=2, label='staff list', raise_error=False):
+                names = [org_user.organization.name for org_user in OrgUser.objects.all()]
+        self.assertEqual(len(names), 4)
+        [report] = logs.output
+        self.assertIn('Possible N+1 queries in staff list', report)
+        self.assertIn('4x from', report)
+        self.assertIn('"organizations"', report)
+
+    def test_serializer_field_is_named_in_the_report(self):
+        with self.assertRaises(NPlusOneError) as raised:
+            with detect_nplusone(threshold=2, raise_error=True):
+                OrgUserSerializer(OrgUser.objects.all(), many=True).data
+        report = str(raised.exception)
+        self.assertIn("OrgUserSerializer.organization_name (source='organization.name')", report)
+        self.assertIn("OrgUserSerializer.user_email (source='user.email')", report)
+
+    def test_select_related_is_not_reported(self):
+        with detect_nplusone(threshold=2, raise_error=True) as counter:
+            data = OrgUserSerializer(OrgUser.objects.select_related('user', 'organization'), many=True).data
+        self.assertEqual(len(data), 4)
+        self.assertEqual(counter.offenders(), [])
+        self.assertEqual(sum(counter.counts.values()), 1)
+
+
+class MemoryDiagnosticsTests(TestCase):
+
+    def setUp(self):
+        # tracemalloc, the baseline and the peaks are process-wide
+        if not tracemalloc.is_tracing():
+            self.addCleanup(tracemalloc.stop)
+        self.addCleanup(memory._request_peaks.clear)
+        self.addCleanup(setattr, memory, '_baseline', None)
+
+    def client_for(self, create, email):
+        user = create(email=email, password='Pass12345!x')
+        forget_users([user.pk])
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {issue_tokens(user).access_token}'
+        return self.client
+
+    def test_middleware_is_opt_in(self):
+        self.client.get('/api/v1/organizations/')
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertEqual(memory.top_request_peaks(), [])
+
+    @override_settings(MEMORY_TRACKING_ENABLED=True, MEMORY_REQUEST_THRESHOLD_MB=0)
+    def test_middleware_records_peaks_by_url_name(self):
+        self.client.get('/api/v1/organizations/')
+        self.assertTrue(tracemalloc.is_tracing())
+        [peak] = memory.top_request_peaks()
+        self.assertEqual(peak['view'], 'list-organizations')
+
+    def test_report_diffs_against_the_baseline(self):
+        memory.reset_baseline()
+        grown = [bytearray(1024) for _ in range(2048)]
+        [top] = memory.top_allocations(limit=1)
+        self.assertIn('monitoring/tests.py', top['site'])
+        self.assertGreaterEqual(top['size_diff_mb'], 2)
+        self.assertGreaterEqual(top['count_diff'], len(grown))
+
+    def test_only_admins_may_view_the_report(self):
+        citizen = self.client_for(User.objects.create_user, 'citizen@example.com')
+        self.assertEqual(citizen.get('/api/v1/diagnostics/memory').status_code, 403)
+        self.assertEqual(citizen.post('/api/v1/diagnostics/memory').status_code, 403)
+        self.assertIsNone(memory._baseline)
+
+        admin = self.client_for(User.objects.create_superuser, 'admin@example.com')
+        self.assertEqual(admin.post('/api/v1/diagnostics/memory').status_code, 200)
+        response = admin.get('/api/v1/diagnostics/memory', {'limit': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['tracing'])
+        self.assertIsNotNone(response.json()['baseline_at'])
+        self.assertLessEqual(len(response.json()['top_allocations']), 5)
+        invalid = admin.get('/api/v1/diagnostics/memory', {'group_by': 'module'})
+        self.assertEqual(invalid.json()['error']['code'], 'INVALID_GROUP_BY')
+
+    def test_report_signal_is_installed_only_when_enabled(self):
+        self.assertIsNot(signal.getsignal(signal.SIGUSR2), memory.log_memory_report)
+        with mock.patch.object(memory.signal, 'signal') as install:
+            self.assertFalse(memory.install_report_signal())
+            install.assert_not_called()
+            with override_settings(MEMORY_TRACKING_ENABLED=True):
+                self.assertTrue(memory.install_report_signal())
+        install.assert_called_once_with(signal.SIGUSR2, memory.log_memory_report)
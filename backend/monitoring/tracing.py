@@ -0,0 +1,326 @@
+import os
+import json
+import queue
+import random
+import logging
+import secrets
+import threading
+import functools
+from time import time_ns
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# OTLP span kinds
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+# OTLP status codes
+STATUS_ERROR = 2
+
+MAX_STATEMENT_LENGTH = 2000
+
+_current_span = ContextVar('current_span', default=None)
+
+
+class Span:
+    """One timed operation. Only created inside a sampled trace."""
+
+    __slots__ = (
+        'trace', 'name', 'span_id', 'parent_id', 'kind',
+        'start_ns', 'end_ns', 'attributes', 'error',
+    )
+
+    def __init__(self, trace, name, parent_id=None, kind=KIND_INTERNAL, attributes=None):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def end(self):
+        self.end_ns = time_ns()
+        self.trace.spans.append(self)
+
+    def to_otlp(self):
+        span = {
+            'traceId': self.trace.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [
+                {'key': key, 'value': _otlp_value(value)}
+                for key, value in self.attributes.items()
+            ],
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        if self.error:
+            span['status'] = {'code': STATUS_ERROR, 'message': self.error}
+        return span
+
+
+class Trace:
+    """Spans collected for one request, exported together when it ends."""
+
+    __slots__ = ('trace_id', 'parent_id', 'sampled', 'spans')
+
+    def __init__(self, trace_id=None, parent_id=None, sampled=False):
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.spans = []
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def parse_traceparent(header):
+    """
+    Parse a W3C traceparent header ("00-<trace id>-<parent id>-<flags>").
+    Returns (trace_id, parent_id, sampled), or None if it is malformed.
+    """
+    try:
+        version, trace_id, parent_id, flags = header.strip().split('-')
+        int(trace_id, 16), int(parent_id, 16)
+        if len(version) != 2 or len(trace_id) != 32 or len(parent_id) != 16:
+            return None
+        if trace_id == '0' * 32 or parent_id == '0' * 16:
+            return None
+        return trace_id.lower(), parent_id.lower(), bool(int(flags, 16) & 1)
+    except (AttributeError, ValueError):
+        return None
+
+
+def start_trace(traceparent=None):
+    """
+    Begin a trace for an incoming request.
+
+    A valid incoming traceparent decides sampling (so a trace is kept or
+    dropped as a whole across services); otherwise TRACE_SAMPLE_RATE does.
+    """
+    parent = parse_traceparent(traceparent) if traceparent else None
+    if parent:
+        trace_id, parent_id, sampled = parent
+        return Trace(trace_id, parent_id, sampled)
+    return Trace(sampled=random.random() < settings.TRACE_SAMPLE_RATE)
+
+
+def current_span():
+    return _current_span.get()
+
+
+def current_traceparent():
+    """traceparent header value for outgoing calls, or None outside a trace."""
+    span = _current_span.get()
+    if span is None:
+        return None
+    return f'00-{span.trace.trace_id}-{span.span_id}-01'
+
+
+@contextmanager
+def span(name, kind=KIND_INTERNAL, attributes=None, trace=None):
+    """
+    Time a block as a child of the current span.
+
+    Outside a sampled trace this yields None and records nothing, so
+    instrumented code pays only for a context variable lookup.
+    """
+    parent = _current_span.get()
+    if trace is None:
+        if parent is None:
+            yield None
+            return
+        trace = parent.trace
+    elif not trace.sampled:
+        yield None
+        return
+
+    parent_id = parent.span_id if parent is not None else trace.parent_id
+    current = Span(trace, name, parent_id=parent_id, kind=kind, attributes=attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f'{type(e).__name__}: {e}'
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+def traced(name, kind=KIND_INTERNAL):
+    """Decorator form of span()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(name, kind=kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class QueryTracer:
+    """Database execute-wrapper that opens a span per SQL statement."""
+
+    def __init__(self, vendor):
+        self.vendor = vendor
+
+    def __call__(self, execute, sql, params, many, context):
+        attributes = {
+            'db.system': self.vendor,
+            'db.statement': sql[:MAX_STATEMENT_LENGTH],
+        }
+        with span('db.executemany' if many else 'db.query', kind=KIND_CLIENT, attributes=attributes):
+            return execute(sql, params, many, context)
+
+
+class SpanExporter:
+    """
+    Ships finished traces from a background thread, as OTLP/JSON
+    ExportTraceServiceRequest documents: one per line in TRACE_EXPORT_FILE
+    and/or POSTed to TRACE_OTLP_ENDPOINT (an OTLP/HTTP collector).
+    """
+
+    def __init__(self, path=None, endpoint=None, service_name='identity-shield'):
+        self.path = str(path) if path else None
+        self.endpoint = endpoint or None
+        self.resource = {
+            'attributes': [{'key': 'service.name', 'value': {'stringValue': service_name}}]
+        }
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def export(self, trace):
+        if not trace.spans:
+            return
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    self._queue = queue.SimpleQueue()
+                    threading.Thread(target=self._run, name='trace-export', daemon=True).start()
+        self._queue.put(trace.spans)
+
+    def build_request(self, spans):
+        return {
+            'resourceSpans': [{
+                'resource': self.resource,
+                'scopeSpans': [{
+                    'scope': {'name': 'monitoring.tracing'},
+                    'spans': [item.to_otlp() for item in spans],
+                }],
+            }]
+        }
+
+    def write(self, spans):
+        document = self.build_request(spans)
+        if self.path:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(document, separators=(',', ':')) + '\n')
+        if self.endpoint:
+            import requests
+            requests.post(self.endpoint, json=document, timeout=settings.TRACE_EXPORT_TIMEOUT)
+
+    def _run(self):
+        while True:
+            spans = self._queue.get()
+            try:
+                self.write(spans)
+            except Exception as e:
+                logger.error(f"Failed to export {len(spans)} spans: {str(e)}")
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter():
+    """Return the process-wide span exporter."""
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                _exporter = SpanExporter(
+                    path=settings.TRACE_EXPORT_FILE,
+                    endpoint=settings.TRACE_OTLP_ENDPOINT,
+                    service_name=settings.TRACE_SERVICE_NAME
+                )
+    return _exporter
+
+
+def _wrap(owner, attribute, name_func, kind=KIND_INTERNAL):
+    """Replace owner.attribute with a version that runs inside a span."""
+    original = getattr(owner, attribute)
+    if getattr(original, '_traced', False):
+        return
+
+    @functools.wraps(original)
+    def wrapper(*args, **kwargs):
+        if _current_span.get() is None:
+            return original(*args, **kwargs)
+        with span(name_func(*args, **kwargs), kind=kind):
+            return original(*args, **kwargs)
+
+    wrapper._traced = True
+    setattr(owner, attribute, wrapper)
+
+
+def instrument():
+    """
+    Patch third-party code paths that should show up in traces: DRF view
+    dispatch and serializers, password hashing and the Cloudinary API
+    clients. The ORM is traced by TracingMiddleware. Email is sent from
+    the outbox dispatcher thread, outside any request, so its span comes
+    from the traceparent stored on the outbox row (notifications.outbox).
+    """
+    import cloudinary.api
+    import cloudinary.uploader
+    from django.contrib.auth.base_user import AbstractBaseUser
+    from rest_framework.serializers import BaseSerializer
+    from rest_framework.views import APIView
+
+    def view_name(view, request, *args, **kwargs):
+        match = getattr(request, 'resolver_match', None)
+        return f"view {match.view_name if match else type(view).__name__}"
+
+    _wrap(APIView, 'dispatch', view_name)
+    _wrap(BaseSerializer, 'is_valid', lambda serializer, *a, **kw: f"serializer.validate {type(serializer).__name__}")
+
+    data = BaseSerializer.data
+    if not getattr(data.fget, '_traced', False):
+        def traced_data(serializer):
+            if _current_span.get() is None:
+                return data.fget(serializer)
+            with span(f"serializer.render {type(serializer).__name__}"):
+                return data.fget(serializer)
+        traced_data._traced = True
+        BaseSerializer.data = property(traced_data)
+
+    _wrap(AbstractBaseUser, 'set_password', lambda *a, **kw: 'password.hash')
+    _wrap(AbstractBaseUser, 'check_password', lambda *a, **kw: 'password.check')
+    _wrap(cloudinary.uploader, 'call_api', lambda action, *a, **kw: f"cloudinary.upload.{action}", kind=KIND_CLIENT)
+    _wrap(cloudinary.api, 'call_api', lambda method, uri, *a, **kw: f"cloudinary.api {method.upper()} {uri[0]}", kind=KIND_CLIENT)
@@ -0,0 +1,7 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('metrics', views.metrics, name='metrics'),
+    path('api/v1/diagnostics/memory', views.memory_diagnostics, name='memory-diagnostics'),
+]
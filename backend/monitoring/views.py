@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_GET
+from prometheus_client import CONTENT_TYPE_LATEST
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from .memory import memory_report, reset_baseline
+from .metrics import render_metrics
+
+
+@require_GET
+def metrics(request):
+    """
+    Prometheus scrape endpoint.
+    Only answers connections from METRICS_ALLOWED_IPS (loopback by default);
+    it is meant for a local scraper or sidecar, not for the load balancer.
+
+    GET /metrics
+    """
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def memory_diagnostics(request):
+    """
+    tracemalloc report for the worker that serves the request (Admin only).
+    - GET: allocation sites that grew since the baseline, plus the largest
+      per-request peaks by URL name
+    - POST: take a new baseline (starting tracemalloc if needed)
+    
+    GET /api/v1/diagnostics/memory?limit=20&group_by=lineno|filename|traceback
+    POST /api/v1/diagnostics/memory
+    """
+    if request.user.role != 'ADMIN':
+        return Response({
+            'error': {
+                'code': 'PERMISSION_DENIED',
+                'message': 'Only admins can view memory diagnostics'
+            }
+        }, status=status.HTTP_403_FORBIDDEN)
+    
+    if request.method == 'POST':
+        baseline_at = reset_baseline()
+        return Response({'message': 'Baseline snapshot taken', 'baseline_at': baseline_at})
+    
+    group_by = request.query_params.get('group_by', 'lineno')
+    if group_by not in ('lineno', 'filename', 'traceback'):
+        return Response({
+            'error': {
+                'code': 'INVALID_GROUP_BY',
+                'message': 'group_by must be one of lineno, filename, traceback'
+            }
+        }, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = min(max(int(request.query_params.get('limit', settings.MEMORY_REPORT_LIMIT)), 1), 100)
+    except ValueError:
+        limit = settings.MEMORY_REPORT_LIMIT
+    
+    return Response(memory_report(limit=limit, group_by=group_by))
@@ -0,0 +1,26 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import OutboxEmail
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    """Admin view of queued and delivered emails."""
+    
+    list_display = ['subject', 'to', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['to', 'subject']
+    readonly_fields = [field.name for field in OutboxEmail._meta.fields]
+    actions = ['retry_now']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    @admin.action(description='Retry selected emails now')
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status='SENT').update(
+            status='PENDING',
+            attempts=0,
+            next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f"{updated} emails queued for retry")
@@ -0,0 +1,23 @@
+from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
+
+
+def start_dispatcher(**kwargs):
+    from .outbox import get_dispatcher
+    get_dispatcher().start()
+
+
+class NotificationsConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "notifications"
+
+    def ready(self):
+        """
+        Start the email dispatcher when this worker serves its first
+        request, so emails left pending by earlier processes go out
+        without waiting for this one to queue an email. Management
+        commands don't start it (see dispatch_emails).
+        """
+        if settings.EMAIL_DISPATCHER_IN_PROCESS:
+            request_started.connect(start_dispatcher, dispatch_uid='notifications.start_dispatcher')
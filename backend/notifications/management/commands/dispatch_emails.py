@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from notifications.outbox import get_dispatcher
+
+
+class Command(BaseCommand):
+    """
+    Run the email dispatcher as its own process. Use it with
+    EMAIL_DISPATCHER_IN_PROCESS=False, so that a single worker owns the
+    SMTP connection and EMAIL_RATE_LIMIT applies to all outgoing mail.
+    """
+
+    help = 'Deliver queued outbox emails'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Send what is due now and exit instead of polling'
+        )
+
+    def handle(self, *args, **options):
+        dispatcher = get_dispatcher()
+        if options['once']:
+            sent = dispatcher.dispatch()
+            self.stdout.write(self.style.SUCCESS(f"Sent {sent} emails"))
+            return
+
+        self.stdout.write(f"Dispatching emails every {dispatcher.poll_interval}s (Ctrl+C to stop)")
+        try:
+            dispatcher.run_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.1 on 2026-10-19 04:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="outboxemail",
+            name="traceparent",
+            field=models.CharField(
+                blank=True,
+                help_text="W3C traceparent of the request that queued it, so the send joins its trace",
+                max_length=55,
+            ),
+        ),
+    ]
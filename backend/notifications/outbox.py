@@ -0,0 +1,255 @@
+import os
+import random
+import logging
+import threading
+from time import monotonic, sleep
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from monitoring.tracing import KIND_CLIENT, current_traceparent, get_exporter, span, start_trace
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+UPDATE_FIELDS = ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+
+
+def enqueue_email(subject, body, to, html_body='', from_email=None):
+    """
+    Queue an email for the dispatcher.
+
+    Call it inside the transaction that makes the email necessary: the
+    row commits (or rolls back) with it, and the dispatcher is only woken
+    once it has committed. Never talks to the mail server. Inside a
+    sampled trace the send is recorded as a span of that trace.
+    """
+    email = OutboxEmail.objects.create(
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+        traceparent=current_traceparent() or ''
+    )
+    if settings.EMAIL_DISPATCHER_IN_PROCESS:
+        transaction.on_commit(get_dispatcher().wake)
+    return email
+
+
+def enqueue_emails(messages):
+    """
+    Queue many emails with one INSERT. Each message is a dict of
+    enqueue_email's arguments. Same transaction semantics as enqueue_email.
+    """
+    traceparent = current_traceparent() or ''
+    emails = OutboxEmail.objects.bulk_create([
+        OutboxEmail(
+            subject=message['subject'],
+            body=message['body'],
+            html_body=message.get('html_body', ''),
+            from_email=message.get('from_email') or settings.DEFAULT_FROM_EMAIL,
+            to=list(message['to']),
+            traceparent=traceparent
+        )
+        for message in messages
+    ])
+    if emails and settings.EMAIL_DISPATCHER_IN_PROCESS:
+        transaction.on_commit(get_dispatcher().wake)
+    return emails
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter, capped at EMAIL_RETRY_MAX_DELAY."""
+    delay = min(settings.EMAIL_RETRY_BASE_DELAY * 2 ** (attempts - 1), settings.EMAIL_RETRY_MAX_DELAY)
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def record_failure(email, error):
+    email.attempts += 1
+    email.last_error = str(error)[:1000]
+    if email.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+        email.status = 'FAILED'
+        logger.error(f"Giving up on email {email.pk} to {email.to} after {email.attempts} attempts: {error}")
+    else:
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+
+
+def claim_due(limit):
+    """
+    Take up to limit due emails. They are leased by pushing next_attempt_at
+    past EMAIL_CLAIM_LEASE, so other dispatchers skip them and a crashed
+    dispatcher's batch is retried once the lease runs out.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due = OutboxEmail.objects.filter(status='PENDING', next_attempt_at__lte=now).order_by('next_attempt_at')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        emails = list(due[:limit])
+        if emails:
+            OutboxEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+                next_attempt_at=now + timedelta(seconds=settings.EMAIL_CLAIM_LEASE)
+            )
+    return emails
+
+
+class RateLimiter:
+    """Spaces sends out to at most rate per second (0 means unlimited)."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self._next = 0
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = monotonic()
+        if self._next > now:
+            sleep(self._next - now)
+            now = self._next
+        self._next = now + self.interval
+
+
+def send_traced(message, email):
+    """
+    Send a message; if it was queued inside a sampled trace, record the
+    send as a span of that trace, parented to the span that queued it.
+    """
+    trace = start_trace(email.traceparent) if email.traceparent else None
+    if trace is None or not trace.sampled:
+        return message.send()
+    attributes = {'email.outbox_id': email.pk, 'email.attempt': email.attempts + 1}
+    try:
+        with span('email.send', kind=KIND_CLIENT, attributes=attributes, trace=trace):
+            return message.send()
+    finally:
+        get_exporter().export(trace)
+
+
+def send_batch(emails, limiter):
+    """
+    Deliver emails over a single mail connection and record the outcome.
+    A failed send reopens the connection for the rest of the batch.
+    Returns the number sent.
+    """
+    mail_connection = get_connection(fail_silently=False)
+    sent = 0
+    remaining = list(emails)
+    try:
+        mail_connection.open()
+        while remaining:
+            email = remaining[0]
+            limiter.wait()
+            message = EmailMultiAlternatives(
+                email.subject,
+                email.body,
+                email.from_email,
+                email.to,
+                connection=mail_connection
+            )
+            if email.html_body:
+                message.attach_alternative(email.html_body, 'text/html')
+            try:
+                send_traced(message, email)
+            except Exception as e:
+                record_failure(email, e)
+                remaining.pop(0)
+                mail_connection.close()
+                mail_connection.open()
+                continue
+            email.status = 'SENT'
+            email.attempts += 1
+            email.last_error = ''
+            email.sent_at = timezone.now()
+            sent += 1
+            remaining.pop(0)
+    except Exception as e:
+        # Could not (re)connect: everything not yet sent is retried later
+        logger.error(f"Mail connection failed, {len(remaining)} emails rescheduled: {str(e)}")
+        for email in remaining:
+            record_failure(email, e)
+    finally:
+        try:
+            mail_connection.close()
+        except Exception:
+            pass
+        OutboxEmail.objects.bulk_update(emails, UPDATE_FIELDS)
+    return sent
+
+
+class EmailDispatcher:
+    """
+    Delivers outbox emails in batches from a background thread.
+
+    The thread starts with the first request the process serves (see
+    NotificationsConfig.ready) or the first email it queues, whichever
+    comes first, and again after a fork. It is woken whenever a queued
+    email commits, and otherwise polls every poll_interval seconds for
+    retries.
+    """
+
+    def __init__(self, batch_size, poll_interval, rate_limit):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.limiter = RateLimiter(rate_limit)
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._dispatch_lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+
+    def start(self):
+        """Start the dispatch thread in this process if it isn't running yet."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self.run_forever, name='email-dispatch', daemon=True)
+                self._thread.start()
+
+    def wake(self):
+        self.start()
+        self._wakeup.set()
+
+    def dispatch(self):
+        """Send due emails batch by batch until none are left. Returns the number sent."""
+        sent = 0
+        with self._dispatch_lock:
+            while True:
+                emails = claim_due(self.batch_size)
+                if not emails:
+                    return sent
+                sent += send_batch(emails, self.limiter)
+
+    def run_forever(self):
+        """Dispatch loop of the background thread, or of manage.py dispatch_emails."""
+        while True:
+            self._wakeup.clear()
+            try:
+                self.dispatch()
+            except Exception as e:
+                logger.error(f"Email dispatcher error: {str(e)}")
+            finally:
+                close_old_connections()
+            self._wakeup.wait(self.poll_interval)
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """Return the process-wide email dispatcher."""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = EmailDispatcher(
+                    settings.EMAIL_BATCH_SIZE,
+                    settings.EMAIL_POLL_INTERVAL,
+                    settings.EMAIL_RATE_LIMIT
+                )
+    return _dispatcher
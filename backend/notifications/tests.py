@@ -0,0 +1,104 @@
+import os
+from datetime import timedelta
+from unittest import mock
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from monitoring.tracing import Trace, span
+from .models import OutboxEmail
+from .outbox import EmailDispatcher, enqueue_email, get_dispatcher
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    EMAIL_MAX_ATTEMPTS=3,
+    EMAIL_RETRY_BASE_DELAY=30,
+    EMAIL_RETRY_MAX_DELAY=3600
+)
+class OutboxDispatchTests(TestCase):
+
+    def setUp(self):
+        # Dispatch synchronously, apart from the process-wide dispatcher thread
+        self.dispatcher = EmailDispatcher(batch_size=2, poll_interval=3600, rate_limit=0)
+
+    def queue(self, to):
+        return enqueue_email('Subject', 'Body', [to])
+
+    def fail_for(self, recipient):
+        """Make sends to recipient fail; everything else goes through."""
+        send = EmailMultiAlternatives.send
+
+        def fake_send(message, *args, **kwargs):
+            if recipient in message.to:
+                raise ConnectionError('mailbox unavailable')
+            return send(message, *args, **kwargs)
+
+        return mock.patch.object(EmailMultiAlternatives, 'send', autospec=True, side_effect=fake_send)
+
+    def test_due_emails_are_sent_in_batches(self):
+        emails = [self.queue(f'user{n}@example.com') for n in range(5)]
+        self.assertEqual(self.dispatcher.dispatch(), 5)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(
+            set(OutboxEmail.objects.filter(pk__in=[email.pk for email in emails]).values_list('status', flat=True)),
+            {'SENT'}
+        )
+
+    def test_failed_send_is_retried_with_backoff(self):
+        failing = self.queue('down@example.com')
+        self.queue('up@example.com')
+        with self.fail_for('down@example.com'):
+            self.assertEqual(self.dispatcher.dispatch(), 1)
+
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), ('PENDING', 1))
+        self.assertIn('mailbox unavailable', failing.last_error)
+        delay = failing.next_attempt_at - timezone.now()
+        self.assertTrue(timedelta(seconds=10) < delay <= timedelta(seconds=30))
+        # Not due yet, so it isn't sent again right away
+        self.assertEqual(self.dispatcher.dispatch(), 0)
+
+        OutboxEmail.objects.filter(pk=failing.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(self.dispatcher.dispatch(), 1)
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), ('SENT', 2))
+
+    def test_email_fails_after_max_attempts(self):
+        email = self.queue('down@example.com')
+        with self.fail_for('down@example.com'):
+            for _ in range(3):
+                OutboxEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+                self.dispatcher.dispatch()
+
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('FAILED', 3))
+        self.assertEqual(mail.outbox, [])
+
+    def test_send_joins_the_trace_that_queued_it(self):
+        trace = Trace(sampled=True)
+        with span('view register', trace=trace) as view:
+            traced = self.queue('traced@example.com')
+        untraced = self.queue('plain@example.com')
+        self.assertEqual(traced.traceparent, f'00-{trace.trace_id}-{view.span_id}-01')
+        self.assertEqual(untraced.traceparent, '')
+
+        with mock.patch('notifications.outbox.get_exporter') as get_exporter:
+            self.assertEqual(self.dispatcher.dispatch(), 2)
+        [(exported,), _] = get_exporter.return_value.export.call_args
+        [send] = exported.spans
+        self.assertEqual((exported.trace_id, send.parent_id), (trace.trace_id, view.span_id))
+        self.assertEqual(send.name, 'email.send')
+        self.assertEqual(send.attributes, {'email.outbox_id': traced.pk, 'email.attempt': 1})
+
+    def test_claimed_emails_are_leased(self):
+        self.queue('user@example.com')
+        with mock.patch('notifications.outbox.send_batch', return_value=0):
+            self.dispatcher.dispatch()
+        # A crashed dispatcher's batch only comes back once the lease runs out
+        self.assertEqual(self.dispatcher.dispatch(), 0)
+
+    def test_dispatcher_starts_with_first_request(self):
+        self.client.get('/api/v1/organizations/')
+        self.assertEqual(get_dispatcher()._pid, os.getpid())
+        self.assertTrue(get_dispatcher()._thread.is_alive())
@@ -0,0 +1,70 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+from config.cache import TTLCache
+
+# organization_id -> metrics dict
+_metrics = TTLCache(settings.ORG_DASHBOARD_CACHE_TTL)
+
+
+def compute_dashboard_metrics(organization_id):
+    """
+    Verification and consent figures for an organization's dashboard.
+    All verification counts come from one conditional aggregate over the
+    organization's history; active consents are one COUNT.
+    """
+    from consent.models import ConsentGrant
+    from credentials.models import VerificationHistory
+
+    now = timezone.now()
+    windows = {
+        'today': timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0),
+        'last_7_days': now - timedelta(days=7),
+        'last_30_days': now - timedelta(days=30),
+        'all_time': None,
+    }
+    success = Q(status='SUCCESS')
+
+    aggregates = {}
+    for window, since in windows.items():
+        in_window = Q(verified_at__gte=since) if since else Q()
+        aggregates[f'{window}_total'] = Count('id', filter=in_window)
+        aggregates[f'{window}_success'] = Count('id', filter=in_window & success)
+        aggregates[f'{window}_citizens'] = Count('citizen', filter=in_window & success, distinct=True)
+
+    counts = VerificationHistory.objects.filter(organization_id=organization_id).aggregate(**aggregates)
+
+    verifications = {}
+    for window in windows:
+        total, succeeded = counts[f'{window}_total'], counts[f'{window}_success']
+        verifications[window] = {
+            'total': total,
+            'success': succeeded,
+            'failed': total - succeeded,
+            'distinct_citizens': counts[f'{window}_citizens'],
+        }
+
+    return {
+        'verifications': verifications,
+        'active_consents': ConsentGrant.objects.filter(organization_id=organization_id, is_active=True).count(),
+        'generated_at': now.isoformat(),
+    }
+
+
+def get_dashboard_metrics(organization_id):
+    """Dashboard metrics, cached per worker for ORG_DASHBOARD_CACHE_TTL seconds."""
+    metrics = _metrics.get(organization_id)
+    if metrics is None:
+        metrics = compute_dashboard_metrics(organization_id)
+        _metrics.set(organization_id, metrics)
+    return metrics
+
+
+def forget_dashboard_metrics(organization_id):
+    """
+    Drop cached metrics so this worker recomputes them on the next request.
+    Only the local worker's cache is cleared: other workers keep serving
+    their copy for up to ORG_DASHBOARD_CACHE_TTL seconds.
+    """
+    _metrics.delete(organization_id)
@@ -0,0 +1,108 @@
+import json
+import hashlib
+import threading
+from time import monotonic
+from django.conf import settings
+from django.db.models import Count, Max
+from .models import Organization
+from .serializers import OrganizationSerializer
+
+
+class DirectorySnapshot:
+    """
+    The active organizations, serialized once. Each entry is kept as
+    encoded JSON, so both the full list and search results are joined
+    from bytes without serializing again.
+    """
+
+    def __init__(self, organizations, last_modified):
+        self.entries = [
+            (
+                organization['name'].casefold(),
+                json.dumps(organization, separators=(',', ':')).encode()
+            )
+            for organization in OrganizationSerializer(organizations, many=True).data
+        ]
+        self.body = self.join([entry for _, entry in self.entries])
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+        self.last_modified = last_modified
+
+    @staticmethod
+    def join(entries):
+        return b'[' + b','.join(entries) + b']'
+
+    def search(self, query):
+        """Body and ETag of the organizations whose name contains query."""
+        query = query.casefold()
+        body = self.join([entry for name, entry in self.entries if query in name])
+        etag = '"' + hashlib.sha256(self.etag.encode() + body).hexdigest()[:32] + '"'
+        return body, etag
+
+
+class OrganizationDirectory:
+    """
+    Per-worker copy of the organization directory.
+
+    Organizations change a few times a day but are listed constantly, so
+    the list is serialized once and rebuilt only when it changes: at once
+    in the worker that saved the change, and in other workers when a
+    cheap fingerprint query (run at most every check_interval seconds)
+    no longer matches.
+    """
+
+    def __init__(self, check_interval):
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._fingerprint = None
+        self._checked_at = None
+        # Bumped by every invalidate(), so a refresh that overlapped one
+        # knows it may have read the database before the change
+        self._version = 0
+        self._state_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def invalidate(self):
+        with self._state_lock:
+            self._version += 1
+            self._checked_at = None
+
+    def _is_current(self):
+        checked_at = self._checked_at
+        return checked_at is not None and monotonic() - checked_at <= self.check_interval
+
+    def _refresh(self):
+        # Counting all rows catches deletions; updated_at catches edits,
+        # including deactivation
+        state = Organization.objects.aggregate(count=Count('id'), last_modified=Max('updated_at'))
+        fingerprint = (state['count'], state['last_modified'])
+        if self._snapshot is None or fingerprint != self._fingerprint:
+            organizations = Organization.objects.filter(is_active=True)
+            self._snapshot = DirectorySnapshot(organizations, state['last_modified'])
+            self._fingerprint = fingerprint
+
+    def snapshot(self):
+        if not self._is_current():
+            with self._refresh_lock:
+                # Loops again if invalidated while refreshing
+                while not self._is_current():
+                    with self._state_lock:
+                        version = self._version
+                    self._refresh()
+                    with self._state_lock:
+                        if self._version == version:
+                            self._checked_at = monotonic()
+        return self._snapshot
+
+
+_directory = None
+_directory_lock = threading.Lock()
+
+
+def get_directory():
+    """Return the process-wide organization directory."""
+    global _directory
+    if _directory is None:
+        with _directory_lock:
+            if _directory is None:
+                _directory = OrganizationDirectory(settings.ORG_DIRECTORY_CHECK_INTERVAL)
+    return _directory
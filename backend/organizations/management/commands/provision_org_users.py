@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from organizations.models import Organization
+from organizations.provisioning import ProvisioningError, provision_org_users
+
+
+class Command(BaseCommand):
+    """
+    Create organization staff accounts from a CSV, e.g. when a bank
+    onboards its verifiers. Same rules as POST /organizations/{id}/users/bulk.
+    """
+
+    help = 'Bulk-create organization users from a CSV (email, role, phone, password)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('org_id', type=int, help='Organization ID')
+        parser.add_argument('csv_path', help='CSV file with an email column')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the rows without creating anything'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            organization = Organization.objects.get(id=options['org_id'])
+        except Organization.DoesNotExist:
+            raise CommandError(f"Organization {options['org_id']} not found")
+
+        try:
+            with open(options['csv_path'], 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            raise CommandError(str(e))
+
+        try:
+            summary, results = provision_org_users(organization, data, dry_run=options['dry_run'])
+        except ProvisioningError as e:
+            raise CommandError(str(e))
+
+        for result in results:
+            if result['status'] == 'error':
+                self.stdout.write(self.style.ERROR(
+                    f"  line {result['line']} {result['email']}: {'; '.join(result['errors'])}"
+                ))
+            else:
+                self.stdout.write(f"  line {result['line']} {result['email']}: {result['status']}")
+
+        message = f"{summary['rows']} rows: {summary['created']} created, {summary['errors']} with errors"
+        if options['dry_run']:
+            message = f"{summary['rows']} rows: {summary['valid']} valid, {summary['errors']} with errors (dry run)"
+        self.stdout.write(self.style.SUCCESS(message) if not summary['errors'] else self.style.WARNING(message))
@@ -0,0 +1,222 @@
+import io
+import os
+import csv
+import atexit
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from accounts.models import User
+from config.pools import process_pool_context, setup_django_worker
+from .models import OrgUser
+
+CSV_COLUMNS = ['email', 'role', 'phone', 'password']
+ROLES = [choice for choice, _ in OrgUser.ROLE_CHOICES]
+
+
+class ProvisioningError(Exception):
+    """The CSV as a whole can't be processed (bad header, too many rows...)."""
+
+
+def parse_staff_csv(data):
+    """
+    Parse a staff CSV (bytes or str) with an `email` column and optional
+    `role`, `phone` and `password` columns. Returns a list of
+    (line number, row dict).
+    """
+    if isinstance(data, bytes):
+        try:
+            data = data.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise ProvisioningError('CSV must be UTF-8 encoded')
+
+    reader = csv.DictReader(io.StringIO(data))
+    header = [(name or '').strip().lower() for name in reader.fieldnames or []]
+    if 'email' not in header:
+        raise ProvisioningError('CSV must have an "email" column')
+    unknown = [name for name in header if name not in CSV_COLUMNS]
+    if unknown:
+        raise ProvisioningError(f"Unknown CSV columns: {', '.join(unknown)}")
+    reader.fieldnames = header
+
+    rows = []
+    for row in reader:
+        rows.append((reader.line_num, {name: (value or '').strip() for name, value in row.items() if name}))
+        if len(rows) > settings.ORG_PROVISIONING_MAX_ROWS:
+            raise ProvisioningError(f"CSV has more than {settings.ORG_PROVISIONING_MAX_ROWS} rows")
+    if not rows:
+        raise ProvisioningError('CSV has no rows')
+    return rows
+
+
+def validate_rows(rows):
+    """
+    Check every row and return one result per row; rows that passed have
+    no 'errors'. Existing accounts are found with two queries in total.
+    """
+    emails = [User.objects.normalize_email(row.get('email', '')) for _, row in rows]
+    phones = [row.get('phone') for _, row in rows if row.get('phone')]
+    # Emails differing only in case belong to the same person
+    taken_emails = set(
+        User.objects
+        .annotate(email_lower=Lower('email'))
+        .filter(email_lower__in={email.lower() for email in emails})
+        .values_list('email_lower', flat=True)
+    )
+    taken_phones = set(User.objects.filter(phone__in=phones).values_list('phone', flat=True))
+
+    seen_emails, seen_phones = set(), set()
+    results = []
+    for (line, row), email in zip(rows, emails):
+        errors = []
+        role = (row.get('role') or 'VERIFIER').upper()
+        phone = row.get('phone') or None
+        password = row.get('password') or None
+
+        try:
+            validate_email(email)
+        except ValidationError:
+            errors.append('Enter a valid email address')
+        if email.lower() in taken_emails:
+            errors.append('A user with this email already exists')
+        elif email.lower() in seen_emails:
+            errors.append('Duplicate email in this file')
+        if role not in ROLES:
+            errors.append(f"Role must be one of {', '.join(ROLES)}")
+        if phone:
+            if len(phone) > 15:
+                errors.append('Phone number is too long')
+            elif phone in taken_phones:
+                errors.append('A user with this phone number already exists')
+            elif phone in seen_phones:
+                errors.append('Duplicate phone number in this file')
+        if password:
+            try:
+                validate_password(password, User(email=email))
+            except ValidationError as e:
+                errors.extend(e.messages)
+
+        seen_emails.add(email.lower())
+        if phone:
+            seen_phones.add(phone)
+        result = {'line': line, 'email': email, 'role': role}
+        if errors:
+            result['status'] = 'error'
+            result['errors'] = errors
+        else:
+            result['phone'] = phone
+            result['password'] = password
+        results.append(result)
+    return results
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _hash_workers():
+    return min(settings.ORG_PROVISIONING_HASH_WORKERS, os.cpu_count() or 1)
+
+
+def get_executor():
+    """
+    Lazily create the shared process pool used for password hashing.
+    Workers come from a fork server (see config.pools) and stay up
+    between uploads, so each CSV doesn't pay for starting Django again.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=_hash_workers(),
+                    mp_context=process_pool_context(),
+                    initializer=setup_django_worker
+                )
+                atexit.register(_executor.shutdown, wait=False)
+    return _executor
+
+
+def hash_passwords(passwords):
+    """
+    Hash passwords with the configured hasher across a process pool,
+    so hundreds of PBKDF2 hashes take seconds rather than minutes.
+    """
+    if not passwords:
+        return []
+    workers = min(_hash_workers(), len(passwords))
+    if workers <= 1:
+        return [make_password(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    return list(get_executor().map(make_password, passwords, chunksize=chunksize))
+
+
+def provision_org_users(organization, data, dry_run=False):
+    """
+    Create User + OrgUser rows for every valid row of a staff CSV.
+
+    Rows with a password are hashed in a process pool and sent a
+    verification email; rows without one get an unusable password and a
+    set-password link. Valid rows are inserted with bulk_create in one
+    transaction, together with their outbox emails; invalid rows are
+    reported and skipped. Returns (summary, per-row results).
+    """
+    from accounts.utils import build_set_password_email, build_verification_email
+    from notifications.outbox import enqueue_emails
+
+    results = validate_rows(parse_staff_csv(data))
+    valid = [result for result in results if 'errors' not in result]
+
+    if not dry_run and valid:
+        to_hash = [result for result in valid if result['password']]
+        for result, encoded in zip(to_hash, hash_passwords([result['password'] for result in to_hash])):
+            result['encoded_password'] = encoded
+
+        users = [
+            User(
+                email=result['email'],
+                phone=result['phone'],
+                role='ORG_USER',
+                password=result.get('encoded_password') or make_password(None),
+            )
+            for result in valid
+        ]
+        try:
+            with transaction.atomic():
+                users = User.objects.bulk_create(users)
+                OrgUser.objects.bulk_create([
+                    OrgUser(user=user, organization=organization, role=result['role'])
+                    for user, result in zip(users, valid)
+                ])
+                enqueue_emails([
+                    build_verification_email(user) if result['password']
+                    else build_set_password_email(user, organization.name)
+                    for user, result in zip(users, valid)
+                ])
+        except IntegrityError:
+            # Someone registered one of these emails or phones since validation
+            raise ProvisioningError('Some users were created concurrently; nothing was saved, please retry')
+
+        for user, result in zip(users, valid):
+            result['status'] = 'created'
+            result['user_id'] = user.pk
+            result['invited'] = not result['password']
+
+    for result in valid:
+        if dry_run:
+            result['status'] = 'valid'
+        for key in ('phone', 'password', 'encoded_password'):
+            result.pop(key, None)
+
+    summary = {
+        'rows': len(results),
+        'valid': len(valid),
+        'created': 0 if dry_run else len(valid),
+        'errors': len(results) - len(valid),
+    }
+    return summary, results
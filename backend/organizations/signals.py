@@ -0,0 +1,32 @@
+from functools import partial
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from accounts.tokens import bump_token_version
+from consent.models import ConsentGrant
+from credentials.models import VerificationHistory
+from .models import Organization, OrgUser
+
+
+@receiver([post_save, post_delete], sender=Organization)
+def invalidate_directory(sender, **kwargs):
+    """Rebuild this worker's organization directory once the change commits."""
+    from .directory import get_directory
+
+    transaction.on_commit(get_directory().invalidate)
+
+
+@receiver([post_save, post_delete], sender=VerificationHistory)
+@receiver([post_save, post_delete], sender=ConsentGrant)
+def invalidate_dashboard_metrics(sender, instance, **kwargs):
+    """A verification or consent change makes the organization's dashboard stale."""
+    from .dashboard import forget_dashboard_metrics
+
+    transaction.on_commit(partial(forget_dashboard_metrics, instance.organization_id))
+
+
+@receiver(post_save, sender=OrgUser)
+def refresh_org_user_claims(sender, instance, created, **kwargs):
+    """Tokens issued before the user joined the organization carry no organization ID."""
+    if created:
+        transaction.on_commit(partial(bump_token_version, [instance.user_id]))
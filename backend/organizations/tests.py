@@ -1,3 +1,273 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from unittest import mock
+from django.contrib.auth.hashers import check_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.authentication import forget_users
+from accounts.models import User
+from accounts.tokens import issue_tokens
+from consent.models import ConsentGrant
+from credentials.models import VerificationHistory
+from identity.models import CitizenProfile
+from notifications.models import OutboxEmail
+from . import dashboard, provisioning
+from .directory import DirectorySnapshot, OrganizationDirectory, get_directory
+from .models import Organization, OrgUser
 
-# Create your tests here.
+
+class OrganizationsTestCase(TestCase):
+
+    def make_user(self, email, create=None, **fields):
+        user = (create or User.objects.create_user)(email=email, password='Pass12345!x', **fields)
+        # IDs are reused once a test's rows are rolled back
+        forget_users([user.pk])
+        return user
+
+    def make_organization(self, name, **fields):
+        fields.setdefault('approval_status', 'APPROVED')
+        return Organization.objects.create(name=name, org_type='Bank', registration_number=name, **fields)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_tokens(user).access_token}')
+        return client
+
+
+@override_settings(ORG_PROVISIONING_HASH_WORKERS=1)
+class StaffProvisioningTests(OrganizationsTestCase):
+
+    def setUp(self):
+        self.organization = self.make_organization('Bank A')
+        self.admin = self.client_for(self.make_user('admin@example.com', create=User.objects.create_superuser))
+
+    def upload(self, text, client=None, dry_run=False):
+        url = f'/api/v1/organizations/{self.organization.id}/users/bulk'
+        if dry_run:
+            url += '?dry_run=true'
+        data = text.encode() if isinstance(text, str) else text
+        return (client or self.admin).post(url, {'file': SimpleUploadedFile('staff.csv', data)}, format='multipart')
+
+    def test_valid_rows_are_created_and_invalid_rows_reported(self):
+        self.make_user('Taken@Example.com')
+        response = self.upload(
+            'email,role,phone,password\n'
+            'alice@example.com,admin,+8801700000001,Str0ng-Passw0rd\n'
+            'bob@example.com,,,\n'
+            'not-an-email,,,\n'
+            'carol@example.com,MANAGER,,\n'
+            'ALICE@example.com,,,\n'
+            'taken@example.com,,,\n'
+            'dave@example.com,,,123\n'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['summary'], {'rows': 7, 'valid': 2, 'created': 2, 'errors': 5})
+
+        errors = {result['line']: result.get('errors') for result in response.json()['results']}
+        self.assertIsNone(errors[2])
+        self.assertIsNone(errors[3])
+        self.assertEqual(errors[4], ['Enter a valid email address'])
+        self.assertIn('Role must be one of', errors[5][0])
+        self.assertEqual(errors[6], ['Duplicate email in this file'])
+        self.assertEqual(errors[7], ['A user with this email already exists'])
+        self.assertTrue(errors[8])
+
+        alice = User.objects.get(email='alice@example.com')
+        self.assertTrue(check_password('Str0ng-Passw0rd', alice.password))
+        self.assertEqual(OrgUser.objects.get(user=alice).role, 'ADMIN')
+        bob = User.objects.get(email='bob@example.com')
+        self.assertFalse(bob.has_usable_password())
+        self.assertEqual(OrgUser.objects.get(user=bob).organization, self.organization)
+        self.assertEqual(OutboxEmail.objects.filter(to=['bob@example.com']).count(), 1)
+
+    def test_dry_run_creates_nothing(self):
+        response = self.upload('email\nalice@example.com\n', dry_run=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['status'], 'valid')
+        self.assertFalse(User.objects.filter(email='alice@example.com').exists())
+
+    def test_unreadable_csv_is_rejected(self):
+        for data in ['name\nalice\n', 'email,nickname\nalice@example.com,al\n', 'email\n', b'email\n\xff\xfe\n']:
+            response = self.upload(data)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['error']['code'], 'INVALID_CSV')
+
+    @override_settings(ORG_PROVISIONING_MAX_ROWS=2)
+    def test_too_many_rows_are_rejected(self):
+        response = self.upload('email\na@example.com\nb@example.com\nc@example.com\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('more than 2 rows', response.json()['error']['message'])
+        self.assertEqual(User.objects.filter(email__endswith='@example.com').count(), 1)
+
+    def test_only_admins_may_provision(self):
+        staff = self.client_for(self.make_user('verifier@example.com', role='ORG_USER'))
+        self.assertEqual(self.upload('email\nalice@example.com\n', client=staff).status_code, 403)
+
+    def test_concurrent_registration_saves_nothing(self):
+        validate_rows = provisioning.validate_rows
+
+        def validate_then_register(rows):
+            results = validate_rows(rows)
+            # Someone signs up between validation and the insert
+            self.make_user('alice@example.com')
+            return results
+
+        with mock.patch.object(provisioning, 'validate_rows', side_effect=validate_then_register):
+            response = self.upload('email\nalice@example.com\nbob@example.com\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(User.objects.filter(email='bob@example.com').exists())
+
+
+class PasswordHashingTests(TestCase):
+
+    @override_settings(ORG_PROVISIONING_HASH_WORKERS=2)
+    def test_hashes_in_the_shared_pool(self):
+        with mock.patch.object(provisioning.os, 'cpu_count', return_value=2):
+            first = provisioning.hash_passwords(['one-Passw0rd', 'two-Passw0rd'])
+            executor = provisioning.get_executor()
+            second = provisioning.hash_passwords(['three-Passw0rd', 'four-Passw0rd'])
+        self.assertIs(provisioning.get_executor(), executor)
+        self.assertTrue(check_password('one-Passw0rd', first[0]))
+        self.assertTrue(check_password('four-Passw0rd', second[1]))
+
+
+class OrganizationDirectoryTests(OrganizationsTestCase):
+
+    def setUp(self):
+        self.bank = self.make_organization('Bank A')
+        self.make_organization('Telecom B')
+        self.make_organization('Closed Bank', is_active=False)
+        # The directory outlives each test's rolled-back rows
+        get_directory().invalidate()
+        self.client = self.client_for(self.make_user('citizen@example.com'))
+
+    def list(self, **headers):
+        return self.client.get('/api/v1/organizations/', **headers)
+
+    def names(self, response):
+        return sorted(organization['name'] for organization in response.json())
+
+    def test_lists_active_organizations_with_validators(self):
+        response = self.list()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.names(response), ['Bank A', 'Telecom B'])
+        self.assertTrue(response['ETag'])
+        self.assertTrue(response['Last-Modified'])
+
+    def test_unchanged_directory_is_not_modified(self):
+        response = self.list()
+        self.assertEqual(self.list(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.list(HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        self.assertEqual(self.list(HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_search_has_its_own_etag(self):
+        everything = self.list()
+        response = self.client.get('/api/v1/organizations/', {'search': 'BANK'})
+        self.assertEqual(self.names(response), ['Bank A'])
+        self.assertNotEqual(response['ETag'], everything['ETag'])
+        repeat = self.client.get('/api/v1/organizations/', {'search': 'bank'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+
+    def test_saved_change_invalidates_at_once(self):
+        etag = self.list()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bank.is_active = False
+            self.bank.save()
+        response = self.list(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.names(response), ['Telecom B'])
+
+    def test_invalidation_during_refresh_refreshes_again(self):
+        directory = OrganizationDirectory(check_interval=3600)
+        build = DirectorySnapshot.__init__
+        builds = []
+
+        def build_then_change(snapshot, organizations, last_modified):
+            build(snapshot, organizations, last_modified)
+            if not builds:
+                # A change commits while the first snapshot is being built
+                self.make_organization('Late Bank')
+                directory.invalidate()
+            builds.append(snapshot)
+
+        with mock.patch.object(DirectorySnapshot, '__init__', autospec=True, side_effect=build_then_change):
+            snapshot = directory.snapshot()
+        self.assertEqual(len(builds), 2)
+        self.assertIn(b'Late Bank', snapshot.body)
+        self.assertIs(directory.snapshot(), snapshot)
+
+
+class OrgDashboardTests(OrganizationsTestCase):
+
+    def setUp(self):
+        self.organization = self.make_organization('Bank A')
+        self.other = self.make_organization('Bank B')
+        user = self.make_user('verifier@example.com', role='ORG_USER')
+        OrgUser.objects.create(user=user, organization=self.organization)
+        self.client = self.client_for(user)
+        self.citizen = CitizenProfile.objects.create(
+            user=self.make_user('citizen@example.com'), full_name='Citizen', nid_number_hash='hash',
+            date_of_birth=date(1990, 1, 1), residency_district='Dhaka'
+        )
+        # Cached metrics outlive each test's rolled-back rows
+        for organization in (self.organization, self.other):
+            dashboard.forget_dashboard_metrics(organization.id)
+
+    def verify(self, organization=None, status='SUCCESS', days_ago=0):
+        with self.captureOnCommitCallbacks(execute=True):
+            entry = VerificationHistory.objects.create(
+                organization=organization or self.organization, citizen=self.citizen, status=status
+            )
+        if days_ago:
+            VerificationHistory.objects.filter(pk=entry.pk).update(verified_at=timezone.now() - timedelta(days=days_ago))
+        return entry
+
+    def metrics(self):
+        response = self.client.get('/api/v1/organizations/dashboard')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['metrics']
+
+    def test_counts_verifications_by_window(self):
+        self.verify()
+        self.verify(status='FAILED')
+        self.verify(days_ago=10)
+        self.verify(days_ago=40)
+        self.verify(organization=self.other)
+
+        verifications = self.metrics()['verifications']
+        self.assertEqual(verifications['today'], {'total': 2, 'success': 1, 'failed': 1, 'distinct_citizens': 1})
+        self.assertEqual(verifications['last_7_days']['total'], 2)
+        self.assertEqual(verifications['last_30_days']['total'], 3)
+        self.assertEqual(verifications['all_time']['success'], 3)
+
+    def test_approval_after_login_is_reported(self):
+        self.organization.approval_status = 'PENDING'
+        self.organization.save()
+        # The token was issued while the organization was approved
+        response = self.client.get('/api/v1/organizations/dashboard')
+        self.assertFalse(response.json()['is_approved'])
+        self.assertEqual(response.json()['organization']['approval_status'], 'PENDING')
+
+    def test_metrics_are_cached_between_requests(self):
+        first = self.metrics()
+        with mock.patch.object(dashboard, 'compute_dashboard_metrics') as compute:
+            self.assertEqual(self.metrics(), first)
+        compute.assert_not_called()
+
+    def test_verification_invalidates_its_organization_only(self):
+        self.assertEqual(self.metrics()['verifications']['today']['total'], 0)
+        self.verify(organization=self.other)
+        self.assertEqual(self.metrics()['verifications']['today']['total'], 0)
+        self.verify()
+        self.assertEqual(self.metrics()['verifications']['today']['total'], 1)
+
+    def test_consent_change_invalidates_metrics(self):
+        self.assertEqual(self.metrics()['active_consents'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            grant = ConsentGrant.objects.create(citizen=self.citizen, organization=self.organization, scopes=['name'])
+        self.assertEqual(self.metrics()['active_consents'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            grant.is_active = False
+            grant.save()
+        self.assertEqual(self.metrics()['active_consents'], 0)
@@ -9,4 +9,5 @@ urlpatterns = [
     path('<int:org_id>/approve', views.approve_organization, name='approve-organization'),
     path('<int:org_id>/users', views.list_org_users, name='list-org-users'),
     path('<int:org_id>/users/add', views.add_org_user, name='add-org-user'),
+    path('<int:org_id>/users/bulk', views.bulk_add_org_users, name='bulk-add-org-users'),
 ]
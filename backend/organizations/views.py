@@ -1,7 +1,13 @@
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, parser_classes
+from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
+from .dashboard import get_dashboard_metrics
+from .directory import get_directory
 from .models import Organization, OrgUser
 from .serializers import OrganizationSerializer, OrgUserSerializer
 
@@ -39,13 +45,29 @@ def create_organization(request):
 @permission_classes([IsAuthenticated])
 def list_organizations(request):
     """
-    List all active organizations.
+    List all active organizations, optionally filtered by name.
+    Served from a pre-serialized copy; send If-None-Match or
+    If-Modified-Since to get 304 Not Modified when nothing changed.
     
     GET /api/v1/organizations
+    GET /api/v1/organizations?search=bank
     """
-    organizations = Organization.objects.filter(is_active=True)
-    serializer = OrganizationSerializer(organizations, many=True)
-    return Response(serializer.data)
+    snapshot = get_directory().snapshot()
+    search = request.query_params.get('search', '').strip()
+    if search:
+        body, etag = snapshot.search(search)
+    else:
+        body, etag = snapshot.body, snapshot.etag
+    last_modified = int(snapshot.last_modified.timestamp()) if snapshot.last_modified else None
+    
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
 
 @api_view(['GET'])
@@ -111,6 +133,71 @@ def add_org_user(request, org_id):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser, FormParser])
+def bulk_add_org_users(request, org_id):
+    """
+    Create organization staff accounts from a CSV (admin only).
+    
+    Columns: email (required), role (VERIFIER or ADMIN, default
+    VERIFIER), phone, password. Users without a password are emailed a
+    link to choose one. Invalid rows are skipped and reported per row;
+    ?dry_run=true only validates.
+    
+    POST /api/v1/organizations/{id}/users/bulk
+    Form Data:
+      file: <staff.csv>
+    """
+    from .provisioning import ProvisioningError, provision_org_users
+    
+    if request.user.role != 'ADMIN':
+        return Response({
+            'error': {
+                'code': 'PERMISSION_DENIED',
+                'message': 'Only admins can add organization users'
+            }
+        }, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        organization = Organization.objects.get(id=org_id)
+    except Organization.DoesNotExist:
+        return Response({
+            'error': {
+                'code': 'NOT_FOUND',
+                'message': 'Organization not found'
+            }
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    file_obj = request.FILES.get('file')
+    if not file_obj:
+        return Response({
+            'error': {
+                'code': 'VALIDATION_ERROR',
+                'message': 'No file provided',
+                'field': 'file'
+            }
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    dry_run = request.query_params.get('dry_run', '').lower() in ('1', 'true', 'yes')
+    try:
+        summary, results = provision_org_users(organization, file_obj.read(), dry_run=dry_run)
+    except ProvisioningError as e:
+        return Response({
+            'error': {
+                'code': 'INVALID_CSV',
+                'message': str(e),
+                'field': 'file'
+            }
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    created = summary['created'] > 0
+    return Response({
+        'summary': summary,
+        'results': results
+    }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def list_org_users(request, org_id):
@@ -129,7 +216,7 @@ def list_org_users(request, org_id):
             }
         }, status=status.HTTP_404_NOT_FOUND)
     
-    users = OrgUser.objects.filter(organization=organization)
+    users = OrgUser.objects.filter(organization=organization).select_related('user', 'organization')
     serializer = OrgUserSerializer(users, many=True)
     return Response(serializer.data)
 
@@ -205,7 +292,9 @@ def register_organization(request):
 @permission_classes([IsAuthenticated])
 def get_org_dashboard(request):
     """
-    Get organization dashboard data.
+    Get organization dashboard data, including verification counts
+    (today, 7 and 30 days, all time), distinct citizens verified and
+    active consents. Metrics are cached for ORG_DASHBOARD_CACHE_TTL seconds.
     
     GET /api/v1/organizations/dashboard
     """
@@ -214,19 +303,25 @@ def get_org_dashboard(request):
             'error': 'Only organization users can access this endpoint'
         }, status=status.HTTP_403_FORBIDDEN)
     
-    try:
-        org_user = request.user.org_user
-        organization = org_user.organization
-        
-        return Response({
-            'organization': OrganizationSerializer(organization).data,
-            'user_role': org_user.role,
-            'is_approved': organization.approval_status == 'APPROVED'
-        })
-    except OrgUser.DoesNotExist:
+    # Membership comes from the token's claims; approval is read from the
+    # organization row below, since an admin may have changed it since
+    org_id = request.user.org_id
+    org_user = (
+        OrgUser.objects.select_related('organization')
+        .filter(user_id=request.user.id, organization_id=org_id)
+        .first()
+    ) if org_id is not None else None
+    if org_user is None:
         return Response({
             'error': 'Organization profile not found'
         }, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response({
+        'organization': OrganizationSerializer(org_user.organization).data,
+        'user_role': org_user.role,
+        'is_approved': org_user.organization.approval_status == 'APPROVED',
+        'metrics': get_dashboard_metrics(org_id)
+    })
 
 
 @api_view(['POST'])
@@ -261,6 +356,10 @@ def approve_organization(request, org_id):
     organization.approval_status = new_status
     organization.save()
     
+    # The approval state is embedded in the org users' tokens
+    from accounts.tokens import bump_token_version
+    bump_token_version(organization.users.values_list('user_id', flat=True))
+    
     return Response({
         'message': f'Organization {new_status.lower()}',
         'organization': OrganizationSerializer(organization).data
@@ -0,0 +1,123 @@
+from datetime import timedelta
+from functools import partial
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from uploads.models import UploadAsset
+from uploads.thumbnails import forget_thumbnails
+from uploads.utils import get_orphaned_uploads, delete_remote_assets
+
+
+def reclaimed_bytes(asset):
+    """Bytes freed by deleting an upload, including its kept original."""
+    if asset.original_public_id:
+        return asset.bytes + (asset.original_bytes or 0)
+    return asset.bytes
+
+
+class Command(BaseCommand):
+    """
+    Delete uploads that no enrollment document references.
+
+    Works through orphans in primary-key order, one batch at a time, so an
+    interrupted run can be resumed with --start-id (or simply re-run, since
+    already-deleted rows are no longer candidates).
+
+    Each batch is locked, re-checked against the anti-join and deleted in
+    one transaction; the Cloudinary files and cached thumbnails go only
+    after it commits. An
+    upload a document is being attached to is therefore either skipped or
+    makes that document's insert fail, never left without its file. Files
+    that could not be deleted remotely are reported for manual cleanup.
+    """
+
+    help = 'Garbage-collect orphaned UploadAsset rows and their Cloudinary files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-days',
+            type=int,
+            default=settings.UPLOAD_GC_GRACE_DAYS,
+            help='Only collect uploads older than this many days'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of uploads deleted per batch'
+        )
+        parser.add_argument(
+            '--start-id',
+            type=int,
+            default=0,
+            help='Resume after this upload ID'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report reclaimable uploads and bytes without deleting anything'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['grace_days'])
+        orphans = get_orphaned_uploads(cutoff).filter(id__gt=options['start_id'])
+
+        if options['dry_run']:
+            totals = orphans.order_by().aggregate(
+                count=Count('id'),
+                total_bytes=Sum('bytes'),
+                original_bytes=Sum('original_bytes', filter=Q(original_public_id__isnull=False))
+            )
+            total_bytes = (totals['total_bytes'] or 0) + (totals['original_bytes'] or 0)
+            self.stdout.write(
+                f"{totals['count']} orphaned uploads older than {timezone.localtime(cutoff):%Y-%m-%d %H:%M}, "
+                f"{round(total_bytes / (1024 * 1024), 2)} MB reclaimable"
+            )
+            return
+
+        last_id = options['start_id']
+        deleted_count = 0
+        deleted_bytes = 0
+
+        while True:
+            with transaction.atomic():
+                candidates = orphans.filter(id__gt=last_id).order_by('id')
+                if connection.features.has_select_for_update_skip_locked:
+                    # Rows locked by a document insert referencing them are skipped
+                    candidates = candidates.select_for_update(skip_locked=True)
+                batch = list(candidates.only(
+                    'id', 'public_id', 'resource_type', 'original_public_id', 'bytes', 'original_bytes'
+                )[:options['batch_size']])
+                if not batch:
+                    break
+                UploadAsset.objects.filter(id__in=[asset.id for asset in batch]).delete()
+                # Cached thumbnails would otherwise stay servable
+                transaction.on_commit(partial(forget_thumbnails, [asset.id for asset in batch]))
+
+            last_id = batch[-1].id
+            deleted_count += len(batch)
+            deleted_bytes += sum(reclaimed_bytes(asset) for asset in batch)
+
+            public_ids = [asset.public_id for asset in batch] + [
+                asset.original_public_id for asset in batch if asset.original_public_id
+            ]
+            try:
+                removed = delete_remote_assets(batch)
+            except Exception as e:
+                self.stderr.write(
+                    f"Remote delete failed: {str(e)}. Resume with --start-id {last_id}; "
+                    f"delete these files by hand: {', '.join(public_ids)}"
+                )
+                raise
+
+            left = [public_id for public_id in public_ids if public_id not in removed]
+            if left:
+                self.stderr.write(f"Cloudinary did not delete: {', '.join(left)}")
+            self.stdout.write(f"Deleted {len(batch)} uploads (through ID {last_id})")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted_count} orphaned uploads, "
+            f"reclaimed {round(deleted_bytes / (1024 * 1024), 2)} MB"
+        ))
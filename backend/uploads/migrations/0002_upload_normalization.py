@@ -0,0 +1,32 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("uploads", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uploadasset",
+            name="original_bytes",
+            field=models.IntegerField(
+                blank=True,
+                help_text="Size of the file as uploaded, before normalization",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="uploadasset",
+            name="original_public_id",
+            field=models.CharField(
+                blank=True,
+                help_text="Cloudinary ID of the kept original, if any",
+                max_length=255,
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("uploads", "0002_upload_normalization"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="uploadasset",
+            index=models.Index(fields=["created_at"], name="upload_assets_created_idx"),
+        ),
+    ]
@@ -25,6 +25,17 @@ class UploadAsset(models.Model):
     format = models.CharField(max_length=10)
     bytes = models.IntegerField(help_text="File size in bytes")
     checksum = models.CharField(max_length=64, null=True, blank=True)
+    original_bytes = models.IntegerField(
+        null=True,
+        blank=True,
+        help_text="Size of the file as uploaded, before normalization"
+    )
+    original_public_id = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        help_text="Cloudinary ID of the kept original, if any"
+    )
     
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -33,6 +44,9 @@ class UploadAsset(models.Model):
         verbose_name = 'Upload Asset'
         verbose_name_plural = 'Upload Assets'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='upload_assets_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.public_id} ({self.format})"
@@ -41,3 +55,10 @@ class UploadAsset(models.Model):
     def size_mb(self):
         """Get file size in MB."""
         return round(self.bytes / (1024 * 1024), 2)
+
+    @property
+    def bytes_saved(self):
+        """Bytes saved by server-side normalization."""
+        if self.original_bytes is None:
+            return 0
+        return max(self.original_bytes - self.bytes, 0)
@@ -0,0 +1,118 @@
+import io
+import atexit
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from PIL import Image, ImageOps
+from config.pools import process_pool_context
+
+logger = logging.getLogger(__name__)
+
+NORMALIZABLE_CONTENT_TYPES = ['image/jpeg', 'image/png', 'image/webp']
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Lazily create the shared process pool used for image work.
+    Workers come from a fork server (see config.pools), so creating the
+    pool from a request thread is safe.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=settings.IMAGE_PROCESS_POOL_WORKERS,
+                    mp_context=process_pool_context()
+                )
+                atexit.register(_executor.shutdown, wait=False)
+    return _executor
+
+
+def _has_metadata(image):
+    """Whether an image carries EXIF (incl. orientation/GPS), ICC, XMP, comments or PNG text."""
+    return (
+        bool(image.getexif())
+        or any(key in image.info for key in ('icc_profile', 'xmp', 'XML:com.adobe.xmp', 'comment'))
+        or bool(getattr(image, 'text', None))
+    )
+
+
+def normalize_image(data, max_dimension, output_format, quality):
+    """
+    Auto-orient, strip metadata, downsize and re-encode an image.
+    Runs inside a worker process, so it only takes and returns plain bytes.
+
+    Returns (normalized_bytes, format, width, height), or None when the
+    image has no metadata, needs no downsizing and re-encoding wouldn't
+    make it smaller - the original is then the better file to keep.
+    """
+    image = Image.open(io.BytesIO(data))
+    has_metadata = _has_metadata(image)
+    original_size = image.size
+    # Let the JPEG decoder scale down while decoding instead of afterwards
+    image.draft('RGB', (max_dimension, max_dimension))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+
+    if output_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    # A fresh save without exif/icc arguments drops all original metadata
+    output = io.BytesIO()
+    image.save(output, format=output_format, quality=quality, optimize=True)
+    normalized = output.getvalue()
+    if not has_metadata and image.size == original_size and len(normalized) >= len(data):
+        return None
+    return normalized, output_format.lower(), image.width, image.height
+
+
+def should_normalize(file_obj):
+    """Check whether an uploaded file is an image we normalize."""
+    return (
+        settings.IMAGE_NORMALIZATION_ENABLED
+        and getattr(file_obj, 'content_type', None) in NORMALIZABLE_CONTENT_TYPES
+    )
+
+
+def normalize_upload(file_obj):
+    """
+    Normalize an uploaded image in the process pool.
+
+    Returns (normalized_bytes, format) or None if the file could not be
+    processed or is best kept as it is, in which case the caller should
+    upload the original.
+    """
+    file_obj.seek(0)
+    data = file_obj.read()
+    file_obj.seek(0)
+
+    future = get_executor().submit(
+        normalize_image,
+        data,
+        settings.IMAGE_MAX_DIMENSION,
+        settings.IMAGE_OUTPUT_FORMAT,
+        settings.IMAGE_OUTPUT_QUALITY,
+    )
+    try:
+        result = future.result(timeout=settings.IMAGE_PROCESSING_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Image normalization failed for {file_obj.name}: {str(e)}")
+        return None
+
+    if result is None:
+        logger.info(f"Kept original {file_obj.name}: re-encoding would not shrink it")
+        return None
+    normalized, fmt, width, height = result
+
+    logger.info(
+        f"Normalized {file_obj.name}: {len(data)} -> {len(normalized)} bytes ({width}x{height})"
+    )
+    return normalized, fmt
+
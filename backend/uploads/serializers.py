@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import UploadAsset
+from .utils import get_allowed_presets
 
 
 class UploadAssetSerializer(serializers.ModelSerializer):
@@ -9,9 +10,13 @@ class UploadAssetSerializer(serializers.ModelSerializer):
         model = UploadAsset
         fields = [
             'id', 'user', 'public_id', 'secure_url', 'resource_type',
-            'format', 'bytes', 'checksum', 'created_at', 'size_mb'
+            'format', 'bytes', 'checksum', 'original_bytes', 'original_public_id',
+            'bytes_saved', 'created_at', 'size_mb'
+        ]
+        read_only_fields = [
+            'id', 'user', 'original_bytes', 'original_public_id',
+            'bytes_saved', 'created_at', 'size_mb'
         ]
-        read_only_fields = ['id', 'user', 'created_at', 'size_mb']
 
 
 class CloudinarySignatureRequestSerializer(serializers.Serializer):
@@ -19,3 +24,18 @@ class CloudinarySignatureRequestSerializer(serializers.Serializer):
     
     upload_preset = serializers.CharField(max_length=100)
     folder = serializers.CharField(max_length=200, required=False)
+
+    def validate_upload_preset(self, value):
+        """Only allow the presets configured for this deployment."""
+        if value not in get_allowed_presets():
+            raise serializers.ValidationError(f"Invalid upload preset: {value}")
+        return value
+
+
+class UploadConfirmSerializer(serializers.Serializer):
+    """Serializer for confirming a direct Cloudinary upload."""
+    
+    public_id = serializers.CharField(max_length=255)
+    version = serializers.IntegerField()
+    signature = serializers.CharField(max_length=128)
+    resource_type = serializers.ChoiceField(choices=['image', 'video', 'raw'], required=False)
@@ -1,3 +1,348 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+import cloudinary
+import cloudinary.api
+import cloudinary.utils
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from accounts.models import User
+from identity.models import CitizenProfile, EnrollmentCase, EnrollmentDocument
+from .models import UploadAsset
+from .processing import get_executor, normalize_upload
+from . import thumbnails
+from .utils import generate_upload_signature, resolve_upload_folder, store_upload
 
-# Create your tests here.
+TEST_CLOUDINARY = {'cloud_name': 'test-cloud', 'api_key': 'test-key', 'api_secret': 'test-secret'}
+
+
+class CloudinaryTestCase(TestCase):
+    """Runs with known Cloudinary credentials so signatures can be checked."""
+
+    def setUp(self):
+        config = cloudinary.config()
+        saved = {name: getattr(config, name) for name in TEST_CLOUDINARY}
+        cloudinary.config(**TEST_CLOUDINARY)
+        self.addCleanup(lambda: cloudinary.config(**saved))
+
+        self.user = User.objects.create_user(email='citizen@example.com', password='Pass12345!x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sign_result(self, public_id, version):
+        """The signature Cloudinary returns with an upload result."""
+        return cloudinary.utils.api_sign_request(
+            {'public_id': public_id, 'version': version}, TEST_CLOUDINARY['api_secret']
+        )
+
+
+class UploadSignatureTests(CloudinaryTestCase):
+
+    def test_folder_is_confined_to_user(self):
+        root = f'user_{self.user.id}'
+        self.assertEqual(resolve_upload_folder(self.user), root)
+        self.assertEqual(resolve_upload_folder(self.user, 'enrollments'), f'{root}/enrollments')
+        self.assertEqual(resolve_upload_folder(self.user, '../user_999999/x'), f'{root}/user_999999/x')
+        self.assertEqual(resolve_upload_folder(self.user, f'{root}/docs'), f'{root}/docs')
+
+    def test_signature_covers_preset_and_folder(self):
+        params = generate_upload_signature(self.user, 'nid_documents', 'enrollments')
+        signed = {key: params[key] for key in ('timestamp', 'upload_preset', 'folder')}
+        self.assertEqual(params['signature'], cloudinary.utils.api_sign_request(signed, 'test-secret'))
+        self.assertEqual(params['folder'], f'user_{self.user.id}/enrollments')
+        self.assertNotIn('api_secret', params)
+
+    def test_unknown_preset_is_rejected(self):
+        response = self.client.post('/api/v1/uploads/signature', {'upload_preset': 'unsigned'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ConfirmUploadTests(CloudinaryTestCase):
+
+    def resource(self, public_id, resource_type='image'):
+        return {
+            'public_id': public_id,
+            'secure_url': f'https://res.cloudinary.com/test-cloud/{resource_type}/upload/{public_id}',
+            'resource_type': resource_type,
+            'format': 'mp4' if resource_type == 'video' else 'jpg',
+            'bytes': 1234,
+            'etag': 'abc',
+        }
+
+    def confirm(self, public_id, version=1700000000, signature=None, **extra):
+        return self.client.post('/api/v1/uploads/register', {
+            'public_id': public_id,
+            'version': version,
+            'signature': signature or self.sign_result(public_id, version),
+            **extra
+        }, format='json')
+
+    def test_confirm_registers_asset(self):
+        public_id = f'user_{self.user.id}/enrollments/abc'
+        with mock.patch.object(cloudinary.api, 'resource', return_value=self.resource(public_id)) as lookup:
+            response = self.confirm(public_id)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(lookup.call_args.kwargs['resource_type'], 'image')
+        self.assertTrue(UploadAsset.objects.filter(public_id=public_id, user=self.user).exists())
+
+        # Confirming again returns the existing asset
+        response = self.confirm(public_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(UploadAsset.objects.count(), 1)
+
+    def test_confirm_uses_resource_type_from_result(self):
+        public_id = f'user_{self.user.id}/enrollments/clip'
+        with mock.patch.object(cloudinary.api, 'resource', return_value=self.resource(public_id, 'video')) as lookup:
+            response = self.confirm(public_id, resource_type='video')
+        self.assertEqual(response.status_code, 201)
+        lookup.assert_called_once_with(public_id, resource_type='video')
+        self.assertEqual(response.json()['resource_type'], 'video')
+
+    def test_confirm_without_resource_type_finds_video(self):
+        public_id = f'user_{self.user.id}/enrollments/clip'
+
+        def lookup(public_id, resource_type):
+            if resource_type != 'video':
+                raise cloudinary.api.NotFound('not found')
+            return self.resource(public_id, 'video')
+
+        with mock.patch.object(cloudinary.api, 'resource', side_effect=lookup):
+            response = self.confirm(public_id)
+        self.assertEqual(response.status_code, 201)
+
+    def test_bad_signature_is_rejected(self):
+        public_id = f'user_{self.user.id}/enrollments/abc'
+        with mock.patch.object(cloudinary.api, 'resource') as lookup:
+            response = self.confirm(public_id, signature='forged')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error']['code'], 'INVALID_SIGNATURE')
+        lookup.assert_not_called()
+
+    def test_other_users_folder_is_rejected(self):
+        public_id = f'user_{self.user.id + 1}/enrollments/abc'
+        with mock.patch.object(cloudinary.api, 'resource') as lookup:
+            response = self.confirm(public_id)
+        self.assertEqual(response.status_code, 400)
+        lookup.assert_not_called()
+
+
+class NormalizeUploadTests(TestCase):
+
+    def make_png(self, width, height):
+        output = io.BytesIO()
+        Image.new('RGB', (width, height), 'red').save(output, format='PNG')
+        return SimpleUploadedFile('scan.png', output.getvalue(), content_type='image/png')
+
+    @override_settings(IMAGE_MAX_DIMENSION=512, IMAGE_OUTPUT_FORMAT='WEBP')
+    def test_image_is_downsized_and_reencoded_in_pool(self):
+        upload = self.make_png(2000, 1000)
+        normalized, fmt = normalize_upload(upload)
+        self.assertEqual(fmt, 'webp')
+        image = Image.open(io.BytesIO(normalized))
+        self.assertEqual(image.size, (512, 256))
+        # The original is left readable for the caller
+        self.assertEqual(upload.tell(), 0)
+
+    def test_pool_workers_are_not_forked(self):
+        self.assertNotEqual(get_executor()._mp_context.get_start_method(), 'fork')
+
+    def make_small_jpeg(self, exif=None):
+        # Noise saved at low quality: re-encoding at high quality only grows it
+        image = Image.effect_noise((256, 256), 64).convert('RGB')
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=20, **({'exif': exif} if exif else {}))
+        return SimpleUploadedFile('scan.jpg', output.getvalue(), content_type='image/jpeg')
+
+    @override_settings(IMAGE_OUTPUT_FORMAT='JPEG', IMAGE_OUTPUT_QUALITY=95)
+    def test_clean_image_is_kept_when_reencoding_grows_it(self):
+        upload = self.make_small_jpeg()
+        self.assertIsNone(normalize_upload(upload))
+
+        with mock.patch('cloudinary.uploader.upload', return_value={'public_id': 'scan'}) as store:
+            fields = store_upload(upload, 'user_1/enrollments')
+        self.assertIs(store.call_args.args[0], upload)
+        self.assertIsNone(fields['original_bytes'])
+
+    @override_settings(IMAGE_OUTPUT_FORMAT='JPEG', IMAGE_OUTPUT_QUALITY=95)
+    def test_metadata_is_stripped_even_when_reencoding_grows_it(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera maker'
+        upload = self.make_small_jpeg(exif=exif.tobytes())
+        normalized, fmt = normalize_upload(upload)
+        self.assertEqual(fmt, 'jpeg')
+        self.assertFalse(Image.open(io.BytesIO(normalized)).getexif())
+
+    def test_corrupt_image_falls_back_to_original(self):
+        upload = SimpleUploadedFile('scan.png', b'not an image', content_type='image/png')
+        self.assertIsNone(normalize_upload(upload))
+
+
+def use_temp_thumbnail_cache(test, max_bytes=1024 * 1024):
+    """Give a test a thumbnail cache of its own in an empty directory."""
+    cache_dir = tempfile.TemporaryDirectory()
+    test.addCleanup(cache_dir.cleanup)
+    cache = thumbnails.ThumbnailCache(cache_dir.name, max_bytes)
+    patcher = mock.patch.object(thumbnails, '_cache', cache)
+    patcher.start()
+    test.addCleanup(patcher.stop)
+    return cache
+
+
+class ThumbnailCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = use_temp_thumbnail_cache(self, max_bytes=25)
+
+    def files(self):
+        return sorted(name for name in os.listdir(self.cache.root) if not name.startswith('.'))
+
+    def assertConsistent(self):
+        on_disk = sum(os.path.getsize(os.path.join(self.cache.root, name)) for name in self.files())
+        self.assertEqual(self.cache._total_bytes, on_disk)
+        self.assertEqual(sorted(self.cache._entries), self.files())
+
+    def test_least_recently_used_entries_are_evicted(self):
+        self.cache.set('a', b'x' * 10)
+        self.cache.set('b', b'x' * 10)
+        self.cache.set('c', b'x' * 10)
+        self.assertEqual(self.files(), ['b', 'c'])
+        self.assertConsistent()
+
+        # Reading b makes c the oldest
+        self.assertEqual(self.cache.get('b'), b'x' * 10)
+        self.cache.set('d', b'x' * 10)
+        self.assertEqual(self.files(), ['b', 'd'])
+        self.assertConsistent()
+
+    def test_replacing_an_entry_counts_its_new_size(self):
+        self.cache.set('a', b'x' * 10)
+        self.cache.set('a', b'x' * 20)
+        self.assertEqual(self.cache._total_bytes, 20)
+        self.cache.set('b', b'x' * 10)
+        self.assertEqual(self.files(), ['b'])
+        self.assertConsistent()
+
+    def test_index_is_rebuilt_from_disk_oldest_first(self):
+        self.cache.set('a', b'x' * 10)
+        self.cache.set('b', b'x' * 10)
+        os.utime(os.path.join(self.cache.root, 'b'), (1, 1))
+
+        restarted = thumbnails.ThumbnailCache(self.cache.root, 25)
+        restarted.set('c', b'x' * 10)
+        self.assertEqual(self.files(), ['a', 'c'])
+
+    def test_deleted_entry_is_gone(self):
+        self.cache.set('a', b'x' * 10)
+        self.cache.delete('a')
+        self.cache.delete('missing')
+        self.assertIsNone(self.cache.get('a'))
+        self.assertConsistent()
+
+
+class ThumbnailTests(CloudinaryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        use_temp_thumbnail_cache(self)
+
+        self.upload = UploadAsset.objects.create(
+            user=self.user, public_id=f'user_{self.user.id}/doc', secure_url='https://example.com/doc.pdf',
+            resource_type='image', format='pdf', bytes=1000
+        )
+
+    def test_cloudinary_derivative_is_cached_as_is(self):
+        fetched = mock.Mock(content=b'jpeg-bytes')
+        with mock.patch.object(thumbnails.requests, 'get', return_value=fetched) as fetch:
+            self.assertEqual(thumbnails.get_thumbnail(self.upload, 'small'), b'jpeg-bytes')
+            self.assertEqual(thumbnails.get_thumbnail(self.upload, 'small'), b'jpeg-bytes')
+
+        fetch.assert_called_once()
+        url = fetch.call_args.args[0]
+        self.assertIn('c_limit', url)
+        self.assertIn('w_256', url)
+        self.assertIn('pg_1', url)
+        self.assertTrue(url.endswith('.jpg'))
+
+
+class GarbageCollectUploadsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='citizen@example.com', password='Pass12345!x')
+        old = timezone.now() - timedelta(days=30)
+        self.orphan = self.make_upload('orphan', old, original=('orphan-original', 5000))
+        self.referenced = self.make_upload('referenced', old)
+        self.recent = self.make_upload('recent', timezone.now())
+
+        citizen = CitizenProfile.objects.create(
+            user=self.user, full_name='Citizen', nid_number_hash='hash',
+            date_of_birth=date(1990, 1, 1), residency_district='Dhaka'
+        )
+        case = EnrollmentCase.objects.create(citizen=citizen)
+        EnrollmentDocument.objects.create(case=case, document_type='NID_FRONT', upload_asset=self.referenced)
+
+    def make_upload(self, name, created_at, original=None):
+        upload = UploadAsset.objects.create(
+            user=self.user, public_id=f'user_{self.user.id}/{name}', secure_url=f'https://example.com/{name}',
+            resource_type='image', format='webp', bytes=1000,
+            original_public_id=original[0] if original else None,
+            original_bytes=original[1] if original else None
+        )
+        UploadAsset.objects.filter(pk=upload.pk).update(created_at=created_at)
+        return upload
+
+    def gc(self, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('gc_uploads', *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_dry_run_counts_kept_originals(self):
+        with mock.patch('cloudinary.api.delete_resources') as delete:
+            stdout, _ = self.gc('--dry-run')
+        self.assertIn('1 orphaned uploads', stdout)
+        self.assertIn(f'{round(6000 / (1024 * 1024), 2)} MB', stdout)
+        delete.assert_not_called()
+        self.assertEqual(UploadAsset.objects.count(), 3)
+
+    def test_only_old_orphans_are_deleted(self):
+        def delete(public_ids, resource_type):
+            # Rows are gone before any file is destroyed
+            self.assertFalse(UploadAsset.objects.filter(public_id__in=public_ids).exists())
+            return {'deleted': {public_id: 'deleted' for public_id in public_ids}}
+
+        with mock.patch('cloudinary.api.delete_resources', side_effect=delete) as remote:
+            stdout, stderr = self.gc()
+
+        remote.assert_called_once()
+        self.assertEqual(
+            sorted(remote.call_args.args[0]),
+            ['orphan-original', f'user_{self.user.id}/orphan']
+        )
+        self.assertEqual(
+            set(UploadAsset.objects.values_list('pk', flat=True)),
+            {self.referenced.pk, self.recent.pk}
+        )
+        self.assertEqual(stderr, '')
+
+    def test_deleted_uploads_lose_their_thumbnails(self):
+        cache = use_temp_thumbnail_cache(self)
+        for upload in (self.orphan, self.referenced):
+            cache.set(thumbnails.thumbnail_key(upload.id, 'small'), b'jpeg-bytes')
+
+        with mock.patch('cloudinary.api.delete_resources', return_value={'deleted': {}}), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.gc()
+        self.assertIsNone(cache.get(thumbnails.thumbnail_key(self.orphan.id, 'small')))
+        self.assertEqual(cache.get(thumbnails.thumbnail_key(self.referenced.id, 'small')), b'jpeg-bytes')
+
+    def test_failed_remote_delete_is_reported(self):
+        with mock.patch('cloudinary.api.delete_resources', return_value={'deleted': {}}):
+            _, stderr = self.gc()
+        self.assertIn(f'user_{self.user.id}/orphan', stderr)
+        self.assertFalse(UploadAsset.objects.filter(pk=self.orphan.pk).exists())
@@ -0,0 +1,174 @@
+import os
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+import cloudinary.utils
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_QUALITY = 80
+
+
+class ThumbnailCache:
+    """
+    On-disk thumbnail cache with size-bounded LRU eviction.
+
+    Recency is tracked in memory and mirrored to file mtimes, so the order
+    survives restarts and is shared (approximately) between worker processes.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = str(root)
+        self.max_bytes = max_bytes
+        self._entries = None
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Build the LRU index from the files already on disk."""
+        os.makedirs(self.root, exist_ok=True)
+        entries = []
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.startswith('.'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name, stat.st_size))
+        entries.sort()
+        self._entries = OrderedDict((name, size) for _, name, size in entries)
+        self._total_bytes = sum(self._entries.values())
+
+    def _ensure_loaded(self):
+        if self._entries is None:
+            self._load()
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def get(self, key):
+        """Return the cached bytes for key, or None on a miss."""
+        with self._lock:
+            self._ensure_loaded()
+            path = self._path(key)
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                os.utime(path)
+            except FileNotFoundError:
+                # Evicted by another worker
+                if key in self._entries:
+                    self._total_bytes -= self._entries.pop(key)
+                return None
+
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            else:
+                self._entries[key] = len(data)
+                self._total_bytes += len(data)
+            return data
+
+    def set(self, key, data):
+        """Store data under key, evicting least recently used entries."""
+        with self._lock:
+            self._ensure_loaded()
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.tmp-')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def delete(self, key):
+        """Remove key from the cache, if present."""
+        with self._lock:
+            self._ensure_loaded()
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+
+_cache = None
+
+
+def get_thumbnail_cache():
+    """Return the process-wide thumbnail cache."""
+    global _cache
+    if _cache is None:
+        _cache = ThumbnailCache(
+            settings.THUMBNAIL_CACHE_DIR,
+            settings.THUMBNAIL_CACHE_MAX_MB * 1024 * 1024
+        )
+    return _cache
+
+
+def thumbnail_key(upload_id, size_name):
+    return f'{upload_id}_{size_name}.jpg'
+
+
+def forget_thumbnails(upload_ids):
+    """Delete the cached thumbnails of uploads, in every size."""
+    cache = get_thumbnail_cache()
+    for upload_id in upload_ids:
+        for size_name in settings.THUMBNAIL_SIZES:
+            cache.delete(thumbnail_key(upload_id, size_name))
+
+
+def get_source_url(upload, size):
+    """
+    URL of the finished thumbnail.
+    Cloudinary renders it: images are shrunk to fit a size x size box and
+    PDFs are rendered from their first page, as a metadata-free JPEG, so
+    we never download the full-size original or resize it again.
+    """
+    options = {
+        'width': size,
+        'height': size,
+        'crop': 'limit',
+        'format': 'jpg',
+        'quality': THUMBNAIL_QUALITY,
+        'resource_type': 'image',
+        'secure': True,
+    }
+    if upload.format == 'pdf':
+        options['page'] = 1
+    url, _ = cloudinary.utils.cloudinary_url(upload.public_id, **options)
+    return url
+
+
+def get_thumbnail(upload, size_name):
+    """
+    Return JPEG thumbnail bytes for an upload, generating it on first request.
+    """
+    size = settings.THUMBNAIL_SIZES[size_name]
+    key = thumbnail_key(upload.id, size_name)
+    cache = get_thumbnail_cache()
+
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    response = requests.get(get_source_url(upload, size), timeout=settings.THUMBNAIL_FETCH_TIMEOUT)
+    response.raise_for_status()
+
+    data = response.content
+    cache.set(key, data)
+    logger.info(f"Generated {size_name} thumbnail for upload {upload.id} ({len(data)} bytes)")
+    return data
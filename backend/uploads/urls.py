@@ -3,6 +3,9 @@ from . import views
 
 urlpatterns = [
     path('upload', views.handle_file_upload, name='upload-file'),
+    path('signature', views.get_upload_signature, name='upload-signature'),
+    path('register', views.confirm_upload, name='confirm-upload'),
     path('', views.list_uploads, name='list-uploads'),
     path('<int:upload_id>', views.get_upload, name='get-upload'),
+    path('<int:upload_id>/thumbnail', views.get_upload_thumbnail, name='upload-thumbnail'),
 ]
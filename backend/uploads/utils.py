@@ -0,0 +1,179 @@
+import io
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cloudinary
+import cloudinary.api
+import cloudinary.uploader
+import cloudinary.utils
+from django.conf import settings
+from .processing import should_normalize, normalize_upload
+
+_upload_executor = None
+_upload_executor_lock = threading.Lock()
+
+
+def get_allowed_presets():
+    """Upload presets that clients may request signatures for."""
+    return [
+        settings.CLOUDINARY_UPLOAD_PRESET_DOCUMENTS,
+        settings.CLOUDINARY_UPLOAD_PRESET_SELFIE,
+    ]
+
+
+def get_user_folder(user):
+    """Root Cloudinary folder that a user's uploads are confined to."""
+    return f'user_{user.id}'
+
+
+def resolve_upload_folder(user, folder=None):
+    """
+    Resolve the folder a signed upload will land in.
+    Client-supplied folders are always nested under the user's own folder
+    so one user can never write into another user's namespace.
+    """
+    root = get_user_folder(user)
+    if not folder:
+        return root
+    parts = [part for part in folder.strip('/').split('/') if part and part not in ('.', '..')]
+    if parts and parts[0] == root:
+        parts = parts[1:]
+    return '/'.join([root] + parts)
+
+
+def generate_upload_signature(user, upload_preset, folder=None):
+    """
+    Sign parameters for a direct browser-to-Cloudinary upload.
+    Only the signed parameters can be used, so the preset and folder are
+    fixed by the server.
+    """
+    config = cloudinary.config()
+    params = {
+        'timestamp': int(time.time()),
+        'upload_preset': upload_preset,
+        'folder': resolve_upload_folder(user, folder),
+    }
+    params['signature'] = cloudinary.utils.api_sign_request(params, config.api_secret)
+    params['api_key'] = config.api_key
+    params['cloud_name'] = config.cloud_name
+    params['upload_url'] = cloudinary.utils.cloudinary_api_url('upload', resource_type='auto')
+    return params
+
+
+def verify_upload_result(user, public_id, version, signature, resource_type=None):
+    """
+    Verify the signature Cloudinary returned for a direct upload and fetch
+    the authoritative asset metadata. resource_type comes from the upload
+    result; without it every type the signed upload may create is tried.
+
+    Returns the resource metadata dict, or None if verification fails.
+    """
+    if not public_id.startswith(f'{get_user_folder(user)}/'):
+        return None
+    if not cloudinary.utils.verify_api_response_signature(public_id, version, signature):
+        return None
+
+    # Metadata lookup only - the file bytes never pass through our servers
+    resource_types = [resource_type] if resource_type else ['image', 'video', 'raw']
+    for candidate in resource_types:
+        try:
+            return cloudinary.api.resource(public_id, resource_type=candidate)
+        except cloudinary.api.NotFound:
+            continue
+    return None
+
+
+def get_orphaned_uploads(cutoff):
+    """
+    Uploads older than cutoff that no enrollment document references.
+    NOT EXISTS over the indexed upload_asset FK keeps this an anti-join.
+    """
+    from django.db.models import Exists, OuterRef
+    from identity.models import EnrollmentDocument
+    from .models import UploadAsset
+
+    referenced = EnrollmentDocument.objects.filter(upload_asset=OuterRef('pk'))
+    return UploadAsset.objects.filter(created_at__lt=cutoff).filter(~Exists(referenced))
+
+
+def delete_remote_assets(assets):
+    """
+    Delete assets (and any kept originals) from Cloudinary in bulk.
+    Call it only once the assets' rows are deleted and committed, so no
+    row can outlive its file.
+    Returns the set of public IDs Cloudinary reported as deleted or missing.
+    """
+    by_type = {}
+    for asset in assets:
+        by_type.setdefault(asset.resource_type, []).append(asset.public_id)
+        if asset.original_public_id:
+            by_type[asset.resource_type].append(asset.original_public_id)
+
+    removed = set()
+    for resource_type, public_ids in by_type.items():
+        # The Admin API accepts at most 100 public IDs per call
+        for start in range(0, len(public_ids), 100):
+            result = cloudinary.api.delete_resources(
+                public_ids[start:start + 100],
+                resource_type=resource_type
+            )
+            for public_id, outcome in result.get('deleted', {}).items():
+                if outcome in ('deleted', 'not_found'):
+                    removed.add(public_id)
+    return removed
+
+
+def get_upload_executor():
+    """Lazily create the shared thread pool used for concurrent uploads."""
+    global _upload_executor
+    if _upload_executor is None:
+        with _upload_executor_lock:
+            if _upload_executor is None:
+                _upload_executor = ThreadPoolExecutor(
+                    max_workers=settings.UPLOAD_THREAD_POOL_WORKERS,
+                    thread_name_prefix='upload'
+                )
+    return _upload_executor
+
+
+def store_upload(file_obj, folder):
+    """
+    Normalize (for images) and upload a file to Cloudinary.
+    Does not touch the database, so it is safe to run in a worker thread.
+
+    Returns the UploadAsset field values for the stored file.
+    """
+    upload_source = file_obj
+    original_bytes = None
+    original_public_id = None
+
+    # Normalize images (orientation, metadata, size) in the process pool
+    normalized = normalize_upload(file_obj) if should_normalize(file_obj) else None
+    if normalized:
+        normalized_data, _ = normalized
+        original_bytes = file_obj.size
+        upload_source = io.BytesIO(normalized_data)
+
+        if settings.KEEP_ORIGINAL_UPLOADS:
+            original_result = cloudinary.uploader.upload(
+                file_obj,
+                folder=f'{folder}/originals',
+                resource_type="auto"
+            )
+            original_public_id = original_result.get('public_id')
+
+    upload_result = cloudinary.uploader.upload(
+        upload_source,
+        folder=folder,
+        resource_type="auto"
+    )
+    return {
+        'public_id': upload_result.get('public_id'),
+        'secure_url': upload_result.get('secure_url'),
+        'resource_type': upload_result.get('resource_type'),
+        'format': upload_result.get('format') or '',
+        'bytes': upload_result.get('bytes'),
+        'checksum': upload_result.get('etag'),  # etag is effectively the checksum
+        'original_bytes': original_bytes,
+        'original_public_id': original_public_id,
+    }
@@ -1,12 +1,20 @@
 import time
-import cloudinary.uploader
+from django.conf import settings
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes, parser_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
 from .models import UploadAsset
-from .serializers import UploadAssetSerializer, CloudinarySignatureRequestSerializer
+from .serializers import (
+    UploadAssetSerializer,
+    CloudinarySignatureRequestSerializer,
+    UploadConfirmSerializer
+)
+from .utils import generate_upload_signature, verify_upload_result, store_upload
+from .thumbnails import get_thumbnail
 
 
 @api_view(['POST'])
@@ -33,25 +41,18 @@ def handle_file_upload(request):
         # Determine folder
         folder = request.data.get('folder', f'user_{request.user.id}')
         
-        # Upload to Cloudinary using Python SDK
-        upload_result = cloudinary.uploader.upload(
-            file_obj,
-            folder=folder,
-            resource_type="auto"
-        )
+        # Normalize and upload to Cloudinary
+        stored = store_upload(file_obj, folder)
         
         # Save metadata to database
-        serializer = UploadAssetSerializer(data={
-            'public_id': upload_result.get('public_id'),
-            'secure_url': upload_result.get('secure_url'),
-            'resource_type': upload_result.get('resource_type'),
-            'format': upload_result.get('format'),
-            'bytes': upload_result.get('bytes'),
-            'checksum': upload_result.get('etag')  # etag is effectively the checksum
-        })
+        serializer = UploadAssetSerializer(data=stored)
         
         if serializer.is_valid():
-            serializer.save(user=request.user)
+            serializer.save(
+                user_id=request.user.id,
+                original_bytes=stored['original_bytes'],
+                original_public_id=stored['original_public_id']
+            )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -65,6 +66,94 @@ def handle_file_upload(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def get_upload_signature(request):
+    """
+    Generate a signature for a direct browser-to-Cloudinary upload.
+    The file bytes go straight to Cloudinary and never reach our workers.
+    
+    POST /api/v1/uploads/signature
+    {
+        "upload_preset": "nid_documents",
+        "folder": "enrollments"
+    }
+    """
+    serializer = CloudinarySignatureRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    signature = generate_upload_signature(
+        request.user,
+        serializer.validated_data['upload_preset'],
+        serializer.validated_data.get('folder')
+    )
+    return Response(signature)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def confirm_upload(request):
+    """
+    Confirm a direct Cloudinary upload and register its metadata.
+    
+    POST /api/v1/uploads/register
+    {
+        "public_id": "user_123/enrollments/abc123",
+        "version": 1705315800,
+        "signature": "<signature returned by Cloudinary>",
+        "resource_type": "image"
+    }
+    """
+    serializer = UploadConfirmSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    public_id = serializer.validated_data['public_id']
+    
+    existing = UploadAsset.objects.filter(public_id=public_id, user_id=request.user.id).first()
+    if existing:
+        return Response(UploadAssetSerializer(existing).data)
+    
+    try:
+        resource = verify_upload_result(
+            request.user,
+            public_id,
+            serializer.validated_data['version'],
+            serializer.validated_data['signature'],
+            serializer.validated_data.get('resource_type')
+        )
+    except Exception as e:
+        return Response({
+            'error': {
+                'code': 'UPLOAD_VERIFICATION_FAILED',
+                'message': str(e)
+            }
+        }, status=status.HTTP_502_BAD_GATEWAY)
+    
+    if resource is None:
+        return Response({
+            'error': {
+                'code': 'INVALID_SIGNATURE',
+                'message': 'Upload could not be verified'
+            }
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    asset_serializer = UploadAssetSerializer(data={
+        'public_id': resource.get('public_id'),
+        'secure_url': resource.get('secure_url'),
+        'resource_type': resource.get('resource_type'),
+        'format': resource.get('format') or '',
+        'bytes': resource.get('bytes'),
+        'checksum': resource.get('etag')
+    })
+    if asset_serializer.is_valid():
+        asset_serializer.save(user_id=request.user.id)
+        return Response(asset_serializer.data, status=status.HTTP_201_CREATED)
+    
+    return Response(asset_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def list_uploads(request):
@@ -73,7 +162,7 @@ def list_uploads(request):
     
     GET /api/v1/uploads
     """
-    uploads = UploadAsset.objects.filter(user=request.user)
+    uploads = UploadAsset.objects.filter(user_id=request.user.id)
     serializer = UploadAssetSerializer(uploads, many=True)
     return Response(serializer.data)
 
@@ -107,3 +196,61 @@ def get_upload(request, upload_id):
     
     serializer = UploadAssetSerializer(upload)
     return Response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_upload_thumbnail(request, upload_id):
+    """
+    Get a thumbnail (or first-page preview for PDFs) of an upload.
+    Generated on first request and cached on disk.
+    
+    GET /api/v1/uploads/{id}/thumbnail?size=small|medium
+    """
+    size_name = request.query_params.get('size', 'small')
+    if size_name not in settings.THUMBNAIL_SIZES:
+        return Response({
+            'error': {
+                'code': 'INVALID_SIZE',
+                'message': f"Size must be one of: {', '.join(settings.THUMBNAIL_SIZES)}"
+            }
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        upload = UploadAsset.objects.get(id=upload_id)
+    except UploadAsset.DoesNotExist:
+        return Response({
+            'error': {
+                'code': 'NOT_FOUND',
+                'message': 'Upload not found'
+            }
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    # Check permissions
+    if upload.user_id != request.user.id and request.user.role != 'ADMIN':
+        return Response({
+            'error': {
+                'code': 'PERMISSION_DENIED',
+                'message': 'You can only view your own uploads'
+            }
+        }, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        data = get_thumbnail(upload, size_name)
+    except Exception as e:
+        return Response({
+            'error': {
+                'code': 'THUMBNAIL_FAILED',
+                'message': str(e)
+            }
+        }, status=status.HTTP_502_BAD_GATEWAY)
+    
+    # Assets never change once uploaded, so the thumbnail can be cached for good
+    response = HttpResponse(data, content_type='image/jpeg')
+    patch_cache_control(
+        response,
+        private=True,
+        max_age=settings.THUMBNAIL_CACHE_MAX_AGE,
+        immutable=True
+    )
+    return response